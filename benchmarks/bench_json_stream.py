@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+#
+# bench_json_stream.py
+# Microbenchmark of the xAPI stream decoder on multi-MB responses such as
+# getChartRangeRequest and getAllSymbols.
+#
+# Usage: python benchmarks/bench_json_stream.py [--sizes 0.5 1 2] [--chunk 4096]
+import json
+import time
+import argparse
+
+from zetatrader.xtb.xAPIConnector import JsonStreamDecoder
+
+
+def chart_range_response(n_bytes):
+    """Returns an encoded getChartRangeRequest response of about n_bytes"""
+    rate = {
+        "ctm": 1609459200000, "ctmString": "Jan 1, 2021, 12:00:00 AM"
+        , "open": 122140.0, "close": 12.0, "high": 35.0, "low": -20.0
+        , "vol": 1520.0
+    }
+    n = max(n_bytes // len(json.dumps(rate)), 1)
+    msg = {
+        "status": True
+        , "returnData": {"digits": 5, "rateInfos": [rate] * n}
+    }
+    return json.dumps(msg).encode('utf-8') + b'\n\n'
+
+
+def legacy_decode(payload, chunk):
+    """Decoder used by JsonSocket._read before the incremental decoder"""
+    decoder = json.JSONDecoder()
+    received = ''
+    for i in range(0, len(payload), chunk):
+        received += payload[i:i + chunk].decode()
+        try:
+            (resp, size) = decoder.raw_decode(received)
+            return resp
+        except ValueError:
+            continue
+
+
+def stream_decode(payload, chunk):
+    decoder = JsonStreamDecoder()
+    view = memoryview(payload)
+    for i in range(0, len(payload), chunk):
+        decoder.feed(view[i:i + chunk])
+        if decoder.has_message():
+            return decoder.pop()
+
+
+def timeit(func, payload, chunk, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(payload, chunk)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', nargs='+', type=float, default=[0.5, 1, 2, 4])
+    parser.add_argument('--chunk', type=int, default=4096)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'MB':>6} {'legacy s':>10} {'stream s':>10} {'speedup':>8}")
+    for mb in args.sizes:
+        payload = chart_range_response(int(mb * 1024 * 1024))
+        assert legacy_decode(payload, args.chunk) == stream_decode(
+            payload, args.chunk)
+        legacy = timeit(legacy_decode, payload, args.chunk, args.repeat)
+        stream = timeit(stream_decode, payload, args.chunk, args.repeat)
+        print(f"{mb:>6.1f} {legacy:>10.4f} {stream:>10.4f} "
+            f"{legacy / stream:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+#
+# bench_trading_session.py
+# End to end benchmark of the TradingSession hot path. Runs a backtest over
+# synthetic in memory bars for every combination of symbol count, bar
+# frequency and with or without fills, each case in its own process so peak
+# RSS is per case. Bars/sec, events/sec and peak RSS are measured with the
+# profiler off. The time spent in each component comes from a second,
+# profiled run of the case, as timing every handler slows the loop down.
+# Results are saved as JSON keyed by git commit so runs can be compared
+# across commits.
+#
+# Usage: python benchmarks/bench_trading_session.py [--symbols 1 50 500]
+#            [--frequencies daily minute] [--bars 2520] [--compare old.json]
+#            [--no-breakdown]
+import os
+import sys
+import json
+import time
+import argparse
+import warnings
+import platform
+import resource
+import tempfile
+import itertools
+import subprocess
+import contextlib
+import multiprocessing as mp
+import datetime as dt
+
+# Import own modules
+from zetatrader.price_handler.memory_price_handler import (
+    MemoryPriceHandler, synthetic_prices
+)
+from zetatrader.strategy.strategy import Strategy
+from zetatrader.portfolio.futures_portfolio import FuturesPortfolio
+from zetatrader.execution_handler.execution import SimulatedExecution
+from zetatrader.performance.trading_stats import TradingStats
+from zetatrader.trading.backtest import TradingSession
+
+FREQUENCIES = {'daily': 'B', 'minute': '1min'}
+
+class BenchStrategy(Strategy):
+    """Reads the latest close of every symbol on every bar. When trade is
+    set, enters each symbol and exits it after hold bars, so every symbol
+    produces a signal, order and fill every hold bars.
+    """
+    def __init__(self, bars, events, trade=True, hold=5):
+        super().__init__(bars, events)
+        self.trade = trade
+        self.hold = hold
+        self.bar = 0
+
+    def calculate_signals(self, event):
+        self.bar += 1
+        for s in self.symbol_list:
+            self.bars.get_latest_bar_value(s, 'close_price')
+            if not self.trade or self.bar % self.hold:
+                continue
+            if self.bought[s] == 'OUT':
+                self.long_trade(1, s, 10, 'naive_order')
+            else:
+                self.exit_trade(1, s)
+
+
+def run_case(n_symbols, frequency, fills, n_bars, hold, profile=False):
+    """Runs one backtest and returns its measurements. With profile the
+    time spent in each handler is added.
+    """
+    symbol_dict = {f'SYM{i}': i for i in range(n_symbols)}
+    t0 = time.perf_counter()
+    prices = synthetic_prices(symbol_dict, n_bars, freq=FREQUENCIES[frequency])
+    dates = prices[0].index
+    symbol_info = {
+        s: {'lotMin': 1, 'contract size': 1, 'leverage': 1, 'tick size': 0.01}
+        for s in symbol_dict
+    }
+    data_time = time.perf_counter() - t0
+
+    with tempfile.TemporaryDirectory() as output_path, \
+            open(os.devnull, 'w') as devnull, \
+            contextlib.redirect_stdout(devnull):
+        t0 = time.perf_counter()
+        session = TradingSession(
+            symbol_dict
+            , initial_capital=1e9
+            , session_start_dt=dates[0]
+            , session_end_dt=dates[-1]
+            , price_handler=MemoryPriceHandler
+            , execution_handler=SimulatedExecution
+            , portfolio=FuturesPortfolio
+            , strategy=BenchStrategy
+            , performance=TradingStats
+            , output_path=output_path
+            , backtest_parameters={
+                'price_handler_param': {'prices': prices, 'frequency': frequency}
+                , 'performance_param': {'tearsheet': False}
+                , 'portfolio': {'symbol_info': symbol_info}
+            }
+            , strategy_parameters={'trade': fills, 'hold': hold}
+            , verbose=False
+            , save_results=False
+            , profile=profile
+        )
+        setup_time = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        session._run_session()
+        loop_time = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        try:
+            session._output_performance()
+            performance_error = None
+        except Exception as e:
+            performance_error = repr(e)
+        performance_time = time.perf_counter() - t0
+
+    bars = session.price_handler.bar_index + 1
+    events = bars + session.signals + session.orders + session.fills
+    result = {
+        'symbols': n_symbols
+        , 'frequency': frequency
+        , 'fills': fills
+        , 'bars': bars
+        , 'signals': session.signals
+        , 'orders': session.orders
+        , 'filled': session.fills
+        , 'events': events
+        , 'data_time': data_time
+        , 'setup_time': setup_time
+        , 'loop_time': loop_time
+        , 'performance_time': performance_time
+        , 'performance_error': performance_error
+        , 'bars_per_sec': bars / loop_time
+        , 'symbol_bars_per_sec': bars * n_symbols / loop_time
+        , 'events_per_sec': events / loop_time
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        , 'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10)
+    }
+    if profile:
+        # Loop time outside the handlers is queue and dispatch overhead
+        summary = session.profiler.summary()
+        handlers = summary[summary['level'] == 'handler']
+        timings = handlers['total_s'].to_dict()
+        timings['other'] = loop_time - handlers['total_s'].sum()
+        result['component_time'] = timings
+        result['component_p99_us'] = handlers['p99_us'].to_dict()
+    return result
+
+
+def breakdown(case, profiled):
+    """Adds the handler timings of a profiled run to a throughput case"""
+    if 'error' in profiled:
+        case['profile_error'] = profiled['error']
+        return case
+    case['component_time'] = profiled['component_time']
+    case['component_p99_us'] = profiled['component_p99_us']
+    case['profiled_loop_time'] = profiled['loop_time']
+    return case
+
+
+def _case_worker(conn, args):
+    # pandas and numpy warnings of the performance stats repeat every case
+    warnings.simplefilter('ignore')
+    try:
+        conn.send(run_case(*args))
+    except Exception as e:
+        conn.send({'error': repr(e)})
+    finally:
+        conn.close()
+
+
+def run_isolated(*args):
+    """Runs a case in a fresh process so peak RSS covers that case only"""
+    ctx = mp.get_context('spawn')
+    parent, child = ctx.Pipe(duplex=False)
+    p = ctx.Process(target=_case_worker, args=(child, args))
+    p.start()
+    child.close()
+    result = parent.recv()
+    p.join()
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD']
+            , cwd=os.path.dirname(os.path.abspath(__file__))
+            , stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def case_key(case):
+    return (case['symbols'], case['frequency'], case['fills'])
+
+
+def compare(results, baseline):
+    """Prints the change of the main measurements against a baseline run"""
+    old = {case_key(c): c for c in baseline['cases'] if 'error' not in c}
+    print(f"\nCompared to {baseline['commit']}:")
+    for case in results['cases']:
+        if 'error' in case:
+            continue
+        prev = old.get(case_key(case))
+        if prev is None:
+            continue
+        print(
+            '%4d symbols %-6s fills=%-5s bars/sec %+6.1f%%  events/sec %+6.1f%%'
+            '  peak RSS %+6.1f%%' % (
+                case['symbols'], case['frequency'], case['fills']
+                , 100 * (case['bars_per_sec'] / prev['bars_per_sec'] - 1)
+                , 100 * (case['events_per_sec'] / prev['events_per_sec'] - 1)
+                , 100 * (case['peak_rss_mb'] / prev['peak_rss_mb'] - 1)
+            )
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--symbols', type=int, nargs='+', default=[1, 50, 500])
+    parser.add_argument('--frequencies', nargs='+', default=['daily', 'minute']
+        , choices=list(FREQUENCIES))
+    parser.add_argument('--fills', nargs='+', default=['on', 'off']
+        , choices=['on', 'off'])
+    parser.add_argument('--bars', type=int, default=2520
+        , help='Bars per case, about 10 years of daily or 6 days of minute bars')
+    parser.add_argument('--hold', type=int, default=5
+        , help='Bars between entry and exit when fills are on')
+    parser.add_argument('--output', default=None
+        , help='JSON file, defaults to benchmarks/results/<commit>.json')
+    parser.add_argument('--compare', default=None
+        , help='JSON file of an earlier run to compare to')
+    parser.add_argument('--no-breakdown', action='store_true'
+        , help='Skip the profiled run giving the time spent per handler')
+    args = parser.parse_args()
+
+    results = {
+        'commit': git_commit()
+        , 'timestamp': dt.datetime.now().isoformat(timespec='seconds')
+        , 'python': platform.python_version()
+        , 'platform': platform.platform()
+        , 'cases': []
+    }
+    for n_symbols, frequency, fills in itertools.product(
+            args.symbols, args.frequencies, args.fills):
+        case_args = (n_symbols, frequency, fills == 'on', args.bars, args.hold)
+        case = run_isolated(*case_args)
+        results['cases'].append(case)
+        if 'error' in case:
+            print(f'{n_symbols} symbols {frequency} fills={fills}: {case["error"]}')
+            continue
+        if not args.no_breakdown:
+            breakdown(case, run_isolated(*case_args, True))
+        print(
+            '%4d symbols %-6s fills=%-5s %8.0f bars/sec %10.0f events/sec'
+            ' %7.1f MB peak' % (
+                n_symbols, frequency, fills == 'on', case['bars_per_sec']
+                , case['events_per_sec'], case['peak_rss_mb']
+            )
+        )
+
+    output = args.output or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'results'
+        , f"{results['commit']}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'Results saved to {output}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
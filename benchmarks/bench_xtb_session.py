@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+#
+# bench_xtb_session.py
+# Measures bar-to-order latency of XtbSession against a local XtbSimulator.
+# The simulator publishes a new bar every --bar-interval seconds and records
+# when each tradeTransaction arrives. A strategy that enters on one bar and
+# exits on the next makes every bar produce an order.
+#
+# Usage: python benchmarks/bench_xtb_session.py --symbols 2 --bars 10
+import json
+import time
+import argparse
+import threading
+import numpy as np
+
+# Import own modules
+from zetatrader.xtb.api import XRest
+from zetatrader.xtb.price_data import PriceData
+from zetatrader.xtb.execution import XtbExecution
+from zetatrader.xtb.simulator import XtbSimulator, synthetic_bars
+from zetatrader.portfolio.xtb_portfolio import XtbPortfolio
+from zetatrader.strategy.strategy import Strategy
+from zetatrader.trading.xtb_session import XtbSession
+
+
+class AlternatingStrategy(Strategy):
+    """Goes long on one new bar and exits on the next"""
+    def __init__(self, bars, events):
+        super().__init__(bars, events)
+        self.last_bar = {s: None for s in self.symbol_list}
+
+    def calculate_signals(self, event):
+        for s in self.symbol_list:
+            bar_date = self.bars.symbol_data[s].loc[0, 'price_date']
+            if bar_date == self.last_bar[s]:
+                continue
+            self.last_bar[s] = bar_date
+            if self.bought[s] == 'OUT':
+                self.long_trade(1, s, 0.01, 'naive_order')
+            else:
+                self.exit_trade(1, s)
+
+
+def run(n_symbols, n_bars, bar_interval, heartbeat, latency):
+    symbol_list = [f'SYM{i}' for i in range(n_symbols)]
+    sim = XtbSimulator(
+        synthetic_bars(symbol_list, 1000 + n_bars), start_index=1000
+        , latency=latency
+    ).start()
+    connection = XRest(
+        'bench', 'bench', address=sim.host, port=sim.port, encrypt=False
+    )
+
+    def session():
+        XtbSession(
+            symbol_list, heartbeat, PriceData, XtbExecution, XtbPortfolio
+            , AlternatingStrategy, connection
+            , other_parameters={'price_handler_param': {'barsize': '1MIN'}}
+        )
+
+    t = threading.Thread(target=session, args=())
+    t.daemon = True
+    t.start()
+    # Let the session construct its components and trade the first bar
+    time.sleep(bar_interval)
+    start = time.perf_counter()
+    for i in range(n_bars):
+        sim.advance()
+        time.sleep(bar_interval)
+    elapsed = time.perf_counter() - start
+
+    log = sim.order_latencies()
+    sim.stop()
+    log = log[log['cursor'] > 1000]
+    # First order of each symbol on each bar
+    first = log.groupby(['cursor', 'symbol'])['latency'].min()
+    return {
+        'symbols': n_symbols
+        , 'bars': n_bars
+        , 'orders': int(len(log))
+        , 'bar_to_order_p50': float(np.percentile(first, 50)) if len(first) else None
+        , 'bar_to_order_p90': float(np.percentile(first, 90)) if len(first) else None
+        , 'bar_to_order_max': float(first.max()) if len(first) else None
+        , 'requests_per_sec': sum(sim.command_counts.values()) / elapsed
+        , 'command_counts': sim.command_counts
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--symbols', type=int, default=2)
+    parser.add_argument('--bars', type=int, default=10)
+    parser.add_argument('--bar-interval', type=float, default=5.0)
+    parser.add_argument('--heartbeat', type=float, default=0.5)
+    parser.add_argument('--latency', type=float, default=0.0
+        , help='Simulated server latency per request in seconds')
+    parser.add_argument('--output', default=None, help='Save results as JSON')
+    args = parser.parse_args()
+
+    result = run(
+        args.symbols, args.bars, args.bar_interval, args.heartbeat
+        , args.latency
+    )
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
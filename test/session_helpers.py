@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+
+# session_helpers.py
+# Fixtures shared by the tests running backtests over synthetic prices
+import tempfile
+import unittest
+import warnings
+
+# Import own module
+from zetatrader.price_handler.memory_price_handler import (
+    MemoryPriceHandler, synthetic_prices
+)
+from zetatrader.strategy.strategy import Strategy
+from zetatrader.portfolio.futures_portfolio import FuturesPortfolio
+from zetatrader.execution_handler.execution import SimulatedExecution
+from zetatrader.performance.trading_stats import TradingStats
+
+SYMBOL_DICT = {"A": 1, "B": 2}
+
+
+class DummieStrategy(Strategy):
+    """Enters every symbol and exits it after hold bars"""
+    def __init__(self, bars, events, hold=1):
+        super().__init__(bars, events)
+        self.hold = hold
+        self.bar = 0
+
+    def calculate_signals(self, event):
+        self.bar += 1
+        if self.bar % self.hold:
+            return
+        for s in self.symbol_list:
+            if self.bought[s] == "OUT":
+                self.long_trade(1, s, 1, "naive_order")
+            else:
+                self.exit_trade(1, s)
+
+
+def symbol_info(symbols):
+    """Returns an unleveraged contract with one unit lots for every symbol"""
+    return {
+        s: {"lotMin": 1, "contract size": 1, "leverage": 1}
+        for s in symbols
+    }
+
+
+def session_kwargs(output_path, n_bars=40, seed=0, symbol_dict=SYMBOL_DICT, **kwargs):
+    """Returns the TradingSession keyword arguments of a DummieStrategy
+    backtest over n_bars synthetic bars held in memory. kwargs replace the
+    defaults.
+    """
+    prices = synthetic_prices(symbol_dict, n_bars, seed=seed)
+    dates = prices[next(iter(symbol_dict.values()))].index
+    session = dict(
+        symbol_dict=dict(symbol_dict),
+        initial_capital=10000,
+        session_start_dt=dates[0],
+        session_end_dt=dates[-1],
+        price_handler=MemoryPriceHandler,
+        execution_handler=SimulatedExecution,
+        portfolio=FuturesPortfolio,
+        strategy=DummieStrategy,
+        performance=TradingStats,
+        output_path=output_path,
+        backtest_parameters={
+            "price_handler_param": {"prices": prices},
+            "performance_param": {"tearsheet": False},
+            "portfolio": {"symbol_info": symbol_info(symbol_dict)},
+        },
+    )
+    session.update(kwargs)
+    return session
+
+
+class SessionTestCase(unittest.TestCase):
+    """Gives every test a temporary directory, self.tmp, and silences the
+    warnings of the performance stats on short random equity curves.
+    """
+    def run(self, result=None):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            return super().run(result)
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
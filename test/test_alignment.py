@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+import unittest
+import numpy as np
+import pandas as pd
+
+# Import own module
+from zetatrader.price_handler.alignment import align_symbol_frames
+
+
+def make_frame(dates, close):
+    return pd.DataFrame(
+        {"open_price": close, "close_price": close},
+        index=pd.DatetimeIndex(dates, name="price_date"),
+    )
+
+
+class TestAlignment(unittest.TestCase):
+    def setUp(self):
+        # Each symbol misses a day the other one has
+        self.data = {
+            "A": make_frame(["2020-01-01", "2020-01-02", "2020-01-04"], [1.0, 2.0, 4.0]),
+            "B": make_frame(["2020-01-02", "2020-01-03", "2020-01-04"], [20.0, 30.0, 40.0]),
+        }
+
+    def test_union_calendar(self):
+        aligned = align_symbol_frames(self.data, ["A", "B"])
+        a, b = aligned["A"], aligned["B"]
+        self.assertEqual(len(a), 4)
+        self.assertListEqual(list(a["price_date"]), list(b["price_date"]))
+        self.assertListEqual(list(a["close_price"]), [1.0, 2.0, 2.0, 4.0])
+        self.assertTrue(np.isnan(b.loc[0, "close_price"]))
+        self.assertListEqual(list(b["close_price"][1:]), [20.0, 30.0, 40.0])
+        self.assertListEqual(list(a["stale"]), [False, False, True, False])
+        self.assertListEqual(list(b["stale"]), [True, False, False, False])
+
+    def test_matches_reindex_pad(self):
+        aligned = align_symbol_frames(self.data, ["A", "B"])
+        calendar = pd.DatetimeIndex(aligned["A"]["price_date"])
+        for s in ["A", "B"]:
+            expected = self.data[s].reindex(calendar, method="pad")
+            np.testing.assert_array_equal(
+                aligned[s]["close_price"].to_numpy(), expected["close_price"].to_numpy()
+            )
+
+    def test_calendar_and_carry(self):
+        calendar = pd.DatetimeIndex(["2020-01-02", "2020-01-03", "2020-01-06"])
+        carry = {"B": make_frame(["2019-12-31"], [10.0])}
+        data = {
+            "A": self.data["A"],
+            "B": make_frame(["2020-01-03"], [30.0]),
+        }
+        aligned = align_symbol_frames(data, ["A", "B"], calendar, carry)
+        self.assertListEqual(list(aligned["A"]["close_price"]), [2.0, 2.0, 4.0])
+        self.assertListEqual(list(aligned["B"]["close_price"]), [10.0, 30.0, 30.0])
+        self.assertListEqual(list(aligned["A"]["stale"]), [False, True, True])
+        self.assertListEqual(list(aligned["B"]["stale"]), [True, False, True])
+
+
+if __name__ == "__main__":
+    unittest.main()
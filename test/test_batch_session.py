@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+import unittest
+import pandas as pd
+
+# Import own module
+from zetatrader.trading.batch import BatchTradingSession
+from zetatrader.trading.backtest import TradingSession
+from zetatrader.price_handler.memory_price_handler import MemoryPriceHandler
+from session_helpers import SessionTestCase, session_kwargs
+
+
+class DummiePriceHandler(MemoryPriceHandler):
+    """Counts the bar updates"""
+    updates = 0
+
+    def update_bars(self):
+        DummiePriceHandler.updates += 1
+        super().update_bars()
+
+
+class TestBatchTradingSession(SessionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.kwargs = session_kwargs(
+            self.tmp.name,
+            price_handler=DummiePriceHandler,
+            verbose=False,
+            save_results=False,
+        )
+        DummiePriceHandler.updates = 0
+
+    def test_matches_single_sessions(self):
+        variants = [{"hold": 1}, {"hold": 2}, {"hold": 5}]
+        batch = BatchTradingSession(strategy_parameters_list=variants, **self.kwargs)
+        results = batch.start_trading()
+        self.assertEqual(len(results), 3)
+        # One pass over the bars for the whole batch
+        self.assertEqual(DummiePriceHandler.updates, 41)
+
+        for params, result in zip(variants, results):
+            single = TradingSession(strategy_parameters=params, **self.kwargs)
+            expected = single.start_trading()
+            pd.testing.assert_frame_equal(result[0], expected[0])
+            pd.testing.assert_frame_equal(result[1], expected[1])
+            pd.testing.assert_series_equal(result[2], expected[2])
+        self.assertGreater(batch.stacks[0].fills, batch.stacks[2].fills)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+import os
+import unittest
+import pymysql
+import numpy as np
+import pandas as pd
+import datetime as dt
+from decimal import Decimal
+from contextlib import contextmanager
+
+# Import own module
+from zetatrader.price_handler.datasource import (
+    DbConfig, SecuritiesDb, columns_to_frame, get_pool, price_table
+)
+
+
+class DummieCursor:
+    def __init__(self, log, rows, cursor_class=None):
+        self.log = log
+        self.rows = rows
+        self.cursor_class = cursor_class
+        self.description = [("price_date",), ("close_price",)]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, sql, params):
+        self.log.append((sql, params, self.cursor_class))
+
+    def fetchmany(self, size):
+        chunk, self.rows = self.rows[:size], self.rows[size:]
+        return chunk
+
+
+class DummiePool:
+    def __init__(self, rows):
+        self.log = []
+        self.rows = rows
+
+    @contextmanager
+    def connection(self):
+        conn = type("Conn", (), {})()
+        conn.cursor = lambda cursor_class=None: DummieCursor(
+            self.log, list(self.rows), cursor_class
+        )
+        yield conn
+
+
+class TestDatasource(unittest.TestCase):
+    def test_price_table(self):
+        self.assertEqual(price_table("daily"), "daily_price")
+        with self.assertRaises(ValueError):
+            price_table("daily_price; DROP TABLE daily_price")
+
+    def test_columns_to_frame(self):
+        rows = [(dt.date(2020, 1, 2), Decimal("1.5")), (dt.date(2020, 1, 3), Decimal("2.5"))]
+        df = columns_to_frame(["price_date", "close_price"], rows, index="price_date")
+        self.assertEqual(df["close_price"].dtype, np.float64)
+        self.assertEqual(df.index[1], pd.Timestamp("2020-01-03"))
+        empty = columns_to_frame(["price_date", "close_price"], [])
+        self.assertEqual(len(empty), 0)
+
+    def test_parameterized_query(self):
+        rows = [(dt.date(2020, 1, d), Decimal(d)) for d in range(2, 9)]
+        ds = SecuritiesDb(DbConfig(user="test"), arraysize=3)
+        ds.pool = DummiePool(rows)
+        df = ds.read_prices(np.int64(5), "2020-01-01", "2020-02-01", data_vendor=6)
+        self.assertEqual(len(df), 7)
+        sql, params, cursor_class = ds.pool.log[0]
+        # Rows are streamed, not buffered by the driver
+        self.assertIs(cursor_class, pymysql.cursors.SSCursor)
+        self.assertNotIn("2020-01-01", sql)
+        self.assertListEqual(params, [5, "2020-01-01", "2020-02-01", 6])
+        self.assertIsInstance(params[0], int)
+
+        ds.read_price_dates([1, 2, 3], "2020-01-01", "2020-02-01")
+        sql, params, _ = ds.pool.log[1]
+        self.assertIn("IN (%s, %s, %s)", sql)
+
+    @unittest.skipUnless(hasattr(os, "fork"), "needs os.fork")
+    def test_pool_after_fork(self):
+        config = DbConfig(user="fork_test")
+        pool = get_pool(config)
+        conn = object()
+        pool._opened = 1
+        pool.release(conn)
+        pid = os.fork()
+        if pid == 0:
+            # Child, the parent's connection must not be handed out
+            ok = pool._opened == 0 and pool._idle.empty() and get_pool(config) is not pool
+            os._exit(0 if ok else 1)
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+        self.assertIs(get_pool(config), pool)
+        self.assertIs(pool._idle.get_nowait(), conn)
+
+    def test_config_overrides(self):
+        config = DbConfig.from_env(prefix="ZT_TEST_DB", host="dbhost", port="3307")
+        self.assertEqual(config.host, "dbhost")
+        self.assertEqual(config.port, 3307)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+import datetime as dt
+
+# Import own module
+from zetatrader.price_handler.db_price_handler import DbPriceHandler
+from zetatrader.price_handler.prefetch import ChunkPrefetcher
+from zetatrader.strategy.strategy import Strategy
+from zetatrader.portfolio.futures_portfolio import FuturesPortfolio
+from zetatrader.execution_handler.execution import SimulatedExecution
+from zetatrader.performance.trading_stats import TradingStats
+from zetatrader.trading.backtest import TradingSession
+
+
+class IdleStrategy(Strategy):
+    def calculate_signals(self, event):
+        pass
+
+
+class FailingStrategy(Strategy):
+    def calculate_signals(self, event):
+        raise RuntimeError("strategy failed")
+
+
+class DummieEvents:
+    def __init__(self):
+        self.items = []
+
+    def put(self, x):
+        self.items.append(x)
+
+
+def make_prices(dates, seed):
+    rng = np.random.default_rng(seed)
+    close = 100 + rng.standard_normal(len(dates)).cumsum()
+    return pd.DataFrame(
+        {
+            "price_date": dates,
+            "open_price": close + 0.1,
+            "high_price": close + 1,
+            "low_price": close - 1,
+            "close_price": close,
+            "adj_close_price": close,
+            "volume": 1000.0,
+        }
+    ).set_index("price_date")
+
+
+DATES = pd.bdate_range("2019-01-01", "2019-12-31")
+PRICES = {
+    # EWM misses some days that must be forward filled
+    "AAPL": make_prices(DATES, 1),
+    "EWM": make_prices(DATES, 2)
+    .drop(DATES[[0, 40, 41, 120, 250]])
+    .drop(pd.to_datetime(["2019-04-01", "2019-04-02"])),
+    # Also trades on weekends
+    "SPY": make_prices(pd.date_range("2019-01-01", "2019-12-31")[::2], 3),
+}
+
+
+class DummieDbPriceHandler(DbPriceHandler):
+    """Reads from PRICES instead of securities_db"""
+
+    def _read_price_data(self, symbol, start_dt, end_dt, end_inclusive=True):
+        df = PRICES[symbol]
+        if end_inclusive:
+            mask = (df.index >= start_dt) & (df.index <= end_dt)
+        else:
+            mask = (df.index >= start_dt) & (df.index < end_dt)
+        return df.loc[mask].copy()
+
+    def _read_calendar(self):
+        dates = [self._read_price_data(s, self.start_dt, self.end_dt).index
+                 for s in self.symbol_list]
+        return dates[0].union(dates[1])
+
+
+class TestDbPriceHandlerStreaming(unittest.TestCase):
+    def make_handler(self, **kwargs):
+        return DummieDbPriceHandler(
+            DummieEvents(),
+            {"AAPL": 1, "EWM": 2},
+            start_dt=dt.datetime(2019, 1, 15),
+            end_dt=dt.datetime(2019, 11, 20),
+            **kwargs
+        )
+
+    def replay(self, handler):
+        closes, next_opens = [], []
+        while True:
+            handler.update_bars()
+            if not handler.continue_backtest:
+                break
+            closes.append(
+                (
+                    handler.get_latest_bar_datetime(),
+                    handler.get_latest_bar_value("AAPL", "close_price"),
+                    handler.get_latest_bar_value("EWM", "close_price"),
+                    list(handler.get_latest_bar_values("EWM", "close_price", 5)),
+                )
+            )
+            try:
+                next_opens.append(handler.get_next_open_price("EWM"))
+            except KeyError:
+                pass
+        return closes, next_opens
+
+    def test_streaming_matches_full_load(self):
+        full = self.replay(self.make_handler())
+        streamed = self.replay(self.make_handler(chunk_freq="MS", lookback=20))
+        self.assertEqual(len(full[0]), len(streamed[0]))
+        self.assertListEqual(full[0], streamed[0])
+        self.assertListEqual(full[1], streamed[1])
+
+    def test_lookback_is_bounded(self):
+        handler = self.make_handler(chunk_freq="MS", lookback=20)
+        for i in range(150):
+            handler.update_bars()
+        # Lookback, the rest of the current month and one month ahead
+        self.assertLess(len(handler.symbol_data["AAPL"]), 20 + 2 * 23)
+        self.assertEqual(len(handler.get_latest_bars("AAPL", 20)), 20)
+
+    def test_stale_bars(self):
+        handler = self.make_handler(chunk_freq="MS")
+        stale = {}
+        while True:
+            handler.update_bars()
+            if not handler.continue_backtest:
+                break
+            stale[handler.get_latest_bar_datetime()] = (
+                handler.get_latest_bar_stale("AAPL"),
+                handler.get_latest_bar_stale("EWM"),
+            )
+        self.assertTupleEqual(stale[pd.Timestamp("2019-04-01")], (False, True))
+        self.assertTupleEqual(stale[pd.Timestamp("2019-04-03")], (False, False))
+
+    def test_prefetch_stats(self):
+        handler = self.make_handler(chunk_freq="MS", lookback=20)
+        self.replay(handler)
+        stats = handler.prefetch_stats()
+        self.assertEqual(stats["chunks_loaded"], 11)
+        self.assertEqual(stats["chunks_consumed"], 11)
+        self.assertLessEqual(stats["max_queue_depth"], 2)
+        self.assertDictEqual(self.make_handler().prefetch_stats(), {})
+
+    def test_close(self):
+        handler = self.make_handler(chunk_freq="MS", lookback=20)
+        handler.update_bars()
+        handler.close()
+        self.assertFalse(handler.prefetcher._t.is_alive())
+        self.assertEqual(handler.prefetch_stats()["queue_depth"], 0)
+        self.assertIsNone(handler.prefetcher.next_chunk())
+
+        # The thread is stopped when the data runs out
+        handler = self.make_handler(chunk_freq="MS", lookback=20)
+        self.replay(handler)
+        self.assertFalse(handler.prefetcher._t.is_alive())
+
+    def make_session(self, strategy, output_path, **price_handler_param):
+        symbol_info = {
+            s: {"lotMin": 1, "contract size": 1, "leverage": 1}
+            for s in ["AAPL", "EWM"]
+        }
+        return TradingSession(
+            {"AAPL": 1, "EWM": 2},
+            initial_capital=10000,
+            session_start_dt=dt.datetime(2019, 1, 15),
+            session_end_dt=dt.datetime(2019, 11, 20),
+            price_handler=DummieDbPriceHandler,
+            execution_handler=SimulatedExecution,
+            portfolio=FuturesPortfolio,
+            strategy=strategy,
+            performance=TradingStats,
+            output_path=output_path,
+            backtest_parameters={
+                "price_handler_param": price_handler_param,
+                "performance_param": {"tearsheet": False},
+                "portfolio": {"symbol_info": symbol_info},
+            },
+            verbose=False,
+            save_results=False,
+        )
+
+    def test_session_closes_handler(self):
+        with tempfile.TemporaryDirectory() as output_path:
+            session = self.make_session(FailingStrategy, output_path, chunk_freq="MS")
+            with self.assertRaises(RuntimeError):
+                session.start_trading()
+        self.assertFalse(session.price_handler.prefetcher._t.is_alive())
+
+    def test_prefetch_error(self):
+        def loader(window):
+            if window == 2:
+                raise ValueError("bad chunk")
+            return window
+
+        prefetcher = ChunkPrefetcher(loader, range(4))
+        self.assertEqual(prefetcher.next_chunk(), 0)
+        self.assertEqual(prefetcher.next_chunk(), 1)
+        with self.assertRaises(ValueError):
+            prefetcher.next_chunk()
+        self.assertIsNone(prefetcher.next_chunk())
+
+    def test_lazy_matches_full_load(self):
+        full = self.replay(self.make_handler())
+        lazy = self.replay(self.make_handler(lazy=True))
+        self.assertListEqual(full[0], lazy[0])
+        self.assertListEqual(full[1], lazy[1])
+
+    def test_lazy_loads_on_access(self):
+        handler = self.make_handler(lazy=True, memory_budget=1)
+        for i in range(10):
+            handler.update_bars()
+        self.assertListEqual(handler.symbol_data.loaded(), [])
+        handler.get_latest_bar_value("EWM", "close_price")
+        handler.get_latest_bar_value("AAPL", "close_price")
+        # Only the most recently used symbol fits the budget
+        self.assertListEqual(handler.symbol_data.loaded(), ["AAPL"])
+        self.assertEqual(handler.lazy_stats()["evictions"], 1)
+
+    def test_lazy_cache_dir(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            handler = self.make_handler(lazy=True, cache_dir=cache_dir)
+            handler.update_bars()
+            close = handler.get_latest_bar_value("EWM", "close_price")
+            handler = self.make_handler(lazy=True, cache_dir=cache_dir)
+            handler.update_bars()
+            self.assertEqual(handler.get_latest_bar_value("EWM", "close_price"), close)
+            self.assertEqual(handler.lazy_stats()["loads"], 0)
+            self.assertEqual(handler.lazy_stats()["cache_loads"], 1)
+
+    def test_lazy_session_loads_once(self):
+        with tempfile.TemporaryDirectory() as output_path:
+            eager = self.make_session(IdleStrategy, output_path)
+            eager._run_session()
+            # The budget holds one symbol, the portfolio reads both per bar
+            lazy = self.make_session(
+                IdleStrategy, output_path, lazy=True, memory_budget=1
+            )
+            lazy._run_session()
+        self.assertEqual(lazy.price_handler.lazy_stats()["loads"], 2)
+        self.assertListEqual(
+            [h["total"] for h in lazy.portfolio.all_holdings],
+            [h["total"] for h in eager.portfolio.all_holdings],
+        )
+
+    def test_lazy_cache_dir_other_universe(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            # The calendar with SPY differs from the one with EWM
+            handler = DummieDbPriceHandler(
+                DummieEvents(), {"AAPL": 1, "SPY": 3},
+                start_dt=dt.datetime(2019, 1, 15), end_dt=dt.datetime(2019, 11, 20),
+                lazy=True, cache_dir=cache_dir,
+            )
+            handler.update_bars()
+            handler.get_latest_bar_value("AAPL", "close_price")
+            lazy = self.replay(self.make_handler(lazy=True, cache_dir=cache_dir))
+        self.assertListEqual(lazy[0], self.replay(self.make_handler())[0])
+
+    def test_lazy_and_streaming(self):
+        with self.assertRaises(ValueError):
+            self.make_handler(lazy=True, chunk_freq="MS")
+
+    def test_cross_section(self):
+        for kwargs in [{}, {"chunk_freq": "MS", "lookback": 20}, {"lazy": True}]:
+            handler = self.make_handler(**kwargs)
+            for i in range(60):
+                handler.update_bars()
+            closes = handler.get_latest_cross_section("close_price")
+            self.assertListEqual(
+                list(closes),
+                [handler.get_latest_bar_value(s, "close_price")
+                 for s in ["AAPL", "EWM"]],
+            )
+            matrix = handler.get_latest_cross_sections("close_price", 5, ["EWM"])
+            self.assertEqual(matrix.shape, (5, 1))
+            self.assertListEqual(
+                list(matrix[:, 0]),
+                list(handler.get_latest_bar_values("EWM", "close_price", 5)),
+            )
+
+        handler = self.make_handler()
+        handler.update_bars()
+        matrix = handler.get_latest_cross_sections("open_price", 3)
+        self.assertEqual(matrix.shape, (3, 2))
+        self.assertTrue(np.isnan(matrix[:2]).all())
+
+
+if __name__ == "__main__":
+    unittest.main()
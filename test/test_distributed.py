@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+import os
+import time
+import tempfile
+import unittest
+
+# Import own module
+from zetatrader.trading.distributed import FileWorkQueue, DistributedOptimization
+from zetatrader.trading.optimization import Optimization
+from zetatrader.trading.search import SuccessiveHalving, GridSearch
+from session_helpers import SessionTestCase, DummieStrategy, session_kwargs
+
+
+class DyingStrategy(DummieStrategy):
+    """When die_flag is given, the first process to create it exits at
+    once, like a worker killed mid-run.
+    """
+    def __init__(self, bars, events, hold=1, die_flag=None):
+        if die_flag is not None and not os.path.exists(die_flag):
+            open(die_flag, "w").close()
+            os._exit(1)
+        super().__init__(bars, events, hold)
+
+
+class TestFileWorkQueue(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.queue = FileWorkQueue(self.tmp.name, lease_timeout=0.2, max_attempts=2)
+
+    def test_claim_once(self):
+        self.queue.submit("00000000", {"params": {"a": 1}})
+        job_id, payload = self.queue.claim("w1")
+        self.assertEqual(job_id, "00000000")
+        self.assertEqual(payload["params"], {"a": 1})
+        self.assertIsNone(self.queue.claim("w2"))
+        self.queue.complete(job_id, "w1", {"metrics": {"Sharpe Ratio": 1.0}})
+        self.assertEqual(self.queue.collect(), {"00000000": {"metrics": {"Sharpe Ratio": 1.0}}})
+        self.assertEqual(self.queue.collect(), {})
+
+    def test_recover(self):
+        self.queue.submit("00000000", {"params": {}})
+        self.queue.claim("w1")
+        # Dead worker is recovered before its lease expires
+        self.assertEqual(self.queue.requeue(dead_workers=["w1"]), 1)
+        self.assertEqual(self.queue.claim("w2")[1]["attempts"], 1)
+        self.assertEqual(self.queue.requeue(), 0)
+        time.sleep(0.3)
+        # Second lost lease reaches max_attempts
+        self.assertEqual(self.queue.requeue(), 1)
+        self.assertIsNone(self.queue.claim("w3"))
+        self.assertIn("error", self.queue.collect()["00000000"])
+
+
+class TestDistributedOptimization(SessionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.kwargs = session_kwargs(self.tmp.name, strategy=DyingStrategy)
+        self.queue_path = os.path.join(self.tmp.name, "queue")
+
+    def test_matches_serial(self):
+        space = {"hold": [1, 2, 3, 4]}
+        results = DistributedOptimization(
+            strategy_parameters_dict=space, **self.kwargs
+        ).optimize_strategy(self.queue_path, n_workers=2, poll_interval=0.05)
+        serial = Optimization(strategy_parameters_dict=space, **self.kwargs).optimize_strategy()
+        self.assertEqual(list(results["hold"]), [1, 2, 3, 4])
+        self.assertEqual(
+            list(results["Sharpe Ratio"].round(10)),
+            list(serial["Sharpe Ratio"].round(10)),
+        )
+
+    def test_successive_halving(self):
+        space = {"hold": [1, 2, 3, 4]}
+
+        def search():
+            return SuccessiveHalving(space, n=4, eta=2, sampler=GridSearch(space))
+
+        results = DistributedOptimization(
+            strategy_parameters_dict=space, **self.kwargs
+        ).optimize_strategy(
+            self.queue_path, n_workers=2, search=search(), max_pending=4,
+            poll_interval=0.05,
+        )
+        serial = Optimization(strategy_parameters_dict=space, **self.kwargs).optimize_strategy(
+            search=search()
+        )
+        fractions = list(results["Session Fraction"].fillna(1.0))
+        self.assertEqual(fractions, [0.25] * 4 + [0.5] * 2 + [1.0])
+        # Survivors are chosen from complete rounds as in a serial sweep
+        self.assertEqual(list(results["hold"]), list(serial["hold"]))
+        self.assertEqual(
+            list(results["Sharpe Ratio"].round(10)),
+            list(serial["Sharpe Ratio"].round(10)),
+        )
+
+    def test_dead_worker_recovered(self):
+        flag = os.path.join(self.tmp.name, "died")
+        space = {"hold": [1, 2], "die_flag": [flag]}
+        results = DistributedOptimization(
+            strategy_parameters_dict=space, **self.kwargs
+        ).optimize_strategy(self.queue_path, n_workers=1, poll_interval=0.05)
+        self.assertTrue(os.path.exists(flag))
+        self.assertEqual(len(results), 2)
+        self.assertTrue(results["Sharpe Ratio"].notna().all())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+import queue
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+import datetime as dt
+
+# Import own module
+from zetatrader.price_handler.local_db import LocalDb
+from zetatrader.portfolio.simulated_portfolio import SimulatedPortfolio
+from zetatrader.price_handler.file_price_handler import (
+    FilePriceHandler, export_datasource, write_symbol_files, pa, pq
+)
+
+
+def make_prices(dates, offset):
+    close = np.arange(len(dates), dtype=float) + offset
+    return pd.DataFrame(
+        {
+            "open_price": close - 0.5, "high_price": close + 1,
+            "low_price": close - 1, "close_price": close,
+            "adj_close_price": close, "volume": 100.0,
+        },
+        index=pd.DatetimeIndex(dates, name="price_date"),
+    )
+
+
+class TestFilePriceHandler(unittest.TestCase):
+    fmt = "npy"
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        dates = pd.bdate_range("2020-01-01", "2020-03-31")
+        actions = pd.DataFrame(
+            {"split_ratio": [2.0], "dividend": [0.25]},
+            index=pd.DatetimeIndex(["2020-02-04"], name="action_date"),
+        )
+        write_symbol_files(self.tmp.name, "A", make_prices(dates, 0), self.fmt, actions)
+        # B misses every other day and starts later
+        write_symbol_files(self.tmp.name, "B", make_prices(dates[20::2], 1000), self.fmt)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_handler(self, **kwargs):
+        return FilePriceHandler(
+            queue.Queue(), {"A": 1, "B": 2}, dt.datetime(2020, 1, 27),
+            dt.datetime(2020, 3, 20), self.tmp.name, self.fmt, **kwargs
+        )
+
+    def test_replay(self):
+        handler = self.make_handler()
+        handler.update_bars()
+        self.assertEqual(handler.get_latest_bar_datetime(), pd.Timestamp("2020-01-27"))
+        self.assertEqual(handler.get_latest_bar_value("A", "close_price"), 18.0)
+        self.assertTrue(np.isnan(handler.get_latest_bar_value("B", "close_price")))
+        self.assertEqual(handler.get_next_open_price("A"), 18.5)
+        for i in range(7):
+            handler.update_bars()
+        # 2020-02-05, B traded on 2020-02-04
+        self.assertEqual(handler.get_latest_bar_value("B", "close_price"), 1002.0)
+        self.assertTrue(handler.get_latest_bar_stale("B"))
+        self.assertFalse(handler.get_latest_bar_stale("A"))
+        bars = handler.get_latest_bars("B", 3)
+        self.assertListEqual(list(bars["close_price"]), [1001.0, 1002.0, 1002.0])
+        self.assertListEqual(list(bars.index), [5, 6, 7])
+        self.assertEqual(handler.get_latest_bar("A")["close_price"], 25.0)
+        self.assertEqual(len(handler.get_latest_bar_values("A", "close_price", 100)), 8)
+        while handler.continue_backtest:
+            handler.update_bars()
+        self.assertEqual(handler.get_latest_bar_datetime(), pd.Timestamp("2020-03-20"))
+        with self.assertRaises(KeyError):
+            handler.get_next_open_price("A")
+
+    def test_corporate_actions(self):
+        handler = self.make_handler()
+        for i in range(7):
+            handler.update_bars()
+        self.assertEqual(handler.get_latest_bar_datetime(), pd.Timestamp("2020-02-04"))
+        self.assertEqual(handler.get_latest_bar_split("A"), 2.0)
+        self.assertEqual(handler.get_latest_bar_dividend("A"), 0.25)
+        self.assertEqual(handler.get_latest_bar_split("B"), 1)
+        handler.update_bars()
+        self.assertEqual(handler.get_latest_bar_dividend("A"), 0)
+
+    def test_portfolio_split(self):
+        handler = self.make_handler()
+        portfolio = SimulatedPortfolio(handler, queue.Queue(), None, 1000.0)
+        portfolio.current_positions["A"] = 10
+        for i in range(7):
+            handler.update_bars()
+            portfolio.update_timeindex()
+        # 2 for 1 split and 0.25 dividend per share on 2020-02-04
+        self.assertEqual(portfolio.current_positions["A"], 20)
+        self.assertEqual(portfolio.all_positions[-1]["A"], 20)
+        self.assertEqual(portfolio.current_holdings["cash"], 1005.0)
+
+    def test_column_projection(self):
+        handler = self.make_handler(columns=["open_price", "close_price"])
+        self.assertListEqual(sorted(handler.columns["A"]), ["close_price", "open_price", "price_date"])
+        if self.fmt == "npy":
+            self.assertIsInstance(handler.columns["A"]["close_price"], np.memmap)
+
+    def test_export_datasource(self):
+        db = LocalDb(":memory:")
+        db.import_prices(1, make_prices(pd.bdate_range("2020-01-01", "2020-01-31"), 0))
+        export_datasource(db, self.tmp.name, {"C": 1}, "2020-01-01", "2020-01-31", self.fmt)
+        handler = FilePriceHandler(
+            queue.Queue(), {"C": 1}, dt.datetime(2020, 1, 1),
+            dt.datetime(2020, 1, 31), self.tmp.name, self.fmt
+        )
+        self.assertEqual(len(handler.calendar), 23)
+
+    def test_symbol_without_bars(self):
+        # C only trades after end_dt
+        write_symbol_files(
+            self.tmp.name, "C", make_prices(pd.bdate_range("2020-04-01", "2020-04-30"), 0),
+            self.fmt,
+        )
+        handler = FilePriceHandler(
+            queue.Queue(), {"A": 1, "C": 3}, dt.datetime(2020, 1, 27),
+            dt.datetime(2020, 3, 20), self.tmp.name, self.fmt
+        )
+        handler.update_bars()
+        self.assertTrue(handler.get_latest_bar_stale("C"))
+        self.assertTrue(np.isnan(handler.get_latest_bar_value("C", "close_price")))
+        self.assertEqual(handler.get_latest_bar_value("A", "close_price"), 18.0)
+
+
+@unittest.skipIf(pq is None, "pyarrow is not installed")
+class TestParquetFilePriceHandler(TestFilePriceHandler):
+    fmt = "parquet"
+
+    def test_row_groups(self):
+        # Five bars per row group, only the groups of the session are read
+        prices = make_prices(pd.bdate_range("2020-01-01", "2020-03-31"), 0).reset_index()
+        pq.write_table(
+            pa.Table.from_pandas(prices, preserve_index=False),
+            f"{self.tmp.name}/A.parquet", row_group_size=5,
+        )
+        handler = self.make_handler()
+        dates = handler.columns["A"]["price_date"]
+        self.assertLess(len(dates), len(prices))
+        self.assertLess(dates[0], np.datetime64("2020-01-27"))
+        self.assertGreaterEqual(dates[-1], np.datetime64("2020-03-20"))
+        handler.update_bars()
+        self.assertEqual(handler.get_latest_bar_value("A", "close_price"), 18.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
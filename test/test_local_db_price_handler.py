@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+import os
+import queue
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+import datetime as dt
+
+# Import own module
+from zetatrader.price_handler.local_db import LocalDb, duckdb
+from zetatrader.price_handler.local_db_price_handler import LocalDbPriceHandler
+
+
+def make_prices(dates, offset):
+    close = np.arange(len(dates), dtype=float) + offset
+    return pd.DataFrame(
+        {
+            "open_price": close - 0.5, "high_price": close + 1,
+            "low_price": close - 1, "close_price": close,
+            "adj_close_price": close, "volume": 100.0,
+        },
+        index=pd.DatetimeIndex(dates, name="price_date"),
+    )
+
+
+class TestLocalDbPriceHandler(unittest.TestCase):
+    engine = "sqlite"
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = LocalDb(os.path.join(self.tmp.name, "sec.db"), self.engine)
+        dates = pd.bdate_range("2020-01-01", "2020-06-30")
+        self.db.import_prices(1, make_prices(dates, 0))
+        self.db.import_prices(2, make_prices(dates[::2], 1000))
+        # Another vendor must not be read
+        self.db.import_prices(1, make_prices(dates, -500), data_vendor=1)
+        self.db.import_corporate_actions(
+            1, pd.DataFrame({"split_ratio": [2.0], "dividend": [0.5]},
+                            index=pd.DatetimeIndex(["2020-02-03"], name="action_date"))
+        )
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def make_handler(self, **kwargs):
+        return LocalDbPriceHandler(
+            queue.Queue(), {"A": 1, "B": 2}, dt.datetime(2020, 2, 3),
+            dt.datetime(2020, 5, 29), self.db, **kwargs
+        )
+
+    def test_read_prices(self):
+        prices = self.db.read_prices(1, "2020-02-03", "2020-02-07", data_vendor=6)
+        self.assertEqual(len(prices), 5)
+        self.assertListEqual(list(prices["close_price"]), [23.0, 24.0, 25.0, 26.0, 27.0])
+        last = self.db.read_last_prices(1, dt.datetime(2020, 2, 3), 3, data_vendor=6)
+        self.assertListEqual(list(last["close_price"]), [20.0, 21.0, 22.0])
+
+    def test_replay(self):
+        handler = self.make_handler()
+        handler.update_bars()
+        self.assertEqual(handler.get_latest_bar_datetime(), pd.Timestamp("2020-02-03"))
+        self.assertEqual(handler.get_latest_bar_value("A", "close_price"), 23.0)
+        self.assertEqual(handler.get_latest_bar_split("A"), 2.0)
+        self.assertEqual(handler.get_latest_bar_dividend("A"), 0.5)
+        self.assertEqual(handler.get_latest_bar_split("B"), 1)
+        self.assertEqual(handler.get_next_open_price("A"), 23.5)
+        n_bars = 1
+        while True:
+            handler.update_bars()
+            if not handler.continue_backtest:
+                break
+            n_bars += 1
+        self.assertEqual(n_bars, len(pd.bdate_range("2020-02-03", "2020-05-29")))
+
+    def test_streaming(self):
+        full, streamed = self.make_handler(), self.make_handler(chunk_freq="MS")
+        for i in range(60):
+            full.update_bars()
+            streamed.update_bars()
+        self.assertListEqual(
+            list(full.get_latest_cross_section("close_price")),
+            list(streamed.get_latest_cross_section("close_price")),
+        )
+
+
+@unittest.skipIf(duckdb is None, "duckdb is not installed")
+class TestDuckDbPriceHandler(TestLocalDbPriceHandler):
+    engine = "duckdb"
+
+
+if __name__ == "__main__":
+    unittest.main()
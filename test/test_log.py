@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+import io
+import os
+import json
+import logging
+import tempfile
+import unittest
+
+# Import own module
+from zetatrader import log as zlog
+from zetatrader.log import get_logger, fields, configure, shutdown
+
+
+class TestLog(unittest.TestCase):
+    def tearDown(self):
+        # Back to the library default of no output
+        configure(level="WARNING")
+
+    def test_default_is_disabled(self):
+        configure(level="WARNING")
+        logger = get_logger("portfolio")
+        self.assertEqual(logger.name, "zetatrader.portfolio")
+        self.assertFalse(logger.isEnabledFor(logging.INFO))
+
+    def test_component_levels(self):
+        stream = io.StringIO()
+        configure(level="WARNING", levels={"portfolio": "DEBUG"}, stream=stream,
+                  fmt="%(name)s %(message)s")
+        get_logger("portfolio").debug("fill %s", "AAPL")
+        get_logger("execution").info("hidden")
+        get_logger("execution").warning("shown")
+        self.assertEqual(
+            stream.getvalue().splitlines(),
+            ["zetatrader.portfolio fill AAPL", "zetatrader.execution shown"],
+        )
+
+    def test_structured_fields(self):
+        stream = io.StringIO()
+        configure(stream=stream, fmt="%(message)s")
+        get_logger("portfolio").info("Order filled", extra=fields(symbol="AAPL", price=1.5))
+        self.assertEqual(stream.getvalue().strip(), "Order filled symbol=AAPL price=1.5")
+
+        stream = io.StringIO()
+        configure(stream=stream, as_json=True)
+        get_logger("portfolio").info("Order filled %s", "BUY", extra=fields(symbol="AAPL"))
+        record = json.loads(stream.getvalue())
+        self.assertEqual(record["message"], "Order filled BUY")
+        self.assertEqual(record["symbol"], "AAPL")
+        self.assertEqual(record["logger"], "zetatrader.portfolio")
+
+    def test_rate_limit(self):
+        stream = io.StringIO()
+        configure(stream=stream, rate=2, rate_period=60, fmt="%(message)s")
+        logger = get_logger("portfolio")
+        for i in range(5):
+            logger.info("fill %s", i)
+        logger.info("other")
+        self.assertEqual(stream.getvalue().splitlines(), ["fill 0", "fill 1", "other"])
+
+        # The next record let through reports the dropped ones
+        handler = logging.getLogger("zetatrader").handlers[0]
+        limiter = handler.filters[0]
+        key = ("zetatrader.portfolio", "fill %s")
+        start, count, suppressed = limiter._windows[key]
+        self.assertEqual(suppressed, 3)
+        limiter._windows[key] = (start - 60, count, suppressed)
+        logger.info("fill %s", 5)
+        self.assertEqual(stream.getvalue().splitlines()[-1], "fill 5 suppressed=3")
+
+    def test_async_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "backtest.log")
+            configure(path=path, fmt="%(levelname)s %(message)s")
+            self.assertIsNotNone(zlog._listener)
+            for i in range(100):
+                get_logger("portfolio").info("fill %s", i)
+            shutdown()
+            with open(path) as f:
+                lines = f.read().splitlines()
+            self.assertEqual(len(lines), 100)
+            self.assertEqual(lines[-1], "INFO fill 99")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+import queue
+import unittest
+import numpy as np
+import pandas as pd
+
+# Import own module
+from zetatrader.price_handler.memory_price_handler import (
+    MemoryPriceHandler, synthetic_prices
+)
+
+
+class TestMemoryPriceHandler(unittest.TestCase):
+    def setUp(self):
+        self.symbol_dict = {"A": 1, "B": 2}
+        self.prices = synthetic_prices(self.symbol_dict, 100)
+        # B trades every other day only
+        self.prices[2] = self.prices[2].iloc[::2]
+        dates = self.prices[1].index
+        self.events = queue.Queue()
+        self.handler = MemoryPriceHandler(
+            self.events, self.symbol_dict, dates[10], dates[-1], self.prices,
+            corporate_actions={
+                1: pd.DataFrame({"split_ratio": [2.0], "dividend": [0.0]},
+                                index=pd.DatetimeIndex([dates[20]]))
+            },
+        )
+
+    def replay(self):
+        n = 0
+        while True:
+            self.handler.update_bars()
+            if not self.handler.continue_backtest:
+                return n
+            n += 1
+
+    def test_synthetic_prices(self):
+        a = self.prices[1]
+        self.assertEqual(len(a), 100)
+        self.assertTrue((a["high_price"] >= a[["open_price", "close_price"]].max(axis=1)).all())
+        self.assertTrue((a["low_price"] <= a[["open_price", "close_price"]].min(axis=1)).all())
+        pd.testing.assert_frame_equal(a, synthetic_prices(self.symbol_dict, 100)[1])
+
+    def test_replay_aligns_symbols(self):
+        self.assertEqual(self.replay(), 90)
+        self.assertEqual(self.events.qsize(), 90)
+        self.assertEqual(
+            self.handler.get_latest_bar_value("A", "close_price"),
+            self.prices[1]["close_price"].iloc[-1],
+        )
+        # Last B bar is padded from the bar before
+        self.assertEqual(
+            self.handler.get_latest_bar_value("B", "close_price"),
+            self.prices[2]["close_price"].iloc[-1],
+        )
+
+    def test_corporate_actions(self):
+        for i in range(11):
+            self.handler.update_bars()
+        self.assertEqual(self.handler.get_latest_bar_split("A"), 2.0)
+        self.assertEqual(self.handler.get_latest_bar_split("B"), 1)
+        self.handler.update_bars()
+        self.assertEqual(self.handler.get_latest_bar_split("A"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
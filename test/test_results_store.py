@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+import os
+import unittest
+
+# Import own module
+from zetatrader.trading.results_store import ResultsStore, code_version, run_key
+from zetatrader.trading.optimization import Optimization
+from session_helpers import SessionTestCase, DummieStrategy, session_kwargs
+
+
+class DummieOptimization(Optimization):
+    """Counts the backtests run and crashes after crash_after of them"""
+    def __init__(self, *args, crash_after=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.runs = 0
+        self.crash_after = crash_after
+
+    def _run_backtest_instance(self, strat_param, session_end_dt=None):
+        if self.crash_after is not None and self.runs >= self.crash_after:
+            raise KeyboardInterrupt
+        self.runs += 1
+        return super()._run_backtest_instance(strat_param, session_end_dt)
+
+
+class TestResultsStore(SessionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.path = os.path.join(self.tmp.name, "sweep.db")
+
+    def test_put_get(self):
+        store = ResultsStore(self.path)
+        self.addCleanup(store.close)
+        key = run_key({"a": 1}, "v1", ({"A": 1}, "2010-01-01", "2011-01-01"))
+        self.assertNotEqual(key, run_key({"a": 1}, "v2", ({"A": 1}, "2010-01-01", "2011-01-01")))
+        self.assertIsNone(store.get(key))
+        store.put(key, {"a": 1}, {"Sharpe Ratio": 1.5}, "v1")
+        store.put(key, {"a": 1}, {"Sharpe Ratio": 9.9}, "v1")
+        self.assertEqual(store.get(key), {"Sharpe Ratio": 1.5})
+        self.assertIn(key, store)
+
+        # Another connection reads the runs while the first is open
+        reader = ResultsStore(self.path)
+        self.addCleanup(reader.close)
+        results = reader.results()
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results["a"].iloc[0], 1)
+        self.assertEqual(results["code_version"].iloc[0], "v1")
+
+    def test_code_version(self):
+        self.assertEqual(code_version(DummieStrategy), code_version(DummieStrategy))
+        self.assertNotEqual(code_version(DummieStrategy), code_version(ResultsStore))
+
+    def make_optimization(self, crash_after=None):
+        return DummieOptimization(
+            **session_kwargs(self.tmp.name),
+            strategy_parameters_dict={"hold": [1, 2, 3, 4, 5]},
+            crash_after=crash_after,
+        )
+
+    def test_resume(self):
+        store = ResultsStore(self.path)
+        self.addCleanup(store.close)
+        crashing = self.make_optimization(crash_after=3)
+        with self.assertRaises(KeyboardInterrupt):
+            crashing.optimize_strategy(store=store)
+        self.assertEqual(len(store), 3)
+
+        resumed = self.make_optimization()
+        results = resumed.optimize_strategy(store=store)
+        self.assertEqual(resumed.runs, 2)
+        self.assertEqual(list(results["hold"]), [1, 2, 3, 4, 5])
+        self.assertEqual(len(store), 5)
+
+        fresh = self.make_optimization().optimize_strategy()
+        self.assertEqual(
+            list(results["Sharpe Ratio"].round(10)),
+            list(fresh["Sharpe Ratio"].round(10)),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+import os
+import time
+import unittest
+import pandas as pd
+
+# Import own module
+import threading
+from zetatrader.trading.run_cache import RunCache, session_fingerprint
+from zetatrader.price_handler.local_db import LocalDb
+from zetatrader.trading.backtest import TradingSession
+from session_helpers import SessionTestCase, DummieStrategy, session_kwargs
+
+
+class CountingStrategy(DummieStrategy):
+    """Counts the instances created"""
+    instances = 0
+
+    def __init__(self, bars, events, hold=1):
+        super().__init__(bars, events, hold)
+        CountingStrategy.instances += 1
+
+
+class TestRunCache(SessionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache = RunCache(os.path.join(self.tmp.name, "cache"))
+        CountingStrategy.instances = 0
+
+    def fingerprint(self, backtest_parameters):
+        return session_fingerprint(
+            CountingStrategy, {}, backtest_parameters, {"A": 1}, "2010-01-01", "2011-01-01"
+        )
+
+    def test_datasource_fingerprint(self):
+        path = os.path.join(self.tmp.name, "prices.db")
+        first = LocalDb(path)
+        second = LocalDb(path)
+        self.addCleanup(first.conn.close)
+        self.addCleanup(second.conn.close)
+        # Connections differ, the data they read does not
+        self.assertEqual(
+            self.fingerprint({"price_handler_param": {"datasource": first}}),
+            self.fingerprint({"price_handler_param": {"datasource": second}}),
+        )
+        with self.assertRaises(TypeError):
+            self.fingerprint({"price_handler_param": {"lock": threading.Lock()}})
+
+    def test_unidentifiable_parameter_skips_cache(self):
+        with self.assertLogs("zetatrader.trading.backtest", "WARNING"):
+            session = self.make_session(
+                performance_param={"tearsheet": False, "benchmark": object()}
+            )
+        self.assertIsNone(session.cache)
+        self.assertEqual(CountingStrategy.instances, 1)
+
+    def make_session(self, hold=1, seed=0, **backtest_parameters):
+        kwargs = session_kwargs(
+            self.tmp.name, n_bars=30, seed=seed, strategy=CountingStrategy
+        )
+        kwargs["backtest_parameters"].update(backtest_parameters)
+        return TradingSession(
+            **kwargs,
+            strategy_parameters={"hold": hold},
+            verbose=False,
+            save_results=False,
+            cache=self.cache,
+        )
+
+    def test_hit(self):
+        first = self.make_session().start_trading()
+        second = self.make_session().start_trading()
+        self.assertEqual(CountingStrategy.instances, 1)
+        self.assertEqual(self.cache.hits, 1)
+        pd.testing.assert_frame_equal(first[0], second[0])
+        pd.testing.assert_frame_equal(first[1], second[1])
+        pd.testing.assert_series_equal(first[2], second[2])
+
+    def test_hit_builds_no_components(self):
+        miss = self.make_session()
+        miss.start_trading()
+        self.assertFalse(miss.cache_hit)
+        self.assertIsInstance(miss.strategy, CountingStrategy)
+
+        hit = self.make_session()
+        hit.start_trading()
+        self.assertTrue(hit.cache_hit)
+        for component in (
+            hit.price_handler, hit.strategy, hit.portfolio,
+            hit.execution_handler, hit.performance,
+        ):
+            self.assertIsNone(component)
+
+    def test_miss_on_change(self):
+        self.make_session().start_trading()
+        self.make_session(hold=2).start_trading()
+        # Same dates and symbols, other prices
+        self.make_session(seed=1).start_trading()
+        self.assertEqual(CountingStrategy.instances, 3)
+        self.assertEqual(len(self.cache), 3)
+
+    def test_lru_eviction(self):
+        cache = RunCache(os.path.join(self.tmp.name, "lru"), max_entries=2)
+        cache.put("a", 1)
+        time.sleep(0.01)
+        cache.put("b", 2)
+        time.sleep(0.01)
+        self.assertEqual(cache.get("a"), 1)
+        time.sleep(0.01)
+        cache.put("c", 3)
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertIn("c", cache)
+
+    def test_size_eviction(self):
+        cache = RunCache(os.path.join(self.tmp.name, "size"), max_bytes=3000)
+        for key in "abcd":
+            cache.put(key, b"x" * 1000)
+            time.sleep(0.01)
+        self.assertEqual(len(cache), 2)
+        self.assertIn("d", cache)
+
+
+    def test_stale_tmp_swept(self):
+        cache = RunCache(os.path.join(self.tmp.name, "tmp"))
+        stale = os.path.join(cache.path, "a.pkl.123.tmp")
+        fresh = os.path.join(cache.path, "b.pkl.456.tmp")
+        for path in (stale, fresh):
+            with open(path, "wb") as f:
+                f.write(b"partial")
+        old = time.time() - 2 * cache.TMP_TTL
+        os.utime(stale, (old, old))
+        cache.put("c", 3)
+        self.assertFalse(os.path.exists(stale))
+        # A younger file may still be written by another process
+        self.assertTrue(os.path.exists(fresh))
+        self.assertEqual(len(cache), 1)
+
+    def test_unreadable_entry_is_miss(self):
+        cache = RunCache(os.path.join(self.tmp.name, "bad"))
+        with open(cache._file("a"), "wb") as f:
+            f.write(b"not a pickle")
+        # Pickle of a class that no longer exists
+        with open(cache._file("b"), "wb") as f:
+            f.write(b"cno_such_module\nThing\n.")
+        with self.assertLogs("zetatrader.trading.run_cache", "WARNING"):
+            self.assertIsNone(cache.get("a"))
+            self.assertIsNone(cache.get("b"))
+        self.assertNotIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertEqual(cache.misses, 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+import unittest
+import numpy as np
+
+# Import own module
+from zetatrader.trading.search import (
+    GridSearch, RandomSearch, LatinHypercubeSearch, BayesianSearch,
+    SuccessiveHalving
+)
+from zetatrader.trading.optimization import Optimization
+from session_helpers import SessionTestCase, session_kwargs
+
+
+def drain(search, score=None):
+    trials = []
+    trial = search.ask()
+    while trial is not None:
+        trials.append(trial)
+        search.tell(trial[0], score(trial[0]) if score else 0.0)
+        trial = search.ask()
+    return trials
+
+
+class TestSearch(unittest.TestCase):
+    def test_grid_is_lazy(self):
+        space = {"a": list(range(100)), "b": list(range(100)), "c": list(range(100))}
+        search = GridSearch(space)
+        self.assertEqual(len(search), 10 ** 6)
+        self.assertEqual(search.ask(), ({"a": 0, "b": 0, "c": 0}, 1.0))
+        self.assertEqual(search.ask(), ({"a": 0, "b": 0, "c": 1}, 1.0))
+        with self.assertRaises(ValueError):
+            GridSearch({"a": (0.0, 1.0)})
+
+    def test_random_within_space(self):
+        space = {"a": [1, 2, 3], "b": (0.5, 1.5), "c": (1, 10)}
+        trials = drain(RandomSearch(space, n=50, seed=1))
+        self.assertEqual(len(trials), 50)
+        for params, fraction in trials:
+            self.assertIn(params["a"], [1, 2, 3])
+            self.assertTrue(0.5 <= params["b"] <= 1.5)
+            self.assertIsInstance(params["c"], int)
+            self.assertTrue(1 <= params["c"] <= 10)
+        self.assertEqual(trials, drain(RandomSearch(space, n=50, seed=1)))
+
+    def test_latin_hypercube_strata(self):
+        trials = drain(LatinHypercubeSearch({"a": (0, 9), "b": list(range(10))}, n=10, seed=0))
+        # Every one of the 10 strata is sampled once per parameter
+        self.assertEqual(sorted(p["a"] for p, _ in trials), list(range(10)))
+        self.assertEqual(sorted(p["b"] for p, _ in trials), list(range(10)))
+
+    def test_bayesian_finds_optimum(self):
+        def score(p):
+            return -((p["x"] - 0.7) ** 2)
+        trials = drain(BayesianSearch({"x": (0.0, 1.0)}, n=20, n_initial=5, seed=0), score)
+        self.assertEqual(len(trials), 20)
+        best = max((p["x"] for p, _ in trials), key=lambda x: score({"x": x}))
+        self.assertAlmostEqual(best, 0.7, delta=0.02)
+
+    def test_successive_halving(self):
+        search = SuccessiveHalving({"x": list(range(9))}, n=9, eta=3, sampler=GridSearch({"x": list(range(9))}))
+        trials = drain(search, lambda p: p["x"])
+        fractions = [f for _, f in trials]
+        self.assertEqual(fractions, [1 / 9] * 9 + [1 / 3] * 3 + [1.0])
+        self.assertEqual(trials[-1][0], {"x": 8})
+
+    def test_successive_halving_out_of_order(self):
+        space = {"x": list(range(9))}
+        search = SuccessiveHalving(space, n=9, eta=3, sampler=GridSearch(space))
+        # Every first round run is given out before any score comes back
+        first = [search.ask() for _ in range(9)]
+        self.assertIsNone(search.ask())
+        for params, fraction in reversed(first[1:]):
+            search.tell(params, params["x"], fraction)
+            self.assertIsNone(search.ask())
+        search.tell(first[0][0], 0, first[0][1])
+        second = [search.ask() for _ in range(3)]
+        self.assertEqual([p["x"] for p, _ in second], [8, 7, 6])
+        self.assertEqual({f for _, f in second}, {1 / 3})
+        # A late score of the first round is not counted in the second
+        search.tell({"x": 0}, 100, 1 / 9)
+        for params, fraction in second:
+            search.tell(params, params["x"], fraction)
+        self.assertEqual(search.ask(), ({"x": 8}, 1.0))
+
+
+class TestOptimizationSearch(SessionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.optimization = Optimization(
+            **session_kwargs(self.tmp.name, n_bars=60),
+            strategy_parameters_dict={"hold": [1, 2, 3, 4]},
+        )
+
+    def test_grid_default(self):
+        results = self.optimization.optimize_strategy()
+        self.assertEqual(list(results["hold"]), [1, 2, 3, 4])
+        self.assertIn("Sharpe Ratio", results.columns)
+
+    def test_run_budget(self):
+        results = self.optimization.optimize_strategy(
+            search=RandomSearch({"hold": (1, 5)}, n=None, seed=0), max_runs=3
+        )
+        self.assertEqual(len(results), 3)
+
+    def test_successive_halving_fractions(self):
+        results = self.optimization.optimize_strategy(
+            search=SuccessiveHalving({"hold": [1, 2, 3, 4]}, n=4, eta=2, seed=0)
+        )
+        self.assertEqual(list(results["Session Fraction"].fillna(1.0)), [0.25] * 4 + [0.5] * 2 + [1.0])
+        self.assertTrue(np.isfinite(results["Sharpe Ratio"].iloc[-1]))
+
+
+if __name__ == "__main__":
+    unittest.main()
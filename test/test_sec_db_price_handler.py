@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+import queue
+import unittest
+import numpy as np
+import pandas as pd
+import datetime as dt
+
+# Import own module
+from zetatrader.price_handler.base import BarRecord
+from zetatrader.price_handler.sec_db_price_handler import SecDbPriceHandler
+
+
+class DummieDatasource:
+    """Serves PRICES from memory and counts the queries"""
+
+    def __init__(self, prices):
+        self.prices = prices
+        self.queries = 0
+
+    def read_prices(self, symbol_id, start_dt, end_dt, frequency="daily",
+                    data_vendor=None, end_inclusive=True):
+        self.queries += 1
+        df = self.prices[symbol_id]
+        return df[(df.index >= start_dt) & (df.index <= end_dt)]
+
+    def read_last_prices(self, symbol_id, before_dt, n, frequency="daily",
+                         data_vendor=None):
+        self.queries += 1
+        df = self.prices[symbol_id]
+        return df[df.index < before_dt].tail(n)
+
+    def read_corporate_action(self, symbol_id, action_date, field,
+                              data_vendor=None):
+        if field == "split_ratio" and action_date == pd.Timestamp("2020-03-02"):
+            return 2.0
+        return None
+
+
+def make_prices(dates, offset):
+    close = np.arange(len(dates), dtype=float) + offset
+    return pd.DataFrame(
+        {
+            "open_price": close, "high_price": close + 1, "low_price": close - 1,
+            "close_price": close, "adj_close_price": close, "volume": 100.0,
+        },
+        index=pd.DatetimeIndex(dates, name="price_date"),
+    )
+
+
+class TestSecDbPriceHandler(unittest.TestCase):
+    def setUp(self):
+        dates = pd.bdate_range("2019-12-02", "2020-03-31")
+        self.ds = DummieDatasource({
+            1: make_prices(dates, 0),
+            2: make_prices(dates.drop(pd.Timestamp("2020-03-03")), 1000),
+        })
+        self.handler = SecDbPriceHandler(
+            queue.Queue(), [1, 2], insample_size_est=0, datasource=self.ds
+        )
+        self.handler.set_handler_datetime(dt.datetime(2020, 2, 28), dt.datetime(2020, 3, 31))
+
+    def test_update_bars(self):
+        handler = self.handler
+        handler.update_bars()
+        bar = handler.get_latest_bar(2)
+        self.assertEqual(bar["price_date"], pd.Timestamp("2020-03-02"))
+        self.assertEqual(bar.close_price, handler.get_latest_bar_value(2, "close_price"))
+        self.assertEqual(handler.get_latest_bar_split(1), 2.0)
+        self.assertEqual(handler.get_latest_bar_dividend(1), 0)
+        handler.update_bars()
+        # Padded from the day before
+        self.assertEqual(handler.get_latest_bar(2).close_price, bar.close_price)
+        self.assertListEqual(
+            list(handler.get_latest_cross_section("close_price")),
+            [handler.get_latest_bar_value(s, "close_price") for s in [1, 2]],
+        )
+        while handler.continue_backtest:
+            handler.update_bars()
+        self.assertEqual(handler.get_latest_bar_datetime(1), pd.Timestamp("2020-03-31"))
+
+    def test_lookback_cache(self):
+        handler = self.handler
+        handler.update_bars()
+        queries = self.ds.queries
+        closes = handler.get_latest_bars_values(1, "close_price", 20)
+        self.assertEqual(len(closes), 20)
+        self.assertEqual(self.ds.queries, queries + 2)
+        for i in range(10):
+            handler.get_latest_bars_values(2, "close_price", 20)
+            handler.get_latest_bars(1, 15)
+            handler.update_bars()
+        self.assertEqual(self.ds.queries, queries + 2)
+        self.assertEqual(len(handler.get_latest_bars(1, 20)), 20)
+        # Every bar from 2019-12-02 to 2020-03-16
+        self.assertEqual(len(handler.get_latest_bars_values(1, "close_price", 500)), 76)
+        handler.get_latest_bars_values(1, "close_price", 600)
+        self.assertEqual(self.ds.queries, queries + 4)
+
+    def test_latest_bar_record(self):
+        handler = self.handler
+        handler.update_bars()
+        bar = handler.get_latest_bar(1)
+        self.assertIsInstance(bar, BarRecord)
+        self.assertEqual(bar.price_date, pd.Timestamp("2020-03-02"))
+        self.assertEqual(bar.open_price, bar["open_price"])
+        self.assertEqual(bar.high_price, bar.close_price + 1)
+        # The record is a copy, later bars do not change it
+        handler.update_bars()
+        self.assertEqual(bar.price_date, pd.Timestamp("2020-03-02"))
+        self.assertEqual(handler.get_latest_bar(1).close_price, bar.close_price + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+import unittest
+
+# Import own module
+from zetatrader.trading.backtest import TradingSession
+from zetatrader.trading.profiler import SessionProfiler
+from session_helpers import SessionTestCase, session_kwargs
+
+
+class TestSessionProfiler(SessionTestCase):
+    def make_session(self, profile):
+        return TradingSession(
+            **session_kwargs(self.tmp.name, n_bars=20),
+            verbose=False,
+            save_results=False,
+            profile=profile,
+        )
+
+    def test_disabled(self):
+        session = self.make_session(False)
+        self.assertIsNone(session.profiler)
+        self.assertEqual(len(session.start_trading()), 4)
+
+    def test_summary(self):
+        session = self.make_session(True)
+        results = session.start_trading()
+        self.assertEqual(len(results), 5)
+        summary = results[4]
+        calls = summary["calls"]
+        # One extra update_bars call ends the loop
+        self.assertEqual(calls["price_handler.update_bars"], 21)
+        self.assertEqual(calls["MARKET"], 20)
+        self.assertEqual(calls["strategy.calculate_signals"], 20)
+        self.assertEqual(calls["portfolio.update_timeindex"], 20)
+        self.assertEqual(calls["SIGNAL"], session.signals)
+        self.assertEqual(calls["portfolio.update_signal"], 40)
+        self.assertEqual(calls["ORDER"], session.orders)
+        self.assertEqual(calls["FILL"], session.fills)
+        self.assertEqual(set(summary["level"]), {"handler", "event"})
+        self.assertTrue((summary["p50_us"] <= summary["p99_us"]).all())
+        self.assertTrue((summary["p99_us"] <= summary["max_us"]).all())
+        self.assertLessEqual(summary.loc["MARKET", "loop_%"], 100)
+
+    def test_bounded_samples(self):
+        profiler = SessionProfiler(reservoir_size=100, seed=1)
+        for ns in range(1, 10001):
+            profiler.record("MARKET", ns * 1000)
+        profiler.loop_ns = 10 ** 12
+        self.assertEqual(len(profiler.samples["MARKET"].reservoir), 100)
+        row = profiler.summary().loc["MARKET"]
+        self.assertEqual(row["calls"], 10000)
+        self.assertAlmostEqual(row["mean_us"], 5000.5)
+        self.assertEqual(row["max_us"], 10000)
+        # Percentiles of the reservoir are close to the true ones
+        self.assertAlmostEqual(row["p50_us"], 5000, delta=1500)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+import os
+import queue
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import datetime as dt
+import pandas as pd
+
+# Import own module
+from zetatrader.price_handler.tick_price_handler import TickPriceHandler
+from zetatrader.price_handler.tick_price_handler import write_tick_file
+from zetatrader.strategy.strategy import Strategy
+from zetatrader.portfolio.futures_portfolio import FuturesPortfolio
+from zetatrader.execution_handler.execution import SimulatedExecution
+from zetatrader.performance.trading_stats import TradingStats
+from zetatrader.trading.backtest import TradingSession
+
+
+class IdleStrategy(Strategy):
+    def calculate_signals(self, event):
+        pass
+
+
+class TestTickPriceHandler(unittest.TestCase):
+    def setUp(self):
+        self.tick_dir = tempfile.mkdtemp()
+        start = dt.datetime(2021, 1, 4, 9, 0)
+        # EURUSD ticks every 15 seconds for 3 minutes
+        eurusd = pd.DataFrame({
+            "timestamp": [start + dt.timedelta(seconds=15 * i) for i in range(12)],
+            "bid": [1.0 + 0.001 * i for i in range(12)],
+            "ask": [1.0002 + 0.001 * i for i in range(12)],
+            "bidVolume": 1.0,
+            "askVolume": 1.0,
+        })
+        # GBPUSD only trades in the first minute
+        gbpusd = pd.DataFrame({
+            "timestamp": [start + dt.timedelta(seconds=30 * i) for i in range(2)],
+            "bid": [1.3, 1.31],
+            "ask": [1.3, 1.31],
+        })
+        write_tick_file(os.path.join(self.tick_dir, "EURUSD.ticks"), eurusd)
+        write_tick_file(os.path.join(self.tick_dir, "GBPUSD.ticks"), gbpusd)
+        self.start = start
+
+    def tearDown(self):
+        shutil.rmtree(self.tick_dir)
+
+    def _handler(self, **kwargs):
+        handler = TickPriceHandler(
+            queue.Queue(),
+            {"EURUSD": 1, "GBPUSD": 2},
+            self.start,
+            self.start + dt.timedelta(hours=1),
+            self.tick_dir,
+            **kwargs
+        )
+        self.addCleanup(handler.close)
+        return handler
+
+    def test_bar_aggregation(self):
+        # Small chunks force bars to span several chunk reads
+        handler = self._handler(barsize="1MIN", chunk_size=3)
+        bars = 0
+        while True:
+            handler.update_bars()
+            if not handler.continue_backtest:
+                break
+            bars += 1
+        self.assertEqual(bars, 3)
+        self.assertEqual(handler.events.qsize(), 3)
+
+        latest = handler.get_latest_bars("EURUSD", 3)
+        self.assertEqual(list(latest["volume"]), [4.0, 4.0, 4.0])
+        self.assertAlmostEqual(latest["open_price"].iloc[0], 1.0001)
+        self.assertAlmostEqual(latest["high_price"].iloc[0], 1.0031)
+        self.assertAlmostEqual(latest["close_price"].iloc[2], 1.0111)
+        self.assertEqual(
+            handler.get_latest_bar_datetime(), self.start + dt.timedelta(minutes=2)
+        )
+        # GBPUSD is padded with its last close
+        self.assertEqual(handler.get_latest_bar_value("GBPUSD", "close_price"), 1.31)
+        self.assertEqual(handler.get_latest_bar_value("GBPUSD", "volume"), 0.0)
+
+    def test_tick_replay(self):
+        handler = self._handler(barsize=None)
+        handler.update_bars()
+        # GBPUSD has not ticked yet, its bar is padded
+        self.assertTrue(np.isnan(handler.get_latest_bar_value("GBPUSD", "close_price")))
+        self.assertEqual(handler.get_latest_bar_value("GBPUSD", "volume"), 0.0)
+        self.assertEqual(handler.get_latest_bar_value("EURUSD", "volume"), 1.0)
+        self.assertEqual(len(handler.get_latest_bars("GBPUSD", 10)), 1)
+        handler.update_bars()
+        self.assertEqual(handler.get_latest_tick("EURUSD")["bid"], 1.0)
+        self.assertEqual(handler.get_latest_tick("GBPUSD")["bid"], 1.3)
+        self.assertAlmostEqual(handler.get_next_open_price("EURUSD"), 1.0011)
+        # EURUSD is carried forward on the GBPUSD tick
+        self.assertEqual(handler.get_latest_bar_value("EURUSD", "close_price"), 1.0001)
+        self.assertEqual(handler.get_latest_bar_value("EURUSD", "volume"), 0.0)
+
+    def test_tick_replay_session(self):
+        symbol_info = {
+            s: {"lotMin": 1, "contract size": 1, "leverage": 1}
+            for s in ["EURUSD", "GBPUSD"]
+        }
+        output_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_path)
+        session = TradingSession(
+            {"EURUSD": 1, "GBPUSD": 2},
+            initial_capital=10000,
+            session_start_dt=self.start,
+            session_end_dt=self.start + dt.timedelta(hours=1),
+            price_handler=TickPriceHandler,
+            execution_handler=SimulatedExecution,
+            portfolio=FuturesPortfolio,
+            strategy=IdleStrategy,
+            performance=TradingStats,
+            output_path=output_path,
+            backtest_parameters={
+                "price_handler_param": {"tick_dir": self.tick_dir, "barsize": None},
+                "performance_param": {"tearsheet": False},
+                "portfolio": {"symbol_info": symbol_info},
+            },
+            verbose=False,
+            save_results=False,
+        )
+        session._run_session()
+        # Every tick of both symbols is one bar of the portfolio
+        self.assertEqual(len(session.portfolio.all_holdings), 15)
+
+    def test_lookback_is_bounded(self):
+        handler = self._handler(barsize="1MIN", lookback=2)
+        for i in range(3):
+            handler.update_bars()
+        self.assertEqual(len(handler.get_latest_bars("EURUSD", 10)), 2)
+
+    def test_start_dt_seek(self):
+        handler = TickPriceHandler(
+            queue.Queue(),
+            {"EURUSD": 1},
+            self.start + dt.timedelta(minutes=2),
+            self.start + dt.timedelta(minutes=2, seconds=30),
+            self.tick_dir,
+            barsize=None,
+        )
+        ticks = 0
+        while True:
+            handler.update_bars()
+            if not handler.continue_backtest:
+                break
+            ticks += 1
+        self.assertEqual(ticks, 3)
+        # The files are closed at the end of the replay
+        self.assertTrue(handler.readers["EURUSD"]._file.closed)
+
+    def test_close(self):
+        with self._handler(barsize="1MIN") as handler:
+            handler.update_bars()
+            readers = list(handler.readers.values())
+            self.assertFalse(any(r._file.closed for r in readers))
+        self.assertTrue(all(r._file.closed for r in readers))
+        # Ticks already read stay available
+        self.assertEqual(handler.get_latest_bar_value("GBPUSD", "close_price"), 1.31)
+
+
+if __name__ == "__main__":
+    unittest.main()
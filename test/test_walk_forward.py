@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+import unittest
+
+# Import own module
+from zetatrader.price_handler.memory_price_handler import MemoryDatasource
+from zetatrader.trading.walk_forward import WalkForward
+from session_helpers import SessionTestCase, session_kwargs
+
+
+class TestWalkForward(SessionTestCase):
+    def make_walk_forward(self, n_jobs=1):
+        kwargs = session_kwargs(self.tmp.name, n_bars=120)
+        # Bars are read from the datasource of every fold
+        del kwargs["price_handler"]
+        prices = kwargs["backtest_parameters"].pop("price_handler_param")["prices"]
+        self.dates = prices[1].index
+        return WalkForward(
+            **kwargs,
+            strategy_parameters_dict={"hold": [1, 3, 5]},
+            datasource=MemoryDatasource(prices),
+            n_splits=3,
+            n_jobs=n_jobs,
+        )
+
+    def test_folds(self):
+        folds = self.make_walk_forward().construct_folds()
+        self.assertEqual(len(folds), 3)
+        self.assertEqual(folds[0][0], self.dates[0])
+        for train_start, train_end, test_start, test_end in folds:
+            self.assertLess(train_start, train_end)
+            self.assertLess(train_end, test_start)
+            self.assertLessEqual(test_start, test_end)
+        # Test windows follow each other without overlap
+        for prev, fold in zip(folds, folds[1:]):
+            self.assertLess(prev[3], fold[2])
+
+    def test_run(self):
+        curve, folds, metrics = self.make_walk_forward().run()
+        self.assertEqual(len(folds), 3)
+        self.assertTrue(folds["hold"].isin([1, 3, 5]).all())
+        self.assertEqual(list(curve["fold"].unique()), [0, 1, 2])
+        self.assertTrue(curve.index.is_monotonic_increasing)
+        self.assertAlmostEqual(
+            curve["total"].iloc[-1],
+            10000 * (1 + curve["returns"]).prod(),
+        )
+        self.assertIn("Sharpe Ratio", metrics.index)
+
+    def test_parallel_matches_serial(self):
+        _, serial, _ = self.make_walk_forward().run()
+        _, parallel, _ = self.make_walk_forward(n_jobs=2).run()
+        self.assertEqual(list(serial["hold"]), list(parallel["hold"]))
+        self.assertEqual(
+            list(serial["test Sharpe Ratio"]), list(parallel["test Sharpe Ratio"])
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
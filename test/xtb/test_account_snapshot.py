@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+import unittest
+
+# Import own modules
+from zetatrader.xtb.account import XtbAccountSnapshot
+from zetatrader.portfolio.xtb_portfolio import XtbPortfolio
+
+
+class DummieConnection:
+    def __init__(self):
+        self.calls = {}
+        self.close_price = 1.1
+
+    def _count(self, name):
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def get_account_info(self):
+        self._count('get_account_info')
+        return {
+            'currency': 'USD', 'equity': 1000.0, 'balance': 990.0
+            , 'margin': 50.0, 'margin_free': 950.0, 'margin_level': 2000.0
+        }
+
+    def get_open_positions(self):
+        self._count('get_open_positions')
+        return [{
+            'symbol': 'EURUSD', 'close_price': self.close_price, 'cmd': 0
+            , 'open_price': 1.0, 'open_time': 1600000000000, 'volume': 0.1
+            , 'profit': 10.0, 'position': 1234
+        }]
+
+    def get_margin_requirement(self, symbol, volume):
+        self._count('get_margin_requirement')
+        return 50.0
+
+    def get_symbol_info(self, symbol, as_df=True):
+        self._count('get_symbol_info')
+        return {
+            'tickValue': 1.0, 'tickSize': 0.00001, 'contractSize': 100000
+            , 'leverage': 30, 'lotMin': 0.01
+        }
+
+
+class DummiePriceHandler:
+    """Has no prices, the portfolio must not query it for margins"""
+    def __init__(self):
+        self.symbol_list = ['EURUSD', 'GBPUSD']
+
+
+class DummieEvents:
+    def __init__(self):
+        self.items = []
+
+    def put(self, x):
+        self.items.append(x)
+
+
+class TestXtbAccountSnapshot(unittest.TestCase):
+    def test_refresh(self):
+        connection = DummieConnection()
+        account = XtbAccountSnapshot(connection)
+        account.refresh()
+        self.assertEqual(account.currency, 'USD')
+        self.assertEqual(account.equity, 1000.0)
+        self.assertEqual(len(account.open_trades), 1)
+        self.assertEqual(connection.calls['get_account_info'], 1)
+        self.assertEqual(connection.calls['get_open_positions'], 1)
+
+    def test_streaming_balance_skips_margin_level(self):
+        connection = DummieConnection()
+        account = XtbAccountSnapshot(connection)
+        account.refresh()
+        account.update_balance({
+            'command': 'balance'
+            , 'data': {'equity': 1200.0, 'balance': 1100.0, 'margin': 60.0}
+        })
+        account.refresh()
+        self.assertEqual(account.equity, 1200.0)
+        self.assertEqual(account.margin, 60.0)
+        self.assertEqual(connection.calls['get_account_info'], 1)
+        self.assertEqual(connection.calls['get_open_positions'], 2)
+
+    def test_margin_requirement_cache(self):
+        connection = DummieConnection()
+        account = XtbAccountSnapshot(connection)
+        self.assertEqual(account.get_margin_requirement('EURUSD', 0), 0)
+        self.assertEqual(account.get_margin_requirement('EURUSD', 0.1), 50.0)
+        self.assertEqual(account.get_margin_requirement('EURUSD', 0.1), 50.0)
+        self.assertEqual(connection.calls['get_margin_requirement'], 1)
+
+    def test_margin_requirement_new_quote(self):
+        connection = DummieConnection()
+        account = XtbAccountSnapshot(connection)
+        self.assertEqual(account.get_margin_requirement('EURUSD', 0.1, 1.0), 50.0)
+        # The cached margin is scaled by the price ratio
+        self.assertAlmostEqual(account.get_margin_requirement('EURUSD', 0.1, 1.2), 60.0)
+        self.assertEqual(connection.calls['get_margin_requirement'], 1)
+        account.margin_ttl = 0
+        self.assertEqual(account.get_margin_requirement('EURUSD', 0.1, 1.2), 50.0)
+        self.assertEqual(connection.calls['get_margin_requirement'], 2)
+
+    def test_portfolio_api_fan_out(self):
+        connection = DummieConnection()
+        portfolio = XtbPortfolio(
+            DummieEvents(), DummiePriceHandler(), connection
+        )
+        self.assertEqual(portfolio.account_currency, 'USD')
+        self.assertEqual(connection.calls['get_account_info'], 1)
+
+        for i in range(3):
+            portfolio.update_timeindex(None)
+        # One margin level and one trades request per bar
+        self.assertEqual(connection.calls['get_account_info'], 4)
+        self.assertEqual(connection.calls['get_open_positions'], 4)
+        self.assertEqual(connection.calls['get_margin_requirement'], 1)
+        self.assertEqual(portfolio.current_positions['EURUSD'], 0.1)
+        self.assertEqual(portfolio.current_holdings['EURUSD'], 50.0 * 30)
+        self.assertEqual(portfolio.current_margins['GBPUSD'], 0)
+
+        # A new price of the open trade scales the cached margin
+        connection.close_price = 1.21
+        portfolio.update_timeindex(None)
+        self.assertEqual(connection.calls['get_margin_requirement'], 1)
+        self.assertAlmostEqual(portfolio.current_margins['EURUSD'], 55.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+import unittest
+import datetime as dt
+
+# Import own modules
+from zetatrader.xtb.api import XRest
+from zetatrader.xtb.pool import XtbConnectionPool
+
+
+class DummieConnection(XRest):
+    """XRest without a socket, its helpers run on the dummie commands"""
+    def __init__(self, user=None, pw=None, sess_name='Test', islive=False):
+        self.sess_name = sess_name
+        self.stream_session_id = sess_name
+        self.commands = []
+        self.alive = True
+        self.reconnects = 0
+
+    def commandExecute(self, commandName, arguments=None):
+        self.commands.append(commandName)
+        return {'status': True, 'returnData': {'margin': 10.0, 'quotations': []}}
+
+    def is_alive(self):
+        return self.alive
+
+    def reconnect(self):
+        self.reconnects += 1
+        self.alive = True
+        return True
+
+    def disconnect(self):
+        pass
+
+
+class TestXtbConnectionPool(unittest.TestCase):
+    def test_routing(self):
+        pool = XtbConnectionPool(connection_factory=DummieConnection)
+        pool.commandExecute('getChartRangeRequest', {})
+        pool.commandExecute('tradeTransaction', {})
+        pool.commandExecute('getSymbol', {})
+        self.assertEqual(
+            pool.get_connection('history').commands, ['getChartRangeRequest']
+        )
+        self.assertEqual(
+            pool.get_connection('trade').commands
+            , ['tradeTransaction', 'getSymbol']
+        )
+
+    def test_xrest_helpers_are_routed(self):
+        pool = XtbConnectionPool(connection_factory=DummieConnection)
+        self.assertEqual(pool.get_margin_requirement('EURUSD', 0.1), 10.0)
+        self.assertEqual(pool.get_connection('trade').commands, ['getMarginTrade'])
+        pool.get_tick_price('EURUSD', dt.datetime(2021, 1, 4))
+        self.assertEqual(pool.get_connection('history').commands, ['getTickPrices'])
+
+    def test_attributes_of_default_connection(self):
+        pool = XtbConnectionPool(sess_name='pool', connection_factory=DummieConnection)
+        self.assertEqual(pool.stream_session_id, 'pool-trade')
+        with self.assertRaises(AttributeError):
+            pool._lock
+
+    def test_single_connection(self):
+        pool = XtbConnectionPool(
+            roles=('trade',), connection_factory=DummieConnection
+        )
+        pool.commandExecute('getChartRangeRequest', {})
+        self.assertEqual(
+            pool.get_connection().commands, ['getChartRangeRequest']
+        )
+
+    def test_health_check_reconnects(self):
+        pool = XtbConnectionPool(connection_factory=DummieConnection)
+        pool.get_connection('history').alive = False
+        status = pool.health_check()
+        self.assertEqual(status, {'trade': True, 'history': False})
+        self.assertEqual(pool.get_connection('history').reconnects, 1)
+        self.assertEqual(pool.get_connection('trade').reconnects, 0)
+        pool.disconnect()
+
+
+if __name__ == '__main__':
+    unittest.main()
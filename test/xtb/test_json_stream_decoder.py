@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+import json
+import unittest
+
+# Import own modules
+from zetatrader.xtb.xAPIConnector import JsonStreamDecoder
+
+
+class TestJsonStreamDecoder(unittest.TestCase):
+    def test_single_message(self):
+        decoder = JsonStreamDecoder()
+        decoder.feed(b'{"status": true, "returnData": {"time": 1}}\n\n')
+        self.assertTrue(decoder.has_message())
+        self.assertEqual(decoder.pop()['returnData']['time'], 1)
+        self.assertFalse(decoder.has_message())
+        self.assertEqual(decoder.buffered, 0)
+
+    def test_message_split_across_chunks(self):
+        payload = json.dumps(
+            {"status": True, "returnData": {"rateInfos": [{"ctm": i} for i in range(500)]}}
+        ).encode('utf-8') + b'\n\n'
+        decoder = JsonStreamDecoder()
+        # Split the terminator itself across two chunks
+        for i in range(0, len(payload), 7):
+            decoder.feed(payload[i:i + 7])
+        self.assertEqual(len(decoder.pop()['returnData']['rateInfos']), 500)
+
+    def test_terminator_straddles_chunks(self):
+        decoder = JsonStreamDecoder()
+        decoder.feed(b'{"a": 1}\n')
+        self.assertFalse(decoder.has_message())
+        decoder.feed(b'\n{"b": 2}')
+        self.assertEqual(decoder.pop(), {"a": 1})
+        self.assertFalse(decoder.has_message())
+        decoder.feed(b'\n\n')
+        self.assertEqual(decoder.pop(), {"b": 2})
+
+    def test_multiple_messages_in_one_chunk(self):
+        decoder = JsonStreamDecoder()
+        self.assertEqual(decoder.feed(b'{"a": 1}\n\n{"b": 2}\n\n{"c"'), 2)
+        self.assertEqual(decoder.pop(), {"a": 1})
+        self.assertEqual(decoder.pop(), {"b": 2})
+        self.assertEqual(decoder.buffered, len(b'{"c"'))
+
+
+if __name__ == '__main__':
+    unittest.main()
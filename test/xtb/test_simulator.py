@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+import unittest
+
+# Import own modules
+from zetatrader.event import OrderEvent
+from zetatrader.xtb.api import XRest
+from zetatrader.xtb.price_data import PriceData
+from zetatrader.xtb.execution import XtbExecution
+from zetatrader.xtb.simulator import XtbSimulator, synthetic_bars
+
+
+class DummieEvents:
+    def __init__(self):
+        self.items = []
+
+    def put(self, x):
+        self.items.append(x)
+
+    def get(self):
+        if self.items:
+            return self.items.pop(0)
+
+
+class TestXtbSimulator(unittest.TestCase):
+    def setUp(self):
+        self.bars = synthetic_bars(['EURUSD'], 600)
+        self.sim = XtbSimulator(
+            self.bars, user='1234', password='pw', start_index=500
+        ).start()
+        self.client = XRest(
+            '1234', 'pw', address=self.sim.host, port=self.sim.port
+            , encrypt=False
+        )
+
+    def tearDown(self):
+        self.client.disconnect()
+        self.sim.stop()
+
+    def test_price_data(self):
+        handler = PriceData(DummieEvents(), ['EURUSD'], self.client, '1MIN')
+        bars = handler.get_latest_bars('EURUSD', 3)
+        expected = self.bars['EURUSD'].iloc[498:501].reset_index(drop=True)
+        self.assertListEqual(
+            list(bars['price_date']), list(expected['price_date'])
+        )
+        for field in ['open_price', 'high_price', 'low_price', 'close_price']:
+            for a, b in zip(bars[field], expected[field]):
+                self.assertAlmostEqual(a, b, places=4)
+
+        # Only published bars are visible
+        self.sim.advance()
+        bar = handler.get_latest_bar('EURUSD')
+        self.assertEqual(
+            bar.loc[0, 'price_date'], self.bars['EURUSD'].loc[501, 'price_date']
+        )
+
+    def test_market_order(self):
+        events = DummieEvents()
+        executor = XtbExecution(events, self.client)
+        executor.execute_order(OrderEvent('EURUSD', 'MKT', 0.1, 'BUY'))
+        trades = self.client.get_open_positions()
+        self.assertEqual(len(trades), 1)
+        self.assertEqual(trades[0]['volume'], 0.1)
+
+        # Partial exit of the open trade
+        executor.execute_order(OrderEvent(
+            'EURUSD', 'MKT', 0.04, 'SELL', lot_id=trades[0]['position']
+            , isexit=True
+        ))
+        trades = self.client.get_open_positions()
+        self.assertAlmostEqual(trades[0]['volume'], 0.06)
+
+    def test_market_closed(self):
+        self.sim.market_open = False
+        executor = XtbExecution(DummieEvents(), self.client)
+        executor.execute_order(OrderEvent('EURUSD', 'MKT', 0.1, 'BUY'))
+        self.assertEqual(len(executor.pending_orders), 1)
+
+    def test_reconnect(self):
+        self.sim.drop_connections()
+        self.assertTrue(self.client.ping())
+
+    def test_rate_limit(self):
+        self.sim.rate_limit = 1
+        self.client.ping()
+        with self.assertRaises(Exception):
+            self.client.ping()
+
+
+if __name__ == '__main__':
+    unittest.main()
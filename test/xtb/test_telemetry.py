@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+import os
+import csv
+import tempfile
+import unittest
+
+# Import own modules
+from zetatrader.event import OrderEvent
+from zetatrader.xtb.api import XRest
+from zetatrader.xtb.execution import XtbExecution
+from zetatrader.xtb.simulator import XtbSimulator, synthetic_bars
+from zetatrader.xtb.telemetry import (
+    Histogram, Telemetry, PrometheusTextSink, RollingCsvSink
+)
+
+
+class DummieEvents:
+    def __init__(self):
+        self.items = []
+
+    def put(self, x):
+        self.items.append(x)
+
+
+class TestTelemetry(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_histogram(self):
+        hist = Histogram(buckets=(0.01, 0.1))
+        for v in [0.005, 0.01, 0.05, 0.5]:
+            hist.observe(v)
+        self.assertEqual(hist.cumulative(), [('0.01', 2), ('0.1', 3), ('+Inf', 4)])
+        self.assertEqual(hist.count, 4)
+        self.assertAlmostEqual(hist.sum, 0.565)
+
+    def test_marks(self):
+        telemetry = Telemetry()
+        self.assertIsNone(telemetry.observe_since('x', 'signal', 'EURUSD'))
+        telemetry.mark('signal', 'EURUSD', timestamp=100.0)
+        elapsed = telemetry.observe_since(
+            'signal_to_order_sent', 'signal', 'EURUSD', now=100.25
+            , symbol='EURUSD'
+        )
+        self.assertAlmostEqual(elapsed, 0.25)
+        hist = telemetry.histograms[('signal_to_order_sent', (('symbol', 'EURUSD'),))]
+        self.assertEqual(hist.count, 1)
+        self.assertIn('signal_to_order_sent p50=250.0ms', telemetry.summary())
+
+    def test_prometheus_sink(self):
+        path = os.path.join(self.tmp.name, 'metrics.prom')
+        telemetry = Telemetry([PrometheusTextSink(path)], buckets=(0.1,))
+        telemetry.observe('api_round_trip', 0.05, command='ping')
+        telemetry.increment('api_errors', command='ping')
+        telemetry.flush()
+        with open(path) as f:
+            text = f.read()
+        self.assertIn('# TYPE zetatrader_api_round_trip_seconds histogram', text)
+        self.assertIn(
+            'zetatrader_api_round_trip_seconds_bucket{command="ping",le="0.1"} 1'
+            , text
+        )
+        self.assertIn('zetatrader_api_round_trip_seconds_count{command="ping"} 1', text)
+        self.assertIn('zetatrader_api_errors_total{command="ping"} 1', text)
+
+    def test_csv_sink_rotates(self):
+        path = os.path.join(self.tmp.name, 'spans.csv')
+        sink = RollingCsvSink(path, max_bytes=200, backups=2)
+        telemetry = Telemetry([sink])
+        for i in range(20):
+            telemetry.observe('api_round_trip', 0.01, command='ping')
+        telemetry.close()
+        self.assertTrue(os.path.exists(path + '.1'))
+        self.assertTrue(os.path.exists(path + '.2'))
+        self.assertFalse(os.path.exists(path + '.3'))
+        with open(path + '.1') as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0], RollingCsvSink.HEADER)
+        self.assertEqual(rows[1][1:], ['api_round_trip', 'command=ping', '0.010000'])
+
+    def test_tick(self):
+        path = os.path.join(self.tmp.name, 'metrics.prom')
+        telemetry = Telemetry(
+            [PrometheusTextSink(path)], summary_interval=60, flush_interval=10
+        )
+        telemetry.observe('api_round_trip', 0.01)
+        telemetry.tick(now=telemetry._last_flush + 1)
+        self.assertFalse(os.path.exists(path))
+        telemetry.tick(now=telemetry._last_flush + 10)
+        self.assertTrue(os.path.exists(path))
+
+
+class TestXtbTelemetry(unittest.TestCase):
+    def setUp(self):
+        self.sim = XtbSimulator(
+            synthetic_bars(['EURUSD'], 600), user='1234', password='pw'
+            , start_index=500
+        ).start()
+        self.telemetry = Telemetry()
+        self.client = XRest(
+            '1234', 'pw', address=self.sim.host, port=self.sim.port
+            , encrypt=False, telemetry=self.telemetry
+        )
+
+    def tearDown(self):
+        self.client.disconnect()
+        self.sim.stop()
+
+    def count(self, metric, **labels):
+        hist = self.telemetry.histograms.get(
+            (metric, tuple(sorted(labels.items())))
+        )
+        return 0 if hist is None else hist.count
+
+    def test_api_round_trip(self):
+        self.assertEqual(self.count('api_round_trip', command='login'), 1)
+        self.client.ping()
+        self.client.ping()
+        self.assertEqual(self.count('api_round_trip', command='ping'), 2)
+
+    def test_order_latency(self):
+        executor = XtbExecution(DummieEvents(), self.client, telemetry=self.telemetry)
+        self.telemetry.mark('signal', 'EURUSD')
+        executor.execute_order(OrderEvent('EURUSD', 'MKT', 0.1, 'BUY'))
+        self.assertEqual(self.count('signal_to_order_sent', symbol='EURUSD'), 1)
+        self.assertEqual(self.count('order_sent_to_fill', symbol='EURUSD'), 1)
+        self.assertEqual(self.count('api_round_trip', command='tradeTransaction'), 1)
+
+    def test_reconnects(self):
+        reconnects = ('reconnects', ())
+        self.client.reconnect_backoff = 0.01
+        # A rejected login is not a reconnect
+        self.sim.password = 'changed'
+        self.sim.drop_connections()
+        self.assertFalse(self.client.reconnect())
+        self.assertEqual(self.telemetry.counters.get(reconnects, 0), 0)
+
+        self.sim.password = 'pw'
+        self.assertTrue(self.client.reconnect())
+        self.assertEqual(self.telemetry.counters[reconnects], 1)
+        self.assertTrue(self.client.ping())
+
+    def test_stream_session_refreshed(self):
+        stream = DummieEvents()
+        self.client.attach_stream(stream)
+        self.assertEqual(stream._ssId, 'simulator')
+        stream._ssId = 'stale'
+        self.sim.drop_connections()
+        self.assertTrue(self.client.ping())
+        self.assertEqual(stream._ssId, 'simulator')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,6 +7,9 @@
 from abc import ABCMeta, abstractmethod
 
 from zetatrader.event import FillEvent
+from zetatrader.log import get_logger
+
+log = get_logger("execution")
 
 
 class ExecutionHandler(object):
@@ -95,7 +98,7 @@ class SimulatedExecution(ExecutionHandler):
                 try:
                     fill_cost = self.bars.get_next_open_price(event.symbol)
                 except:
-                    print("%s Order Not Filled" % event.symbol)
+                    log.warning("%s Order Not Filled", event.symbol)
                 else:
                     fill_event = FillEvent(
                         timeindex,
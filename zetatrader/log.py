@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+
+# log.py
+# Darren Yeap
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+import logging.handlers
+
+ROOT = "zetatrader"
+DEFAULT_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+# Library default: nothing is written until the application calls configure,
+# and records below WARNING are dropped by the level check before any
+# message is formatted
+_root = logging.getLogger(ROOT)
+_root.addHandler(logging.NullHandler())
+_root.setLevel(logging.WARNING)
+
+_listener = None
+_lock = threading.Lock()
+
+
+def get_logger(component):
+    """Returns the logger of a component, e.g. get_logger('portfolio')
+    gives the 'zetatrader.portfolio' logger. Its level can be set on its own
+    through configure(levels=...).
+    """
+    if component == ROOT or component.startswith(ROOT + "."):
+        return logging.getLogger(component)
+    return logging.getLogger(f"{ROOT}.{component}")
+
+
+def fields(**kwargs):
+    """Returns the extra argument attaching structured fields to a record,
+    e.g. log.info("Order filled", extra=fields(symbol="AAPL", price=1.2))
+    """
+    return {"fields": kwargs}
+
+
+# ================================#
+# FORMATTERS AND FILTERS
+# ================================#
+class StructuredFormatter(logging.Formatter):
+    """Formats a record as text followed by its fields as key=value pairs,
+    or as one JSON object per line when as_json is set.
+    """
+
+    def __init__(self, fmt=DEFAULT_FORMAT, as_json=False):
+        super().__init__(fmt)
+        self.as_json = as_json
+
+    def format(self, record):
+        record_fields = getattr(record, "fields", None) or {}
+        if self.as_json:
+            data = {
+                "time": self.formatTime(record),
+                "level": record.levelname,
+                "logger": record.name,
+                "message": record.getMessage(),
+            }
+            data.update(record_fields)
+            if record.exc_info:
+                data["exc_info"] = self.formatException(record.exc_info)
+            return json.dumps(data, default=str)
+        text = super().format(record)
+        if record_fields:
+            text += " " + " ".join(f"{k}={v}" for k, v in record_fields.items())
+        return text
+
+
+class RateLimitFilter(logging.Filter):
+    """Lets through at most rate records per period seconds for each logger
+    and message template. The number of records dropped is added to the
+    next record let through as the suppressed field.
+    """
+
+    def __init__(self, rate=10, period=1.0):
+        super().__init__()
+        self.rate = rate
+        self.period = period
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            start, count, suppressed = self._windows.get(key, (now, 0, 0))
+            if now - start >= self.period:
+                start, count = now, 0
+            if count >= self.rate:
+                self._windows[key] = (start, count, suppressed + 1)
+                return False
+            self._windows[key] = (start, count + 1, 0)
+        if suppressed:
+            record_fields = dict(getattr(record, "fields", None) or {})
+            record_fields["suppressed"] = suppressed
+            record.fields = record_fields
+        return True
+
+
+# ================================#
+# CONFIGURATION
+# ================================#
+def configure(
+    level="INFO",
+    levels=None,
+    path=None,
+    stream=None,
+    async_file=True,
+    rate=None,
+    rate_period=1.0,
+    as_json=False,
+    fmt=DEFAULT_FORMAT,
+):
+    """Configures the zetatrader loggers. Replaces any earlier configuration
+    and leaves the root logger untouched.
+
+    Args:
+        level (str or int, optional): Level of every component
+        levels (dict, optional): Component to level, e.g.
+            {'portfolio': 'DEBUG', 'xtb.api': 'WARNING'}
+        path (str, optional): Log file. Defaults to None, no file.
+        stream (file, optional): Stream to log to as well, e.g. sys.stderr
+        async_file (bool, optional): Writes the file from a background
+            thread so the engine never waits on disk I/O. Defaults to True.
+        rate (int, optional): Records let through per logger and message
+            template every rate_period seconds. Defaults to None, no limit.
+        as_json (bool, optional): One JSON object per line
+        fmt (str, optional): Text format when as_json is False
+    """
+    global _listener
+    with _lock:
+        shutdown()
+        root = logging.getLogger(ROOT)
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+            if not isinstance(handler, logging.NullHandler):
+                handler.close()
+        root.setLevel(level)
+        # Component levels are kept until configured again
+        for name in logging.root.manager.loggerDict:
+            if name.startswith(ROOT + "."):
+                logging.getLogger(name).setLevel(logging.NOTSET)
+        for component, component_level in (levels or {}).items():
+            get_logger(component).setLevel(component_level)
+        # Other libraries configuring the root logger must not duplicate
+        # every record
+        root.propagate = False
+
+        formatter = StructuredFormatter(fmt, as_json)
+        handlers = []
+        if path is not None:
+            file_handler = logging.FileHandler(path)
+            file_handler.setFormatter(formatter)
+            if async_file:
+                log_queue = queue.SimpleQueue()
+                _listener = logging.handlers.QueueListener(
+                    log_queue, file_handler, respect_handler_level=True
+                )
+                _listener.start()
+                handlers.append(logging.handlers.QueueHandler(log_queue))
+            else:
+                handlers.append(file_handler)
+        if stream is not None:
+            stream_handler = logging.StreamHandler(stream)
+            stream_handler.setFormatter(formatter)
+            handlers.append(stream_handler)
+        if not handlers:
+            handlers.append(logging.NullHandler())
+
+        for handler in handlers:
+            if rate is not None:
+                handler.addFilter(RateLimitFilter(rate, rate_period))
+            root.addHandler(handler)
+
+
+def shutdown():
+    """Writes the records waiting in the async file queue and stops its
+    thread.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(shutdown)
@@ -15,6 +15,11 @@ from os import listdir, times
 from os.path import isdir, join
 from scipy.stats import kurtosis, skew
 
+# Import own modules
+from zetatrader.log import get_logger
+
+log = get_logger("performance")
+
 
 class TradingStats:
     """The performance class is a stats tracker for a trading session that
@@ -99,7 +104,7 @@ class TradingStats:
         """Replaces output path with current script path."""
         script_path = os.path.dirname(os.path.abspath(__file__))
         self.output_path = script_path
-        print("None output file given.\nOutput file set as %s" % script_path)
+        log.info("None output file given. Output file set as %s", script_path)
 
     # ========================
     # POST-BACKTEST STATISTICS
@@ -134,7 +139,7 @@ class TradingStats:
             ) - 1
         except:
             # Print Warning of missing benchmark
-            print(f"Benchmark {self.benchmark} not found!")
+            log.warning("Benchmark %s not found!", self.benchmark)
         else:
             # Update curve
             return curve
@@ -211,6 +216,8 @@ class TradingStats:
         Returns:
             [dict]: Symbol as dict keys and trade-by-trade dataframe as value
         """
+        if trade_log.empty:
+            return {}
         instruments = list(trade_log["symbol"].unique())
         trade_log.set_index(["symbol"], inplace=True)
 
@@ -254,10 +261,11 @@ class TradingStats:
                 equity_curve.to_csv(
                     self.output_path + r"/equity/%s.csv" % self.output_number
                 )
-                print(
-                    "Curve %s saved at " % self.output_number
-                    + self.output_path
-                    + r"/equity/%s.csv" % self.output_number
+                log.info(
+                    "Curve %s saved at %s/equity/%s.csv",
+                    self.output_number,
+                    self.output_path,
+                    self.output_number,
                 )
                 break
 
@@ -272,10 +280,11 @@ class TradingStats:
                 trade_log.to_csv(
                     self.output_path + r"/tradelog/%s.csv" % self.output_number
                 )
-                print(
-                    "TradeLog %s saved at " % self.output_number
-                    + self.output_path
-                    + r"/tradelog/%s.csv" % self.output_number
+                log.info(
+                    "TradeLog %s saved at %s/tradelog/%s.csv",
+                    self.output_number,
+                    self.output_path,
+                    self.output_number,
                 )
                 break
         return trade_log
@@ -4,8 +4,11 @@ import numpy as np
 import pandas as pd
 from math import floor
 from zetatrader.event import OrderEvent
+from zetatrader.log import get_logger
 from zetatrader.portfolio.simulated_portfolio import AbstractPortfolio
 
+log = get_logger("portfolio")
+
 
 class FuturesPortfolio(AbstractPortfolio):
     """A simulation portfolio for futures and CFDs."""
@@ -335,7 +338,7 @@ class FuturesPortfolio(AbstractPortfolio):
                 isexit=True,
             )
         elif signal.signal_type == "EXIT" and cur_quantity == 0:
-            print(f"No {signal.symbol} position to exit")
+            log.warning("No %s position to exit", signal.symbol)
         else:
             raise f"Incorrect Signal combination given"
 
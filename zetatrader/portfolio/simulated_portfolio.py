@@ -1,8 +1,12 @@
 
 from os import curdir
+import logging
 from zetatrader.event import OrderEvent
+from zetatrader.log import get_logger, fields
 from zetatrader.portfolio.base import AbstractPortfolio
 
+log = get_logger('portfolio')
+
 class SimulatedPortfolio(AbstractPortfolio):
     """Simulates a portfolio of equities and holds position sizing
     algorithms tailored for Equities asset classes.
@@ -108,7 +112,7 @@ class SimulatedPortfolio(AbstractPortfolio):
             for s in self.symbol_list:
                 split = self.bars.get_latest_bar_split(s)
                 if split != 1.000000 and split >0.000000:
-                    print("%s initiate: %s for 1 split" %(s, split))
+                    log.info("%s initiate: %s for 1 split", s, split)
                     self.current_positions[s] = self.current_positions[s] * \
                         split
                     dp[s] = self.current_positions[s]
@@ -148,11 +152,9 @@ class SimulatedPortfolio(AbstractPortfolio):
                         dh['total'] += cash_dividend
 
                         if self.current_positions[s] > 0:
-                            print('%s issues: %s of total dividends' %(s,
-                                    self.bars.get_latest_bar_dividend(s)
-                                    *
-                                    self.current_positions[s]
-                                )
+                            log.info(
+                                '%s issues: %s of total dividends', s
+                                , cash_dividend
                             )
             else:
                 dh[s] = self.all_holdings[-1][s]
@@ -253,10 +255,13 @@ class SimulatedPortfolio(AbstractPortfolio):
         self.current_holdings['total'] -=  fill.commission 
         self.total_equity = self.current_holdings['total']     
 
-        print(
-            '%s %s Order filled - date:%s price:%s size:%s units' %(
-                    fill.direction, fill.symbol, self.bars.get_datetime()
-                    , fill_cost, fill.quantity
+        # Arguments are only evaluated when the record is logged
+        if log.isEnabledFor(logging.INFO):
+            log.info(
+                '%s %s Order filled', fill.direction, fill.symbol
+                , extra=fields(
+                    date=self.bars.get_datetime(), price=fill_cost
+                    , size=fill.quantity
                 )
             )
 
@@ -300,7 +305,7 @@ class SimulatedPortfolio(AbstractPortfolio):
                 isexit=True
             )
         elif signal.signal_type  == 'EXIT' and cur_quantity == 0:
-            print(f'No {signal.symbol} position to exit')
+            log.warning('No %s position to exit', signal.symbol)
         else:
             raise f'Incorrect Signal combination given'
 
@@ -2,7 +2,11 @@ import time
 import datetime as dt
 from math import floor
 from zetatrader.event import OrderEvent
+from zetatrader.log import get_logger
 from zetatrader.portfolio.simulated_portfolio import AbstractPortfolio
+from zetatrader.xtb.account import XtbAccountSnapshot
+
+log = get_logger('xtb.portfolio')
 
 def fromtimestamp(x):
     return dt.datetime.fromtimestamp(x)
@@ -11,10 +15,14 @@ class XtbPortfolio(AbstractPortfolio):
     """This class provides interface for interacting with our holdings
     at XTB and order management of new and existing positions.
     """
-    def __init__(self, events, bars, connection):
+    def __init__(self, events, bars, connection, account=None):
         self.bars = bars
         self.events = events
         self.connection = connection
+        self.account = account
+        if self.account is None:
+            self.account = XtbAccountSnapshot(self.connection)
+        self.account.refresh()
         self.symbol_list = self.bars.symbol_list
         self.symbol_info = self.construct_symbol_info()
         self.cmd_dict = {0 : 1, 1 : -1}
@@ -47,31 +55,35 @@ class XtbPortfolio(AbstractPortfolio):
     def round_down(self, volume, lot_size):
         return floor(volume*(1/lot_size))/(1/lot_size)
 
+    def _current_price(self, symbol):
+        """Current price of symbol from the open trades of this bar's
+        account snapshot, None without open trades.
+        """
+        for lot in self.current_lots[symbol].values():
+            return lot['close_price']
+        return None
+
 
     # ==================================================== #
     # ACCOUNT INFO CONSTRUCTOR
     # ==================================================== # 
     def get_account_currency(self):
-        """[summary]
+        """Retrives the currency of the account from account snapshot.
         """
-        acc_info = self.connection.get_account_info()
-        return acc_info['currency']
+        return self.account.currency
     
     def get_equity(self):
         """Retrives the equity value of the account 
         """
-        acc_info = self.connection.get_account_info()
-        return acc_info['equity']
+        return self.account.equity
     
     def get_balance(self):
         """Retrives the balance of account. 
         """
-        acc_info = self.connection.get_account_info()
-        return acc_info['balance']
+        return self.account.balance
     
     def get_margin(self):
-        acc_info = self.connection.get_account_info()
-        return acc_info['margin']
+        return self.account.margin
 
     # ==================================================== #
     # PORTFOLIO CONSTRUCTOR
@@ -96,11 +108,11 @@ class XtbPortfolio(AbstractPortfolio):
         self.current_positions = self.construct_current_position()
         self.current_margins = self.construct_current_margins()
         self.current_holdings = self.construct_current_holdings()
-        print('Initial Portfolio Constructed') 
+        log.info('Initial Portfolio Constructed')
 
     def get_current_lots(self):
         """Populates a dictionary with lot information from brokerage account"""
-        open_trades = self.connection.get_open_positions()
+        open_trades = self.account.open_trades
         d = {}
         # Create position dict
         for i in self.symbol_list:
@@ -119,6 +131,7 @@ class XtbPortfolio(AbstractPortfolio):
                     'trade_price': lot['open_price'],
                     'trade_date': fromtimestamp(lot['open_time']/1000),
                     'volume': lot['volume'],
+                    'close_price': lot['close_price'],
                     'profits': lot['profit']# In Account Currency
                 }
         return d
@@ -159,8 +172,11 @@ class XtbPortfolio(AbstractPortfolio):
         d['datetime'] = dt.datetime.now()
         for symbol in self.symbol_list:
             volume = self.current_positions[symbol]
-            d[symbol] = self.connection.get_margin_requirement(symbol, volume)
-            time.sleep(0.2) # To prevent flooding API
+            if volume == 0:
+                continue
+            d[symbol] = self.account.get_margin_requirement(
+                symbol, volume, self._current_price(symbol)
+            )
             total_margin += d[symbol]
         d['total'] = self.total_equity
         d['cash'] = self.total_equity -total_margin
@@ -209,11 +225,11 @@ class XtbPortfolio(AbstractPortfolio):
     def update_timeindex(self, event):
         """Updates Snapshot of position value and information
         """
-        # Update Account Value
-        account_info = self.connection.get_account_info()
-        self.total_equity = account_info['equity'] 
-        self.balance = account_info['balance']
-        self.total_margin = account_info['margin']
+        # Update Account Value with a single snapshot refresh
+        self.account.refresh()
+        self.total_equity = self.get_equity()
+        self.balance = self.get_balance()
+        self.total_margin = self.get_margin()
 
         # Update Current lots, then position, then holdings. 
         self.current_lots = self.get_current_lots()
@@ -373,7 +389,7 @@ class XtbPortfolio(AbstractPortfolio):
                 isexit=True
             )
         elif signal.signal_type  == 'EXIT' and cur_quantity == 0:
-            print(f'No {signal.symbol} position to exit')
+            log.warning('No %s position to exit', signal.symbol)
         else:
             raise f'Incorrect Signal combination given'
 
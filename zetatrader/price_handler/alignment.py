@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+
+# alignment.py
+# Darren Yeap
+import numpy as np
+import pandas as pd
+
+
+def union_calendar(frames):
+    """Returns the sorted union of the date index of every frame"""
+    indexes = [f.index.values for f in frames if len(f) > 0]
+    if not indexes:
+        return pd.DatetimeIndex([], name="price_date")
+    return pd.DatetimeIndex(np.unique(np.concatenate(indexes)), name="price_date")
+
+
+def align_arrays(frames, fields, calendar=None, carry=None):
+    """Aligns date indexed frames to one calendar in a single vectorized pass.
+    Bars missing from a symbol are forward filled from its previous bar, or
+    from carry before its first bar.
+
+    Args:
+        frames (list): Date indexed dataframe per symbol
+        fields (list): Columns to align
+        calendar (DatetimeIndex, optional): Bars to align to, e.g. an
+            exchange calendar. A row dated between two calendar bars is
+            padded into the next one. Defaults to the union of every
+            frame's dates.
+        carry (array, optional): Last values per symbol before the calendar,
+            shape (symbols, fields). Defaults to NaN.
+
+    Returns:
+        tuple: calendar, values of shape (bars, symbols, fields) and stale
+            mask of shape (bars, symbols), True where the bar is padded
+    """
+    if calendar is None:
+        calendar = union_calendar(frames)
+    else:
+        calendar = pd.DatetimeIndex(calendar, name="price_date")
+    n_bars, n_symbols, n_fields = len(calendar), len(frames), len(fields)
+
+    # Row 0 holds the carried values, calendar bars start at row 1
+    values = np.full((n_bars + 1, n_symbols, n_fields), np.nan)
+    filled = np.zeros((n_bars + 1, n_symbols), dtype=bool)
+    present = np.zeros((n_bars + 1, n_symbols), dtype=bool)
+    if carry is not None:
+        values[0] = carry
+    cal = calendar.values.astype("datetime64[ns]")
+    for j, df in enumerate(frames):
+        if len(df) == 0:
+            continue
+        dates = df.index.values.astype("datetime64[ns]")
+        rows = np.searchsorted(cal, dates, side="left")
+        keep = rows < n_bars
+        # Last row of the frame at or before each calendar bar
+        rows, last = np.unique(rows[keep][::-1], return_index=True)
+        src = np.flatnonzero(keep)[::-1][last]
+        values[rows + 1, j] = df[fields].to_numpy(dtype=float)[src]
+        filled[rows + 1, j] = True
+        present[rows + 1, j] = dates[src] == cal[rows]
+
+    # Index of the last filled row at or before every bar
+    source = np.where(filled, np.arange(n_bars + 1)[:, None], 0)
+    np.maximum.accumulate(source, axis=0, out=source)
+    aligned = values[source[1:], np.arange(n_symbols)[None, :]]
+    return calendar, aligned, ~present[1:]
+
+
+def align_symbol_frames(symbol_data, symbol_list, calendar=None, carry=None):
+    """Aligns every symbol to one calendar and returns integer indexed
+    frames with a price_date column and a boolean stale column.
+
+    Args:
+        symbol_data (dict): Symbol as key and date indexed dataframe
+        symbol_list (list): Symbols to align
+        calendar (DatetimeIndex, optional): Bars to align to
+        carry (dict, optional): Symbol as key and a one row dataframe holding
+            the last bar before the calendar
+
+    Returns:
+        dict: Symbol as key and aligned dataframe
+    """
+    frames = [symbol_data[s] for s in symbol_list]
+    fields = list(frames[0].columns)
+    carry_values = None
+    if carry is not None:
+        carry_values = np.full((len(symbol_list), len(fields)), np.nan)
+        for j, s in enumerate(symbol_list):
+            row = carry.get(s)
+            if row is not None and len(row) > 0:
+                carry_values[j] = row[fields].to_numpy(dtype=float)[-1]
+
+    calendar, values, stale = align_arrays(frames, fields, calendar, carry_values)
+    aligned = {}
+    for j, s in enumerate(symbol_list):
+        df = pd.DataFrame(values[:, j, :], columns=fields)
+        df.insert(0, "price_date", calendar)
+        df["stale"] = stale[:, j]
+        aligned[s] = df
+    return aligned
@@ -69,14 +69,90 @@ class AbstractPriceHandler:
         """
         raise NotImplementedError("Should implement update_bars()")
 
+    def get_latest_cross_section(self, val_type, symbols=None):
+        """
+        Returns the latest val_type of every symbol as a numpy vector
+        aligned with symbols (default symbol_list). Price handlers
+        override this with a vectorized version.
+        """
+        if symbols is None:
+            symbols = self.symbol_list
+        return np.array(
+            [self.get_latest_bar_value(s, val_type) for s in symbols]
+        )
+
+    def get_latest_cross_sections(self, val_type, N=1, symbols=None):
+        """
+        Returns the last N val_type of every symbol as a N x symbols numpy
+        matrix, oldest bar first. Rows before the first bar are NaN.
+        """
+        if symbols is None:
+            symbols = self.symbol_list
+        matrix = np.full((N, len(symbols)), np.nan)
+        for j, s in enumerate(symbols):
+            values = np.asarray(self.get_latest_bars_values(s, val_type, N))
+            if len(values) > 0:
+                matrix[N - len(values):, j] = values
+        return matrix
+
+
+class BarRecord:
+    """
+    Lightweight read only bar returned by price handlers instead of a pandas
+    Series. Fields are read as attributes or with bar["close_price"].
+    """
+    __slots__ = (
+        "price_date", "open_price", "high_price", "low_price", "close_price"
+        , "volume"
+    )
+
+    def __init__(self, price_date, open_price, high_price, low_price
+        , close_price, volume
+    ):
+        self.price_date = price_date
+        self.open_price = open_price
+        self.high_price = high_price
+        self.low_price = low_price
+        self.close_price = close_price
+        self.volume = volume
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key)
+
+    def __repr__(self):
+        return "BarRecord(%s)" % ", ".join(
+            "%s=%s" % (f, getattr(self, f)) for f in self.__slots__
+        )
 
-# class Abstract_Tick_Handler:
-#     """
-#     A slightly modified version of Abstract Price Handler that will mimick a 
-#     price handler used in tick-by-tick trading where only the last 
-#     price (tick) flows through the event-driven system.  
-#     """
+    def to_dict(self):
+        return {f: getattr(self, f) for f in self.__slots__}
 
-#      __metaclass__ = ABCMeta
 
-     
\ No newline at end of file
+def stack_symbol_field(symbol_data, symbol_list, val_type):
+    """
+    Returns val_type of every symbol stacked as a bars x symbols numpy
+    matrix and the integer index of its first row. Every frame must share
+    the same integer index.
+    """
+    frames = [symbol_data[s] for s in symbol_list]
+    matrix = np.column_stack([f[val_type].to_numpy() for f in frames])
+    return matrix, int(frames[0].index[0]) if len(frames[0]) > 0 else 0
+
+
+class AbstractTickHandler(AbstractPriceHandler):
+    """
+    A slightly modified version of Abstract Price Handler that will mimick a 
+    price handler used in tick-by-tick trading where only the last 
+    price (tick) flows through the event-driven system.  
+    """
+    __metaclass__ = ABCMeta
+
+    @abstractmethod
+    def get_latest_tick(self, symbol):
+        """
+        Returns the last tick (timestamp, bid, ask, bid and ask volume).
+        """
+        raise NotImplementedError("Should implement get_latest_tick()")
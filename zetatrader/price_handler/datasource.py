@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+
+# datasource.py
+# Darren Yeap
+import os
+import re
+import queue
+import pymysql
+import threading
+import numpy as np
+import pandas as pd
+from contextlib import contextmanager
+
+PRICE_COLUMNS = [
+    "price_date", "open_price", "high_price", "low_price", "close_price",
+    "adj_close_price", "volume"
+]
+CORPORATE_ACTION_COLUMNS = ["split_ratio", "dividend"]
+
+# Table name prefixes are identifiers and cannot be sent as parameters
+_IDENTIFIER = re.compile(r"^[a-z][a-z0-9_]*$")
+
+
+def price_table(frequency):
+    """Returns the price table of a frequency, e.g. daily_price. Raises
+    ValueError for anything that is not a plain identifier.
+    """
+    if not isinstance(frequency, str) or not _IDENTIFIER.match(frequency):
+        raise ValueError(f"Invalid price frequency: {frequency!r}")
+    return f"{frequency}_price"
+
+
+def columns_to_frame(columns, rows, index=None):
+    """Builds a dataframe from fetched rows, one numpy array per column.
+    Numeric database types such as DECIMAL are converted to float.
+    """
+    if rows:
+        values = list(zip(*rows))
+    else:
+        values = [()] * len(columns)
+    data = {}
+    for name, col in zip(columns, values):
+        if name.endswith("_date"):
+            data[name] = pd.to_datetime(np.asarray(col, dtype=object))
+        else:
+            try:
+                data[name] = np.asarray(col, dtype=float)
+            except (TypeError, ValueError):
+                data[name] = np.asarray(col, dtype=object)
+    df = pd.DataFrame(data, columns=columns)
+    if index is not None:
+        df.set_index(index, inplace=True)
+    return df
+
+
+class DbConfig:
+    """Connection settings of securities_db"""
+
+    def __init__(self, host="localhost", user=None, password=None,
+                 db="securities_db", port=3306):
+        self.host = host
+        self.user = user
+        self.password = password
+        self.db = db
+        self.port = int(port)
+
+    @classmethod
+    def from_env(cls, prefix="SEC_DB", **overrides):
+        """Reads {prefix}_HOST, {prefix}_USER, {prefix}_PW, {prefix}_NAME
+        and {prefix}_PORT. Settings missing from the environment fall back
+        to zetatrader.credentials when that module exists. Keyword
+        arguments that are not None take precedence.
+        """
+        config = cls()
+        try:
+            from zetatrader.credentials import securities_db_cred
+        except ImportError:
+            pass
+        else:
+            config = cls.from_credentials(securities_db_cred)
+
+        env = {
+            "host": os.environ.get(f"{prefix}_HOST"),
+            "user": os.environ.get(f"{prefix}_USER"),
+            "password": os.environ.get(f"{prefix}_PW"),
+            "db": os.environ.get(f"{prefix}_NAME"),
+            "port": os.environ.get(f"{prefix}_PORT"),
+        }
+        env.update(overrides)
+        for key, value in env.items():
+            if value is not None:
+                setattr(config, key, int(value) if key == "port" else value)
+        return config
+
+    @classmethod
+    def from_credentials(cls, cred):
+        """Creates config from a securities_db_cred style dictionary"""
+        return cls(
+            host=cred.get("db_host", "localhost"),
+            user=cred.get("db_user"),
+            password=cred.get("db_pass"),
+            db=cred.get("db_name", "securities_db"),
+            port=cred.get("db_port", 3306),
+        )
+
+    def key(self):
+        return (self.host, self.port, self.user, self.password, self.db)
+
+    def __repr__(self):
+        return f"DbConfig(host={self.host}, port={self.port}, user={self.user}, db={self.db})"
+
+
+class ConnectionPool:
+    """Thread safe pool of at most size pymysql connections. Connections
+    are opened on first use and checked with ping before being handed out.
+    """
+
+    def __init__(self, config, size=4):
+        self.config = config
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def _open(self):
+        return pymysql.connect(
+            host=self.config.host,
+            port=self.config.port,
+            user=self.config.user,
+            password=self.config.password,
+            database=self.config.db,
+        )
+
+    def acquire(self, timeout=None):
+        """Returns an idle connection, opening one while below size"""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_open = self._opened < self.size
+                if can_open:
+                    self._opened += 1
+            if not can_open:
+                conn = self._idle.get(timeout=timeout)
+            else:
+                try:
+                    return self._open()
+                except Exception:
+                    with self._lock:
+                        self._opened -= 1
+                    raise
+        try:
+            conn.ping(reconnect=True)
+        except Exception:
+            self.discard(conn)
+            return self.acquire(timeout)
+        return conn
+
+    def release(self, conn):
+        self._idle.put(conn)
+
+    def discard(self, conn):
+        """Closes a broken connection so a new one is opened instead"""
+        with self._lock:
+            self._opened -= 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        except Exception:
+            self.discard(conn)
+            raise
+        else:
+            self.release(conn)
+
+    def close(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self.discard(conn)
+
+    def _after_fork(self):
+        """Forgets the connections of the parent process without closing
+        them, closing would end the parent's sessions on the shared sockets.
+        """
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _reset_pools():
+    """Runs in a forked child. Pools held by data sources of the parent
+    start empty and the child opens its own connections.
+    """
+    global _pools_lock
+    _pools_lock = threading.Lock()
+    for pool in _pools.values():
+        pool._after_fork()
+    _pools.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_pools)
+
+
+def get_pool(config, size=4):
+    """Returns the pool shared by every data source of this process using
+    the same config. A forked child gets new pools.
+    """
+    with _pools_lock:
+        pool = _pools.get(config.key())
+        if pool is None:
+            pool = ConnectionPool(config, size)
+            _pools[config.key()] = pool
+        return pool
+
+
+class SecuritiesDb:
+    """Data access to the securities_db price and corporate action tables.
+    Every query is parameterized and connections come from a pool shared
+    within the process.
+    """
+
+    def __init__(self, config=None, pool_size=4, arraysize=10000):
+        """Initialize data source.
+
+        Args:
+            config (DbConfig, optional): Connection settings. Defaults to
+                DbConfig.from_env().
+            pool_size (int, optional): Connections kept per config
+            arraysize (int, optional): Rows fetched from the server per
+                fetchmany call
+        """
+        self.config = DbConfig.from_env() if config is None else config
+        self.pool = get_pool(self.config, pool_size)
+        self.arraysize = arraysize
+
+    def __str__(self):
+        return f"SecuritiesDb {self.config.host}/{self.config.db}"
+
+    def cache_key(self):
+        """Stable identity of the data, used to fingerprint cached runs"""
+        return (self.config.host, self.config.port, self.config.db)
+
+    def query(self, sql, params=None, index=None):
+        """Runs a parameterized query and returns its rows as a dataframe.
+        Rows are streamed from the server arraysize at a time through an
+        unbuffered cursor, so they are held once on the client and not
+        also in the driver's result buffer.
+        """
+        if params is not None:
+            params = [p.item() if isinstance(p, np.generic) else p for p in params]
+        with self.pool.connection() as conn:
+            with conn.cursor(pymysql.cursors.SSCursor) as cursor:
+                cursor.execute(sql, params)
+                columns = [d[0] for d in cursor.description]
+                rows = []
+                while True:
+                    chunk = cursor.fetchmany(self.arraysize)
+                    if not chunk:
+                        break
+                    rows.extend(chunk)
+        return columns_to_frame(columns, rows, index)
+
+    # ================================#
+    # PRICES
+    # ================================#
+    def read_prices(self, symbol_id, start_dt, end_dt, frequency="daily",
+                    data_vendor=None, end_inclusive=True):
+        """Returns the price bars of a symbol between start_dt and end_dt
+        indexed by price_date.
+        """
+        sql = (
+            f"SELECT {', '.join(PRICE_COLUMNS)} FROM {price_table(frequency)} "
+            "WHERE symbol_id = %s AND price_date >= %s AND price_date "
+            + ("<= %s" if end_inclusive else "< %s")
+        )
+        params = [symbol_id, start_dt, end_dt]
+        if data_vendor is not None:
+            sql += " AND data_vendor_id = %s"
+            params.append(data_vendor)
+        sql += " ORDER BY price_date ASC"
+        return self.query(sql, params, index="price_date")
+
+    def read_last_prices(self, symbol_id, before_dt, n, frequency="daily",
+                         data_vendor=None):
+        """Returns the n price bars of a symbol before before_dt indexed by
+        price_date in ascending order.
+        """
+        sql = (
+            f"SELECT {', '.join(PRICE_COLUMNS)} FROM {price_table(frequency)} "
+            "WHERE symbol_id = %s AND price_date < %s"
+        )
+        params = [symbol_id, before_dt]
+        if data_vendor is not None:
+            sql += " AND data_vendor_id = %s"
+            params.append(data_vendor)
+        sql += " ORDER BY price_date DESC LIMIT %s"
+        params.append(int(n))
+        return self.query(sql, params, index="price_date").iloc[::-1]
+
+    def read_price_dates(self, symbol_ids, start_dt, end_dt, frequency="daily",
+                         data_vendor=None):
+        """Returns every distinct bar date of the symbols between start_dt
+        and end_dt.
+        """
+        symbol_ids = list(symbol_ids)
+        sql = (
+            f"SELECT DISTINCT price_date FROM {price_table(frequency)} "
+            f"WHERE symbol_id IN ({', '.join(['%s'] * len(symbol_ids))}) "
+            "AND price_date BETWEEN %s AND %s"
+        )
+        params = symbol_ids + [start_dt, end_dt]
+        if data_vendor is not None:
+            sql += " AND data_vendor_id = %s"
+            params.append(data_vendor)
+        sql += " ORDER BY price_date ASC"
+        return pd.DatetimeIndex(self.query(sql, params)["price_date"])
+
+    # ================================#
+    # CORPORATE ACTIONS
+    # ================================#
+    def read_corporate_action(self, symbol_id, action_date, field,
+                              data_vendor=None):
+        """Returns split_ratio or dividend of a symbol on action_date, or
+        None when there is no corporate action that day.
+        """
+        if field not in CORPORATE_ACTION_COLUMNS:
+            raise ValueError(f"Invalid corporate action field: {field!r}")
+        sql = (
+            f"SELECT {field} FROM daily_corporate_action "
+            "WHERE symbol_id = %s AND action_date = %s"
+        )
+        params = [symbol_id, action_date]
+        if data_vendor is not None:
+            sql += " AND data_vendor_id = %s"
+            params.append(data_vendor)
+        bar = self.query(sql, params)
+        if bar.empty:
+            return None
+        return bar.loc[0, field]
+
+    def read_corporate_actions(self, symbol_id, start_dt, end_dt,
+                               data_vendor=None):
+        """Returns split_ratio and dividend of every corporate action of a
+        symbol between start_dt and end_dt indexed by action_date.
+        """
+        sql = (
+            f"SELECT action_date, {', '.join(CORPORATE_ACTION_COLUMNS)} "
+            "FROM daily_corporate_action WHERE symbol_id = %s "
+            "AND action_date BETWEEN %s AND %s"
+        )
+        params = [symbol_id, start_dt, end_dt]
+        if data_vendor is not None:
+            sql += " AND data_vendor_id = %s"
+            params.append(data_vendor)
+        sql += " ORDER BY action_date ASC"
+        return self.query(sql, params, index="action_date")
@@ -1,13 +1,21 @@
 #!/usr/bin/env python3
 # # -*- coding: utf-8 -*-
 import os
-import pymysql
+import numpy as np
 import pandas as pd
 import datetime as dt
 
 # Import own modules
 from zetatrader.event import MarketEvent
-from zetatrader.price_handler.base import AbstractPriceHandler
+from zetatrader.price_handler.base import AbstractPriceHandler, stack_symbol_field
+from zetatrader.price_handler.prefetch import ChunkPrefetcher
+from zetatrader.price_handler.alignment import align_symbol_frames
+from zetatrader.price_handler.lazy import LazySymbolData
+from zetatrader.trading.run_cache import fingerprint
+from zetatrader.price_handler.datasource import DbConfig, SecuritiesDb
+from zetatrader.log import get_logger
+
+log = get_logger("price_handler.db")
 
 
 class DbPriceHandler(AbstractPriceHandler):
@@ -23,6 +31,15 @@ class DbPriceHandler(AbstractPriceHandler):
         db_password=os.environ.get("SEC_DB_PW"),
         frequency="daily",
         data_vendor=6,
+        chunk_freq=None,
+        lookback=500,
+        prefetch_depth=2,
+        calendar=None,
+        lazy=False,
+        memory_budget=None,
+        cache_dir=None,
+        datasource=None,
+        lazy_window=256,
     ):
         """Initialize securities_db price handler object.
 
@@ -32,26 +49,113 @@ class DbPriceHandler(AbstractPriceHandler):
                 ticker as key
             db_user ([type]): securities_db user
             db_password ([type]): securities_db password
+            chunk_freq (str, optional): Pandas offset alias (e.g. "MS" for
+                monthly chunks). When given, bars are streamed in time
+                ordered chunks instead of loading [start_dt, end_dt] at once.
+                Defaults to None.
+            lookback (int, optional): Bars kept behind the current bar in
+                streaming mode. Bounds get_latest_bars. Defaults to 500.
+            prefetch_depth (int, optional): Chunks loaded ahead of the
+                current one in streaming mode. Defaults to 2.
+            calendar (DatetimeIndex, optional): Bar dates every symbol is
+                aligned to, e.g. an exchange calendar. Defaults to the union
+                of the dates of every symbol.
+            lazy (bool, optional): Load the bars of a symbol only on its
+                first access. Cannot be combined with chunk_freq. Defaults
+                to False.
+            memory_budget (int, optional): Bytes of symbol data kept in
+                memory in lazy mode, least recently used symbols are evicted
+                first. Defaults to None, no limit.
+            cache_dir (str, optional): Directory where lazily loaded symbols
+                are pickled for later runs. Files are keyed on the bar
+                calendar, symbol_id and datasource.cache_key(). Defaults to
+                None.
+            datasource (SecuritiesDb, optional): Data source the bars are
+                read from. Defaults to securities_db configured from the
+                SEC_DB_* environment variables and db_user/db_password.
+            lazy_window (int, optional): Bars of every symbol kept from the
+                current bar on in lazy mode, outside memory_budget. The
+                latest bar values and next open prices the portfolio and
+                execution read on every bar come from these windows, so a
+                symbol is loaded about once per lazy_window bars even when
+                memory_budget holds fewer symbols than the universe.
+                Defaults to 256.
         """
         self.events = events
         self.symbol_dict = symbol_dict
         self.symbol_list = list(self.symbol_dict.keys())
+        self._symbol_pos = {s: j for j, s in enumerate(self.symbol_list)}
+        self._matrices = {}
         self.bar_index = -1
         self.continue_backtest = True
         self.start_dt = start_dt
         self.end_dt = end_dt
         self.frequency = frequency
         self.data_vendor = data_vendor
-
-        # Connect to securities_db
-        self.sec_db_conn = pymysql.connect(
-            host="localhost", user=db_user, passwd=db_password, db="securities_db"
-        )
-        self.symbol_data = self.construct_symbol_data()
+        self.db_user = db_user
+        self.db_password = db_password
+        self.chunk_freq = chunk_freq
+        self.lookback = lookback
+        self.prefetch_depth = prefetch_depth
+        self.prefetcher = None
+        self.calendar = None if calendar is None else pd.DatetimeIndex(calendar)
+        self.lazy = lazy
+        self.memory_budget = memory_budget
+        self.cache_dir = cache_dir
+        self.lazy_window = lazy_window
+        self._row_windows = {}
+        if self.lazy and self.chunk_freq is not None:
+            raise ValueError("lazy and chunk_freq cannot be used together.")
+
+        # Connections to securities_db come from a pool shared in the process
+        if datasource is None:
+            datasource = SecuritiesDb(
+                DbConfig.from_env(user=db_user, password=db_password)
+            )
+        self.datasource = datasource
+        if self.lazy:
+            self.symbol_data = self.construct_lazy_symbol_data()
+        elif self.chunk_freq is None:
+            self.symbol_data = self.construct_symbol_data()
+        else:
+            self.symbol_data = self.construct_streaming_symbol_data()
 
     def __str__(self):
         return f"Securities DB Price Handler. Data Vendor ID: {self.data_vendor}"
 
+    def _read_price_data(self, symbol, start_dt, end_dt, end_inclusive=True):
+        """Returns the price bars of a symbol between start_dt and end_dt
+        indexed by price_date.
+        """
+        price_data = self.datasource.read_prices(
+            self.symbol_dict.get(symbol, 0),
+            start_dt,
+            end_dt,
+            self.frequency,
+            self.data_vendor,
+            end_inclusive,
+        )
+        # If EOD Data, standardized time component
+        if self.frequency == "daily":
+            price_data = price_data.resample("1D").last().dropna(how="all").copy()
+        return price_data
+
+    def _read_calendar(self):
+        """Returns every bar date of the symbol universe between start_dt
+        and end_dt.
+        """
+        dates = self.datasource.read_price_dates(
+            [self.symbol_dict.get(s, 0) for s in self.symbol_list],
+            self.start_dt,
+            self.end_dt,
+            self.frequency,
+            self.data_vendor,
+        )
+        # If EOD Data, standardized time component
+        if self.frequency == "daily":
+            dates = dates.normalize().unique()
+        return dates
+
     # ================================#
     # CONSTRUCTOR
     # ================================#
@@ -61,45 +165,40 @@ class DbPriceHandler(AbstractPriceHandler):
         dataframe.
         """
         symbol_data = {}
-        max_idn_len = 0
-        most_data_symbol = 0
-
         for symbol in self.symbol_list:
-            # Get price data
-            q_str = """(SELECT price_date, open_price, high_price, low_price,
-            close_price, adj_close_price, volume FROM 
-            %s_price WHERE symbol_id = %s AND price_date BETWEEN '%s' 
-            AND '%s' AND data_vendor_id = %s) ORDER BY price_date ASC""" % (
-                self.frequency,
-                self.symbol_dict.get(symbol, 0),
-                self.start_dt,
-                self.end_dt,
-                self.data_vendor,
+            symbol_data[symbol] = self._read_price_data(
+                symbol, self.start_dt, self.end_dt
             )
-            price_data = pd.read_sql_query(q_str, con=self.sec_db_conn)
-            price_data.set_index("price_date", inplace=True)
-            # If EOD Data, standardized time component
-            if self.frequency == "daily":
-                price_data = price_data.resample("1D").last().dropna(how="all").copy()
-
-            # Check index length comparison
-            if len(price_data) > max_idn_len:
-                max_idn_len = len(price_data)
-                most_data_symbol = symbol
-            symbol_data[symbol] = price_data
-
-        if len(self.symbol_list) > 1:
-            new_index = symbol_data[most_data_symbol].index
-            # Now we need to carry out forward fill every shorter dataset
-            for symbol in self.symbol_list:
-                symbol_data[symbol] = self.reindex_symbol_data(
-                    symbol_data.get(symbol), new_index
-                )
+        return self.align_symbol_data(
+            symbol_data, calendar=self.calendar_between(self.start_dt, self.end_dt)
+        )
+
+    def calendar_between(self, start_dt, end_dt, end_inclusive=True):
+        """Returns the dates of the calendar between start_dt and end_dt or
+        None when no calendar is set.
+        """
+        if self.calendar is None:
+            return None
+        mask = self.calendar >= pd.Timestamp(start_dt)
+        if end_inclusive:
+            mask &= self.calendar <= pd.Timestamp(end_dt)
         else:
-            # Reset index to integer
-            symbol_data[self.symbol_list[0]].reset_index(inplace=True)
+            mask &= self.calendar < pd.Timestamp(end_dt)
+        return self.calendar[mask]
 
-        return symbol_data
+    def align_symbol_data(self, symbol_data, carry=None, calendar=None):
+        """Aligns every symbol to one calendar, forward filling missing bars,
+        and resets the index to integers. A boolean stale column marks the
+        padded bars.
+
+        Args:
+            symbol_data (dict): Symbol as key and date indexed dataframe
+            carry (dict, optional): Symbol as key and the last row of the
+                previous chunk, used to forward fill the start of a chunk.
+            calendar (DatetimeIndex, optional): Dates to align to. Defaults
+                to the union of the dates of every symbol.
+        """
+        return align_symbol_frames(symbol_data, self.symbol_list, calendar, carry)
 
     def reindex_symbol_data(self, df, new_index):
         """Replaces current date index of dataframe with given date index
@@ -118,6 +217,165 @@ class DbPriceHandler(AbstractPriceHandler):
         df.reset_index(inplace=True)
         return df
 
+    # ================================#
+    # LAZY CONSTRUCTOR
+    # ================================#
+    def construct_lazy_symbol_data(self):
+        """Reads the bar calendar of the universe and returns symbol data
+        that loads each symbol, aligned to that calendar, on first access.
+        """
+        if self.calendar is not None:
+            self.bar_calendar = self.calendar_between(self.start_dt, self.end_dt)
+        else:
+            self.bar_calendar = self._read_calendar()
+        cache_dir = self.cache_dir
+        cache_key = ""
+        if cache_dir is not None:
+            try:
+                source = self.datasource.cache_key()
+            except (AttributeError, TypeError) as e:
+                log.warning("Lazy symbol cache disabled, %s", e)
+                cache_dir = None
+            else:
+                cache_key = fingerprint(
+                    [
+                        self.frequency,
+                        self.data_vendor,
+                        self.bar_calendar.asi8,
+                        source,
+                    ]
+                )[:16]
+        return LazySymbolData(
+            self.symbol_list,
+            self._load_symbol,
+            self.memory_budget,
+            cache_dir,
+            lambda symbol: f"{cache_key}_{symbol}_{self.symbol_dict.get(symbol)}",
+        )
+
+    def _load_symbol(self, symbol):
+        """Reads and aligns the full history of one symbol"""
+        price_data = self._read_price_data(symbol, self.start_dt, self.end_dt)
+        return align_symbol_frames(
+            {symbol: price_data}, [symbol], self.bar_calendar
+        )[symbol]
+
+    def _window_value(self, symbol, val_type, index):
+        """Returns val_type of symbol at bar index from the lazy window of
+        the symbol, loading the symbol only when index is past the window.
+        """
+        window = self._row_windows.get(symbol)
+        if window is None or not window[0] <= index < window[0] + window[1]:
+            df = self.symbol_data[symbol]
+            if not 0 <= index < len(df):
+                raise KeyError(index)
+            rows = slice(index, index + self.lazy_window)
+            columns = {c: df[c].to_numpy()[rows] for c in df.columns}
+            window = (index, len(columns["price_date"]), columns)
+            self._row_windows[symbol] = window
+        return window[2][val_type][index - window[0]]
+
+    def lazy_stats(self):
+        """Returns lazy loading metrics. Empty when not in lazy mode."""
+        if not self.lazy:
+            return {}
+        return self.symbol_data.stats()
+
+    # ================================#
+    # STREAMING CONSTRUCTOR
+    # ================================#
+    def construct_streaming_symbol_data(self):
+        """Starts prefetching chunks of bars in a background thread and loads
+        the first one. Rows keep a global integer index so bar_index works
+        the same way as with the fully loaded data.
+        """
+        boundaries = list(
+            pd.date_range(self.start_dt, self.end_dt, freq=self.chunk_freq)
+        )
+        boundaries = [pd.Timestamp(self.start_dt)] + [
+            b for b in boundaries if b > pd.Timestamp(self.start_dt)
+        ]
+        self._windows = [
+            (boundaries[i], boundaries[i + 1], False)
+            for i in range(len(boundaries) - 1)
+        ]
+        self._windows.append((boundaries[-1], pd.Timestamp(self.end_dt), True))
+        self._next_row = 0
+        self._carry = None
+        self._chunks_left = True
+        self.prefetcher = ChunkPrefetcher(
+            self._load_chunk, self._windows, self.prefetch_depth
+        )
+
+        self.symbol_data = {
+            symbol: pd.DataFrame() for symbol in self.symbol_list
+        }
+        self._ensure_loaded(1)
+        return self.symbol_data
+
+    def _load_chunk(self, window):
+        """Reads and aligns one chunk of bars. Runs in the prefetch thread,
+        which takes its own connection from the pool. Returns False when the
+        window holds no bars.
+        """
+        start_dt, end_dt, end_inclusive = window
+        calendar = self.calendar_between(start_dt, end_dt, end_inclusive)
+        symbol_data = {}
+        for symbol in self.symbol_list:
+            symbol_data[symbol] = self._read_price_data(
+                symbol, start_dt, end_dt, end_inclusive
+            )
+        if all(df.empty for df in symbol_data.values()):
+            return False
+        carry = self._carry
+        self._carry = {
+            symbol: df.iloc[-1:] if not df.empty else (carry or {}).get(symbol)
+            for symbol, df in symbol_data.items()
+        }
+        return self.align_symbol_data(symbol_data, carry, calendar)
+
+    def _append_chunk(self, chunk):
+        """Appends an aligned chunk to the buffer and drops rows older than
+        the lookback.
+        """
+        first_kept = max(self.bar_index - self.lookback + 1, 0)
+        n_rows = len(chunk[self.symbol_list[0]])
+        for symbol in self.symbol_list:
+            df = chunk[symbol]
+            df.index = pd.RangeIndex(self._next_row, self._next_row + n_rows)
+            old = self.symbol_data[symbol]
+            if not old.empty:
+                df = pd.concat([old.loc[first_kept:], df])
+            self.symbol_data[symbol] = df
+        self._next_row += n_rows
+        self._matrices = {}
+
+    def _ensure_loaded(self, index):
+        """Blocks until the row at index is loaded or no chunk is left"""
+        if self.chunk_freq is None:
+            return
+        while index >= self._next_row and self._chunks_left:
+            chunk = self.prefetcher.next_chunk()
+            if chunk is None:
+                self._chunks_left = False
+            elif chunk is not False:
+                self._append_chunk(chunk)
+
+    def close(self):
+        """Stops the prefetch thread of streaming mode. Called when the
+        data runs out and by TradingSession when the session ends.
+        """
+        if self.prefetcher is not None:
+            self.prefetcher.stop()
+
+    def prefetch_stats(self):
+        """Returns chunk prefetch metrics (stall time, queue depth, load
+        time). Empty when not streaming.
+        """
+        if self.prefetcher is None:
+            return {}
+        return self.prefetcher.stats()
+
     # ================================#
     # PRICE HANDLER FUNCTIONS
     # ================================#
@@ -163,6 +421,9 @@ class DbPriceHandler(AbstractPriceHandler):
         return self.get_latest_bar_datetime(symbol)
 
     def get_latest_bar_datetime(self, symbol=None):
+        if self.lazy:
+            # Every symbol is aligned to the bar calendar
+            return self.bar_calendar[self.bar_index]
         if symbol == None:
             return self.get_latest_bar(self.symbol_list[0])["price_date"]
         else:
@@ -170,16 +431,83 @@ class DbPriceHandler(AbstractPriceHandler):
 
     def get_latest_bar_value(self, symbol, val_type):
         """Returns specific field for latest bar"""
+        if self.lazy:
+            return self._window_value(symbol, val_type, self.bar_index)
         return self.get_latest_bar(symbol)[val_type]
 
     def get_latest_bar_values(self, symbol, val_type, n=1):
         return self.get_latest_bars(symbol, n)[val_type]
 
+    get_latest_bars_values = get_latest_bar_values
+
+    def _field_matrix(self, val_type):
+        """Returns the cached bars x symbols matrix of val_type and the bar
+        index of its first row.
+        """
+        if val_type not in self._matrices:
+            self._matrices[val_type] = stack_symbol_field(
+                self.symbol_data, self.symbol_list, val_type
+            )
+        return self._matrices[val_type]
+
+    def _symbol_columns(self, symbols):
+        if symbols is None:
+            return slice(None)
+        return [self._symbol_pos[s] for s in symbols]
+
+    def get_latest_cross_section(self, val_type, symbols=None):
+        """Returns the latest val_type of every symbol (default symbol_list)
+        as a numpy vector aligned with the symbols.
+        """
+        if self.lazy:
+            # Stacking would load every symbol of the universe
+            return super().get_latest_cross_section(val_type, symbols)
+        matrix, first = self._field_matrix(val_type)
+        row = self.bar_index - first
+        if row < 0:
+            raise KeyError(self.bar_index)
+        return matrix[row, self._symbol_columns(symbols)]
+
+    def get_latest_cross_sections(self, val_type, n=1, symbols=None):
+        """Returns the last n val_type of every symbol as a n x symbols numpy
+        matrix, oldest bar first. Rows before the first bar are NaN.
+        """
+        if self.lazy:
+            return super().get_latest_cross_sections(val_type, n, symbols)
+        matrix, first = self._field_matrix(val_type)
+        end = self.bar_index - first + 1
+        if end <= 0:
+            raise KeyError(self.bar_index)
+        rows = matrix[max(end - n, 0) : end, self._symbol_columns(symbols)]
+        if len(rows) < n:
+            pad = np.full((n - len(rows), rows.shape[1]), np.nan)
+            rows = np.concatenate([pad, rows])
+        return rows
+
+    def get_latest_bar_stale(self, symbol):
+        """Returns True when the latest bar of symbol is padded from an
+        earlier bar rather than a real bar.
+        """
+        if self.lazy:
+            return bool(self._window_value(symbol, "stale", self.bar_index))
+        return bool(self.symbol_data[symbol].at[self.bar_index, "stale"])
+
     def update_bars(self):
         """Updated bar index check for existence of next bar. Puts
         market event to queue if next bar is found.
         """
         next_index = self.bar_index + 1
+        # Streaming mode keeps the bar after next loaded for next open price
+        self._ensure_loaded(next_index + 1)
+        if self.lazy:
+            # Do not load every symbol just to find the end of the data
+            if next_index < len(self.bar_calendar):
+                self.events.put(MarketEvent())
+                self.bar_index += 1
+            else:
+                self.continue_backtest = False
+                self.close()
+            return
         # Check that every symbol has next price
         for symbol in self.symbol_list:
             try:
@@ -192,6 +520,8 @@ class DbPriceHandler(AbstractPriceHandler):
         if self.continue_backtest is True:
             self.events.put(MarketEvent())
             self.bar_index += 1
+        else:
+            self.close()
 
     # ================================== #
     # CORPORATE ACTION HANDLER
@@ -204,17 +534,12 @@ class DbPriceHandler(AbstractPriceHandler):
             symbol_id = self.symbol_dict.get(symbol)
             action_date = self.get_latest_bar_datetime()
 
-            query = """SELECT split_ratio FROM daily_corporate_action
-            WHERE symbol_id = '%s' AND action_date = '%s' AND data_vendor_id = %s
-            """ % (
-                symbol_id,
-                action_date,
-                self.data_vendor,
+            value = self.datasource.read_corporate_action(
+                symbol_id, action_date, "split_ratio", self.data_vendor
             )
-            bar = pd.read_sql_query(query, con=self.sec_db_conn)
 
-            if bar.empty == False:
-                return bar.loc[0, "split_ratio"]
+            if value is not None:
+                return value
             else:
                 # If no data is found assume no split was given that day
                 return 1
@@ -229,17 +554,12 @@ class DbPriceHandler(AbstractPriceHandler):
             symbol_id = self.symbol_dict.get(symbol)
             action_date = self.get_latest_bar_datetime()
 
-            sql = """SELECT dividend FROM daily_corporate_action
-            WHERE symbol_id = '%s' AND action_date = '%s' AND data_vendor_id = %s
-            """ % (
-                symbol_id,
-                action_date,
-                self.data_vendor,
+            value = self.datasource.read_corporate_action(
+                symbol_id, action_date, "dividend", self.data_vendor
             )
-            bar = pd.read_sql_query(sql, con=self.sec_db_conn)
 
-            if bar.empty == False:
-                return bar.loc[0, "dividend"]
+            if value is not None:
+                return value
             else:
                 # If no data is found assume no dividend was given that day
                 return 0
@@ -256,7 +576,9 @@ class DbPriceHandler(AbstractPriceHandler):
             symbol (str): [description]
         """
         try:
+            if self.lazy:
+                return self._window_value(symbol, "open_price", self.bar_index + 1)
             return self.symbol_data[symbol].loc[self.bar_index + 1, "open_price"]
         except:
-            print("Unable to obtain next open price. Data not found.")
+            log.warning("Unable to obtain next open price of %s. Data not found.", symbol)
             raise
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+
+# file_price_handler.py
+# Darren Yeap
+import os
+import numpy as np
+import pandas as pd
+
+# Import own modules
+from zetatrader.event import MarketEvent
+from zetatrader.price_handler.base import AbstractPriceHandler
+from zetatrader.price_handler.alignment import align_arrays
+from zetatrader.price_handler.datasource import PRICE_COLUMNS
+from zetatrader.log import get_logger
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+log = get_logger("price_handler.file")
+
+PRICE_FIELDS = PRICE_COLUMNS[1:]
+ACTION_FIELDS = ["split_ratio", "dividend"]
+
+
+# ================================#
+# FILE LAYOUT
+# ================================#
+# npy:     {data_dir}/{symbol}/price_date.npy, open_price.npy, ...
+#          {data_dir}/{symbol}/actions/action_date.npy, split_ratio.npy, ...
+# parquet: {data_dir}/{symbol}.parquet and {data_dir}/{symbol}.actions.parquet
+def write_symbol_files(data_dir, symbol, prices, fmt="npy", actions=None):
+    """Writes the bars of one symbol in the layout read by FilePriceHandler.
+
+    Args:
+        data_dir (str): Data directory
+        symbol (str): Symbol
+        prices (DataFrame): Bars indexed by price_date or with a price_date
+            column, sorted by date
+        fmt (str, optional): 'npy' or 'parquet'. Defaults to 'npy'.
+        actions (DataFrame, optional): split_ratio and dividend indexed by
+            action_date
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    if "price_date" not in prices.columns:
+        prices = prices.reset_index()
+    prices = prices.sort_values("price_date")
+    columns = {"price_date": pd.to_datetime(prices["price_date"]).to_numpy("datetime64[ns]")}
+    for field in PRICE_FIELDS:
+        if field in prices.columns:
+            columns[field] = prices[field].to_numpy(dtype=float)
+
+    action_columns = None
+    if actions is not None:
+        if "action_date" not in actions.columns:
+            actions = actions.reset_index()
+        actions = actions.sort_values("action_date")
+        action_columns = {
+            "action_date": pd.to_datetime(actions["action_date"]).to_numpy("datetime64[ns]")
+        }
+        for field in ACTION_FIELDS:
+            if field in actions.columns:
+                action_columns[field] = actions[field].to_numpy(dtype=float)
+
+    if fmt == "npy":
+        _write_npy(os.path.join(data_dir, symbol), columns)
+        if action_columns is not None:
+            _write_npy(os.path.join(data_dir, symbol, "actions"), action_columns)
+    elif fmt == "parquet":
+        _require_pyarrow()
+        pq.write_table(pa.table(columns), os.path.join(data_dir, f"{symbol}.parquet"))
+        if action_columns is not None:
+            pq.write_table(
+                pa.table(action_columns),
+                os.path.join(data_dir, f"{symbol}.actions.parquet"),
+            )
+    else:
+        raise ValueError(f"Unknown file format: {fmt}")
+
+
+def export_datasource(datasource, data_dir, symbol_dict, start_dt, end_dt,
+                      fmt="npy", frequency="daily", data_vendor=6):
+    """Copies bars of every symbol of symbol_dict from a datasource, e.g.
+    SecuritiesDb or LocalDb, into per-symbol files.
+    """
+    for symbol, symbol_id in symbol_dict.items():
+        prices = datasource.read_prices(
+            symbol_id, start_dt, end_dt, frequency, data_vendor
+        )
+        write_symbol_files(data_dir, symbol, prices, fmt)
+
+
+def _write_npy(path, columns):
+    os.makedirs(path, exist_ok=True)
+    for name, values in columns.items():
+        np.save(os.path.join(path, f"{name}.npy"), values)
+
+
+def _require_pyarrow():
+    if pq is None:
+        raise ImportError("pyarrow is required for parquet files")
+
+
+def _row_groups(parquet_file, column, start=None, end=None):
+    """Returns the row groups of a parquet file sorted by column that hold
+    rows between start and end, plus the row group before them for the bar
+    before start. Row groups without statistics are always read.
+    """
+    index = parquet_file.schema_arrow.get_field_index(column)
+    groups = []
+    before = None
+    for i in range(parquet_file.num_row_groups):
+        stats = parquet_file.metadata.row_group(i).column(index).statistics
+        if stats is None or not stats.has_min_max:
+            groups.append(i)
+            continue
+        if start is not None and np.datetime64(pd.Timestamp(stats.max), "ns") < start:
+            before = i
+        elif end is None or np.datetime64(pd.Timestamp(stats.min), "ns") <= end:
+            groups.append(i)
+    if before is not None:
+        groups.insert(0, before)
+    return sorted(set(groups))
+
+
+def _read_columns(data_dir, symbol, fmt, columns, actions=False, start=None, end=None):
+    """Returns a dictionary of column arrays. npy columns are memory mapped.
+    Parquet files are decoded into memory for the projected columns and the
+    row groups between start and end only. Missing files give None.
+    """
+    if fmt == "npy":
+        path = os.path.join(data_dir, symbol, "actions") if actions else os.path.join(data_dir, symbol)
+        if not os.path.isdir(path):
+            return None
+        result = {}
+        for name in columns:
+            f = os.path.join(path, f"{name}.npy")
+            if os.path.exists(f):
+                result[name] = np.load(f, mmap_mode="r")
+        return result
+    elif fmt == "parquet":
+        _require_pyarrow()
+        name = f"{symbol}.actions.parquet" if actions else f"{symbol}.parquet"
+        path = os.path.join(data_dir, name)
+        if not os.path.exists(path):
+            return None
+        parquet_file = pq.ParquetFile(path, memory_map=True)
+        schema = parquet_file.schema_arrow
+        columns = [c for c in columns if c in schema.names]
+        groups = _row_groups(parquet_file, columns[0], start, end)
+        table = parquet_file.read_row_groups(groups, columns=columns)
+        return {
+            c: table.column(c).to_numpy().astype(
+                "datetime64[ns]" if c.endswith("_date") else float, copy=False
+            )
+            for c in columns
+        }
+    raise ValueError(f"Unknown file format: {fmt}")
+
+
+class FilePriceHandler(AbstractPriceHandler):
+    """Price handler over a directory of per-symbol NPY column files or
+    Parquet files. Only the projected columns are opened. NPY files are
+    memory mapped, so large histories open instantly and only the pages of
+    the bars touched are read. Parquet files are decoded into memory, but
+    only for the row groups overlapping the session. Symbols are forward
+    filled onto one calendar through a row map instead of copying the data.
+    """
+
+    def __init__(
+        self,
+        events,
+        symbol_dict,
+        start_dt,
+        end_dt,
+        data_dir,
+        fmt="npy",
+        columns=None,
+        calendar=None,
+        frequency="daily",
+    ):
+        """Initialize file price handler.
+
+        Args:
+            events (Queue): Event queue
+            symbol_dict (dict): Symbol as key and symbol_id as value
+            start_dt (datetime): First bar
+            end_dt (datetime): Last bar
+            data_dir (str): Directory with the symbol files
+            fmt (str, optional): 'npy' or 'parquet'. Defaults to 'npy'.
+            columns (list, optional): Price columns to read. Defaults to
+                every price column available.
+            calendar (DatetimeIndex, optional): Bar dates to align to.
+                Defaults to the union of the dates of every symbol.
+            frequency (str, optional): Bar frequency of the files. Portfolios
+                only apply splits and dividends to daily bars. Defaults to
+                'daily'.
+        """
+        self.events = events
+        self.symbol_dict = symbol_dict
+        self.symbol_list = list(self.symbol_dict.keys())
+        self.start_dt = start_dt
+        self.end_dt = end_dt
+        self.data_dir = data_dir
+        self.fmt = fmt
+        self.fields = list(PRICE_FIELDS if columns is None else columns)
+        self.frequency = frequency
+        self.bar_index = -1
+        self.continue_backtest = True
+
+        self.columns = {}
+        self.actions = {}
+        self.construct_symbol_data(calendar)
+
+    def __str__(self):
+        return f"File Price Handler. {self.fmt} files in {self.data_dir}"
+
+    # ================================#
+    # CONSTRUCTOR
+    # ================================#
+    def construct_symbol_data(self, calendar=None):
+        """Opens the files of every symbol, restricts them to the rows
+        between start_dt and end_dt and maps every calendar bar to the last
+        row of each symbol at or before it. The row map is aligned like
+        the bars of the other price handlers, only the row numbers are
+        copied.
+        """
+        start = np.datetime64(pd.Timestamp(self.start_dt), "ns")
+        end = np.datetime64(pd.Timestamp(self.end_dt), "ns")
+        for symbol in self.symbol_list:
+            cols = _read_columns(
+                self.data_dir, symbol, self.fmt, ["price_date"] + self.fields,
+                start=start, end=end,
+            )
+            if cols is None:
+                raise FileNotFoundError(f"No price files for {symbol} in {self.data_dir}")
+            dates = cols["price_date"]
+            # Keep one bar before start_dt to forward fill the first bars
+            first = max(int(np.searchsorted(dates, start, side="left")) - 1, 0)
+            last = int(np.searchsorted(dates, end, side="right"))
+            self.columns[symbol] = {k: v[first:last] for k, v in cols.items()}
+            self.actions[symbol] = _read_columns(
+                self.data_dir, symbol, self.fmt, ["action_date"] + ACTION_FIELDS,
+                actions=True, start=start, end=end,
+            )
+
+        if calendar is None:
+            dates = [self.columns[s]["price_date"] for s in self.symbol_list]
+            calendar = np.unique(np.concatenate(dates)) if dates else np.array([], "datetime64[ns]")
+        else:
+            calendar = pd.DatetimeIndex(calendar).to_numpy("datetime64[ns]")
+        calendar = calendar[(calendar >= start) & (calendar <= end)]
+        self.calendar = pd.DatetimeIndex(calendar, name="price_date")
+
+        frames = [
+            pd.DataFrame(
+                {"row": np.arange(len(self.columns[s]["price_date"]))},
+                index=pd.DatetimeIndex(self.columns[s]["price_date"]),
+            )
+            for s in self.symbol_list
+        ]
+        _, rows, stale = align_arrays(frames, ["row"], self.calendar)
+        # Bars before the first row of a symbol map to row -1
+        rows = np.nan_to_num(rows[:, :, 0], nan=-1).astype(np.int64)
+        self.rows = {s: rows[:, j] for j, s in enumerate(self.symbol_list)}
+        self.stale = {s: stale[:, j] for j, s in enumerate(self.symbol_list)}
+
+    def _values(self, symbol, val_type, rows):
+        """Returns val_type at the given rows, NaN before the first row"""
+        if val_type == "price_date":
+            return self.calendar.values[rows[1]]
+        col = self.columns[symbol][val_type]
+        values = np.asarray(col[np.maximum(rows[0], 0)], dtype=float)
+        return np.where(rows[0] < 0, np.nan, values)
+
+    def _bar_rows(self, symbol, start, stop):
+        bars = np.arange(max(start, 0), stop)
+        return self.rows[symbol][bars], bars
+
+    # ================================#
+    # PRICE HANDLER FUNCTIONS
+    # ================================#
+    def get_latest_bar(self, symbol):
+        """Returns the latest bar as a pandas series"""
+        return self.get_latest_bars(symbol, 1).loc[self.bar_index]
+
+    def get_latest_bars(self, symbol, n=1):
+        """Returns the n most recent bars as a dataframe indexed by bar
+        index. Returns n-k bars if less are available.
+        """
+        rows = self._bar_rows(symbol, self.bar_index - n + 1, self.bar_index + 1)
+        data = {"price_date": self._values(symbol, "price_date", rows)}
+        for field in self.fields:
+            data[field] = self._values(symbol, field, rows)
+        return pd.DataFrame(data, index=rows[1])
+
+    def get_datetime(self, symbol=None):
+        return self.get_latest_bar_datetime(symbol)
+
+    def get_latest_bar_datetime(self, symbol=None):
+        return self.calendar[self.bar_index]
+
+    def get_latest_bar_value(self, symbol, val_type):
+        """Returns specific field for latest bar"""
+        if val_type == "price_date":
+            return self.get_latest_bar_datetime(symbol)
+        row = self.rows[symbol][self.bar_index]
+        if row < 0:
+            return np.nan
+        return float(self.columns[symbol][val_type][row])
+
+    def get_latest_bar_values(self, symbol, val_type, n=1):
+        rows = self._bar_rows(symbol, self.bar_index - n + 1, self.bar_index + 1)
+        return pd.Series(self._values(symbol, val_type, rows), index=rows[1], name=val_type)
+
+    get_latest_bars_values = get_latest_bar_values
+
+    def get_latest_bar_stale(self, symbol):
+        """Returns True when the latest bar of symbol is padded from an
+        earlier bar rather than a real bar.
+        """
+        return bool(self.stale[symbol][self.bar_index])
+
+    def update_bars(self):
+        """Moves to the next calendar bar and puts a market event to the
+        queue if there is one.
+        """
+        if self.bar_index + 1 < len(self.calendar):
+            self.events.put(MarketEvent())
+            self.bar_index += 1
+        else:
+            self.continue_backtest = False
+
+    # ================================== #
+    # CORPORATE ACTION HANDLER
+    # ================================== #
+    def _action(self, symbol, field, default):
+        actions = self.actions.get(symbol)
+        if not actions or field not in actions:
+            return default
+        dates = actions["action_date"]
+        date = self.calendar.values[self.bar_index]
+        i = int(np.searchsorted(dates, date, side="left"))
+        if i < len(dates) and dates[i] == date:
+            return float(actions[field][i])
+        return default
+
+    def get_latest_bar_split(self, symbol):
+        """Returns the split ratio on the latest bar date, 1 if none"""
+        return self._action(symbol, "split_ratio", 1)
+
+    def get_latest_bar_dividend(self, symbol):
+        """Returns the dividend per share on the latest bar date, 0 if none"""
+        return self._action(symbol, "dividend", 0)
+
+    # ================================== #
+    # EXECUTION HANDLER FUNCTION
+    # ================================== #
+    def get_next_open_price(self, symbol):
+        """Get the open price of next bar."""
+        if self.bar_index + 1 >= len(self.calendar):
+            log.warning("Unable to obtain next open price of %s. Data not found.", symbol)
+            raise KeyError(self.bar_index + 1)
+        row = self.rows[symbol][self.bar_index + 1]
+        if row < 0:
+            return np.nan
+        return float(self.columns[symbol]["open_price"][row])
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+
+# lazy.py
+# Darren Yeap
+import os
+import pickle
+from collections import OrderedDict
+
+
+class LazySymbolData:
+    """Dictionary like store of symbol dataframes that are loaded on first
+    access. Loaded frames are kept in least recently used order and evicted
+    once their total size exceeds memory_budget. Evicted frames are reloaded,
+    from cache_dir when given, on their next access.
+    """
+
+    def __init__(self, symbol_list, loader, memory_budget=None, cache_dir=None,
+                 cache_key=""):
+        """Initialize lazy symbol data.
+
+        Args:
+            symbol_list (list): Symbols that can be loaded
+            loader (callable): Called with a symbol, returns its dataframe
+            memory_budget (int, optional): Bytes of loaded frames kept in
+                memory. Defaults to None, no limit.
+            cache_dir (str, optional): Directory where loaded frames are
+                pickled so later runs skip the loader. Defaults to None.
+            cache_key (str or callable, optional): Prefix of the cache file
+                names, or a callable returning the file name of a symbol
+                without extension. The key must change whenever the data
+                or the calendar of a symbol does.
+        """
+        self.symbol_list = list(symbol_list)
+        self.loader = loader
+        self.memory_budget = memory_budget
+        self.cache_dir = cache_dir
+        self.cache_key = cache_key
+        if self.cache_dir is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        self._frames = OrderedDict()
+        self._sizes = {}
+        self.memory_used = 0
+
+        # Metrics
+        self.hits = 0
+        self.loads = 0
+        self.cache_loads = 0
+        self.evictions = 0
+
+    # ================================#
+    # DICTIONARY INTERFACE
+    # ================================#
+    def __getitem__(self, symbol):
+        if symbol not in self.symbol_list:
+            raise KeyError(symbol)
+        if symbol in self._frames:
+            self.hits += 1
+            self._frames.move_to_end(symbol)
+            return self._frames[symbol]
+        df = self._load(symbol)
+        self._frames[symbol] = df
+        self._sizes[symbol] = int(df.memory_usage(index=True, deep=True).sum())
+        self.memory_used += self._sizes[symbol]
+        self._evict()
+        return df
+
+    def get(self, symbol, default=None):
+        try:
+            return self[symbol]
+        except KeyError:
+            return default
+
+    def __contains__(self, symbol):
+        return symbol in self.symbol_list
+
+    def __iter__(self):
+        return iter(self.symbol_list)
+
+    def __len__(self):
+        return len(self.symbol_list)
+
+    def keys(self):
+        return list(self.symbol_list)
+
+    def loaded(self):
+        """Returns the symbols currently held in memory"""
+        return list(self._frames.keys())
+
+    # ================================#
+    # LOADING
+    # ================================#
+    def _cache_path(self, symbol):
+        if callable(self.cache_key):
+            name = self.cache_key(symbol)
+        else:
+            name = f"{self.cache_key}{symbol}"
+        return os.path.join(self.cache_dir, f"{name}.pkl")
+
+    def _load(self, symbol):
+        if self.cache_dir is not None:
+            path = self._cache_path(symbol)
+            if os.path.exists(path):
+                self.cache_loads += 1
+                with open(path, "rb") as f:
+                    return pickle.load(f)
+        self.loads += 1
+        df = self.loader(symbol)
+        if self.cache_dir is not None:
+            # Write then rename so a partly written file is never read
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as f:
+                pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        return df
+
+    def _evict(self):
+        # Keep at least the most recently used frame
+        while (
+            self.memory_budget is not None
+            and self.memory_used > self.memory_budget
+            and len(self._frames) > 1
+        ):
+            symbol, _ = self._frames.popitem(last=False)
+            self.memory_used -= self._sizes.pop(symbol)
+            self.evictions += 1
+
+    def stats(self):
+        """Returns loading metrics as a dictionary"""
+        return {
+            "loaded": len(self._frames),
+            "memory_used": self.memory_used,
+            "hits": self.hits,
+            "loads": self.loads,
+            "cache_loads": self.cache_loads,
+            "evictions": self.evictions,
+        }
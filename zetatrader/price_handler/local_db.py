@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+
+# local_db.py
+# Darren Yeap
+import os
+import re
+import sqlite3
+import threading
+import numpy as np
+import pandas as pd
+import datetime as dt
+
+# Import own modules
+from zetatrader.price_handler.datasource import (
+    PRICE_COLUMNS, SecuritiesDb, columns_to_frame, price_table
+)
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+_DATE_STR = re.compile(r"^\d{4}-\d{2}-\d{2}")
+
+PRICE_TABLE_SQL = """CREATE TABLE IF NOT EXISTS {table} (
+    data_vendor_id INTEGER NOT NULL,
+    symbol_id INTEGER NOT NULL,
+    price_date {date_type} NOT NULL,
+    open_price DOUBLE,
+    high_price DOUBLE,
+    low_price DOUBLE,
+    close_price DOUBLE,
+    adj_close_price DOUBLE,
+    volume DOUBLE,
+    PRIMARY KEY (symbol_id, data_vendor_id, price_date)
+)"""
+
+CORPORATE_ACTION_TABLE_SQL = """CREATE TABLE IF NOT EXISTS daily_corporate_action (
+    data_vendor_id INTEGER NOT NULL,
+    symbol_id INTEGER NOT NULL,
+    action_date {date_type} NOT NULL,
+    split_ratio DOUBLE,
+    dividend DOUBLE,
+    PRIMARY KEY (symbol_id, data_vendor_id, action_date)
+)"""
+
+
+class LocalDb(SecuritiesDb):
+    """Embedded copy of securities_db in a single SQLite or DuckDB file with
+    the same {frequency}_price and daily_corporate_action tables. Reads go
+    through the same methods as SecuritiesDb, so it can be given to any
+    price handler as its datasource. The primary key on (symbol_id,
+    data_vendor_id, price_date) serves symbol range scans from the index.
+    """
+
+    def __init__(self, path, engine="sqlite", arraysize=10000):
+        """Initialize local database, creating the file if needed.
+
+        Args:
+            path (str): Database file, ':memory:' for an in memory database
+            engine (str, optional): 'sqlite' or 'duckdb'. DuckDB stores the
+                tables column by column and must be installed separately.
+            arraysize (int, optional): Rows fetched per fetchmany call
+        """
+        self.path = path
+        self.engine = engine
+        self.arraysize = arraysize
+        self._lock = threading.RLock()
+        if engine == "sqlite":
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self._date_type = "TEXT"
+        elif engine == "duckdb":
+            if duckdb is None:
+                raise ImportError("duckdb is required for engine='duckdb'")
+            self.conn = duckdb.connect(path)
+            self._date_type = "TIMESTAMP"
+        else:
+            raise ValueError(f"Unknown engine: {engine}")
+        self.create_schema()
+
+    def __str__(self):
+        return f"LocalDb {self.engine}:{self.path}"
+
+    def cache_key(self):
+        """Stable identity of the data, used to fingerprint cached runs. An
+        in memory database has none.
+        """
+        if self.path == ":memory:":
+            raise TypeError("An in memory LocalDb cannot be fingerprinted")
+        return (self.engine, os.path.abspath(self.path))
+
+    # ================================#
+    # SCHEMA
+    # ================================#
+    def create_schema(self, frequencies=("daily",)):
+        """Creates the price tables of the given frequencies and the
+        corporate action table.
+        """
+        for frequency in frequencies:
+            self.create_price_table(frequency)
+        self.execute(CORPORATE_ACTION_TABLE_SQL.format(date_type=self._date_type))
+
+    def create_price_table(self, frequency):
+        self.execute(
+            PRICE_TABLE_SQL.format(
+                table=price_table(frequency), date_type=self._date_type
+            )
+        )
+
+    # ================================#
+    # QUERIES
+    # ================================#
+    def _param(self, value):
+        # Dates are stored as ISO text in SQLite, compare them the same way
+        if isinstance(value, np.generic):
+            value = value.item()
+        if isinstance(value, (dt.date, np.datetime64)) or (
+            isinstance(value, str) and _DATE_STR.match(value)
+        ):
+            return pd.Timestamp(value).strftime("%Y-%m-%d %H:%M:%S")
+        return value
+
+    def execute(self, sql, params=None):
+        with self._lock:
+            self.conn.execute(sql, [self._param(p) for p in params or []])
+            self._commit()
+
+    def _commit(self):
+        # DuckDB runs in autocommit mode outside explicit transactions
+        if self.engine == "sqlite":
+            self.conn.commit()
+
+    def query(self, sql, params=None, index=None):
+        """Runs a parameterized query and returns its rows as a dataframe"""
+        # The shared SQL uses %s placeholders, both engines take ?
+        sql = sql.replace("%s", "?")
+        params = [self._param(p) for p in params or []]
+        with self._lock:
+            cursor = self.conn.cursor()
+            cursor.execute(sql, params)
+            columns = [d[0] for d in cursor.description]
+            rows = []
+            while True:
+                chunk = cursor.fetchmany(self.arraysize)
+                if not chunk:
+                    break
+                rows.extend(chunk)
+            cursor.close()
+        return columns_to_frame(columns, rows, index)
+
+    # ================================#
+    # IMPORT
+    # ================================#
+    def import_prices(self, symbol_id, prices, frequency="daily", data_vendor=6):
+        """Writes price bars of a symbol, replacing bars on the same dates.
+
+        Args:
+            symbol_id (int): Symbol id
+            prices (DataFrame): Bars indexed by price_date or with a
+                price_date column. Missing price columns are left NULL.
+            frequency (str, optional): Price table frequency
+            data_vendor (int, optional): Data vendor id
+        """
+        self.create_price_table(frequency)
+        if "price_date" not in prices.columns:
+            prices = prices.reset_index()
+        dates = pd.to_datetime(prices["price_date"]).dt.strftime("%Y-%m-%d %H:%M:%S")
+        values = [
+            prices[c].astype(float).tolist() if c in prices.columns
+            else [None] * len(prices)
+            for c in PRICE_COLUMNS[1:]
+        ]
+        rows = [
+            (int(data_vendor), int(symbol_id), d) + tuple(r)
+            for d, r in zip(dates, zip(*values))
+        ]
+        sql = "INSERT OR REPLACE INTO %s (data_vendor_id, symbol_id, %s) VALUES (%s)" % (
+            price_table(frequency),
+            ", ".join(PRICE_COLUMNS),
+            ", ".join(["?"] * (len(PRICE_COLUMNS) + 2)),
+        )
+        with self._lock:
+            self.conn.executemany(sql, rows)
+            self._commit()
+
+    def import_corporate_actions(self, symbol_id, actions, data_vendor=6):
+        """Writes split_ratio and dividend of a symbol from a dataframe
+        indexed by action_date or with an action_date column.
+        """
+        if "action_date" not in actions.columns:
+            actions = actions.reset_index()
+        dates = pd.to_datetime(actions["action_date"]).dt.strftime("%Y-%m-%d %H:%M:%S")
+        split = actions["split_ratio"] if "split_ratio" in actions else [1.0] * len(actions)
+        dividend = actions["dividend"] if "dividend" in actions else [0.0] * len(actions)
+        rows = [
+            (int(data_vendor), int(symbol_id), d, float(s), float(v))
+            for d, s, v in zip(dates, split, dividend)
+        ]
+        sql = """INSERT OR REPLACE INTO daily_corporate_action (data_vendor_id,
+        symbol_id, action_date, split_ratio, dividend) VALUES (?, ?, ?, ?, ?)"""
+        with self._lock:
+            self.conn.executemany(sql, rows)
+            self._commit()
+
+    def copy_from(self, source, symbol_ids, start_dt, end_dt, frequency="daily",
+                  data_vendor=6):
+        """Copies price bars of symbol_ids between start_dt and end_dt from
+        another datasource, e.g. SecuritiesDb, for offline use.
+        """
+        for symbol_id in symbol_ids:
+            prices = source.read_prices(
+                symbol_id, start_dt, end_dt, frequency, data_vendor
+            )
+            self.import_prices(symbol_id, prices, frequency, data_vendor)
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
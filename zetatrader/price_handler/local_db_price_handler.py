@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+
+# local_db_price_handler.py
+# Darren Yeap
+
+# Import own modules
+from zetatrader.price_handler.db_price_handler import DbPriceHandler
+from zetatrader.price_handler.local_db import LocalDb
+
+
+class LocalDbPriceHandler(DbPriceHandler):
+    """DbPriceHandler reading from a local SQLite or DuckDB copy of
+    securities_db, so backtests run without a database server. Streaming,
+    lazy loading and calendar alignment work the same way.
+    """
+
+    def __init__(
+        self,
+        events,
+        symbol_dict,
+        start_dt,
+        end_dt,
+        db_path,
+        engine="sqlite",
+        frequency="daily",
+        data_vendor=6,
+        **kwargs
+    ):
+        """Initialize local database price handler.
+
+        Args:
+            events (Queue): Event queue
+            symbol_dict (dict): dictionary with symbol_id as value and
+                ticker as key
+            start_dt (datetime): First bar
+            end_dt (datetime): Last bar
+            db_path (str): Local database file or an open LocalDb
+            engine (str, optional): 'sqlite' or 'duckdb'
+            **kwargs: Other DbPriceHandler parameters (chunk_freq, lazy...)
+        """
+        if isinstance(db_path, LocalDb):
+            datasource = db_path
+        else:
+            datasource = LocalDb(db_path, engine)
+        super().__init__(
+            events,
+            symbol_dict,
+            start_dt,
+            end_dt,
+            frequency=frequency,
+            data_vendor=data_vendor,
+            datasource=datasource,
+            **kwargs
+        )
+
+    def __str__(self):
+        return f"Local DB Price Handler. {self.datasource}"
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+
+# memory_price_handler.py
+# Darren Yeap
+import numpy as np
+import pandas as pd
+
+# Import own modules
+from zetatrader.price_handler.datasource import PRICE_COLUMNS
+from zetatrader.price_handler.db_price_handler import DbPriceHandler
+
+
+def synthetic_prices(symbol_dict, n_bars, start="2010-01-04", freq="B",
+                     price=100.0, vol=0.01, seed=0):
+    """Returns random walk bars for every symbol, keyed by symbol_id and
+    indexed by price_date, in the format read by MemoryDatasource.
+
+    Args:
+        symbol_dict (dict): Symbol as key and symbol_id as value
+        n_bars (int): Bars per symbol
+        start (str, optional): First bar date
+        freq (str, optional): Pandas frequency, e.g. 'B' or '1min'
+        price (float, optional): Starting price
+        vol (float, optional): Standard deviation of bar returns
+        seed (int, optional): Random seed
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start, periods=n_bars, freq=freq, name="price_date")
+    prices = {}
+    for symbol_id in symbol_dict.values():
+        close = price * np.exp(np.cumsum(rng.normal(0, vol, n_bars)))
+        open_price = np.r_[price, close[:-1]]
+        spread = np.abs(rng.normal(0, vol, n_bars)) * close
+        prices[symbol_id] = pd.DataFrame(
+            {
+                "open_price": open_price,
+                "high_price": np.maximum(open_price, close) + spread,
+                "low_price": np.minimum(open_price, close) - spread,
+                "close_price": close,
+                "adj_close_price": close,
+                "volume": rng.integers(1000, 100000, n_bars).astype(float),
+            },
+            index=dates,
+        )
+    return prices
+
+
+def load_memory_datasource(datasource, symbol_dict, start_dt, end_dt,
+                           frequency="daily", data_vendor=6):
+    """Reads the bars, and for daily bars the corporate actions, of every
+    symbol between start_dt and end_dt from a datasource such as
+    SecuritiesDb or LocalDb once. Price handlers over any window inside the
+    span then read from memory.
+    """
+    prices = {}
+    actions = {}
+    for symbol_id in symbol_dict.values():
+        prices[symbol_id] = datasource.read_prices(
+            symbol_id, start_dt, end_dt, frequency, data_vendor
+        )
+        if frequency == "daily" and hasattr(datasource, "read_corporate_actions"):
+            df = datasource.read_corporate_actions(
+                symbol_id, start_dt, end_dt, data_vendor
+            )
+            if not df.empty:
+                actions[symbol_id] = df
+    return MemoryDatasource(prices, actions)
+
+
+class MemoryDatasource:
+    """Datasource over dataframes already in memory, keyed by symbol_id and
+    indexed by price_date. Serves the same reads as SecuritiesDb.
+    """
+
+    def __init__(self, prices, corporate_actions=None):
+        """Initialize memory datasource.
+
+        Args:
+            prices (dict): symbol_id as key and price dataframe as value
+            corporate_actions (dict, optional): symbol_id as key and a
+                dataframe of split_ratio and dividend indexed by action_date
+        """
+        self.prices = prices
+        self.corporate_actions = corporate_actions or {}
+
+    def __str__(self):
+        return f"MemoryDatasource {len(self.prices)} symbols"
+
+    def cache_key(self):
+        """The dataframes themselves, hashed by content for cached runs"""
+        return (self.prices, self.corporate_actions)
+
+    def read_prices(self, symbol_id, start_dt, end_dt, frequency="daily",
+                    data_vendor=None, end_inclusive=True):
+        df = self.prices.get(symbol_id)
+        if df is None:
+            return pd.DataFrame(columns=PRICE_COLUMNS).set_index("price_date")
+        first = df.index.searchsorted(pd.Timestamp(start_dt), side="left")
+        last = df.index.searchsorted(
+            pd.Timestamp(end_dt), side="right" if end_inclusive else "left"
+        )
+        return df.iloc[first:last]
+
+    def read_last_prices(self, symbol_id, before_dt, n, frequency="daily",
+                         data_vendor=None):
+        df = self.prices[symbol_id]
+        last = df.index.searchsorted(pd.Timestamp(before_dt), side="left")
+        return df.iloc[max(last - n, 0):last]
+
+    def read_price_dates(self, symbol_ids, start_dt, end_dt, frequency="daily",
+                         data_vendor=None):
+        dates = [
+            self.read_prices(s, start_dt, end_dt).index for s in symbol_ids
+            if s in self.prices
+        ]
+        if not dates:
+            return pd.DatetimeIndex([])
+        return pd.DatetimeIndex(np.unique(np.concatenate([d.values for d in dates])))
+
+    def read_corporate_actions(self, symbol_id, start_dt, end_dt,
+                               data_vendor=None):
+        actions = self.corporate_actions.get(symbol_id)
+        if actions is None:
+            return pd.DataFrame(columns=["split_ratio", "dividend"])
+        return actions.loc[pd.Timestamp(start_dt):pd.Timestamp(end_dt)]
+
+    def read_corporate_action(self, symbol_id, action_date, field,
+                              data_vendor=None):
+        actions = self.corporate_actions.get(symbol_id)
+        if actions is None or field not in actions:
+            return None
+        try:
+            return actions.loc[pd.Timestamp(action_date), field]
+        except KeyError:
+            return None
+
+
+class MemoryPriceHandler(DbPriceHandler):
+    """DbPriceHandler over bars held in memory. Used by benchmarks, walk
+    forward tests and anywhere data is loaded once and replayed many times.
+    """
+
+    def __init__(
+        self,
+        events,
+        symbol_dict,
+        start_dt,
+        end_dt,
+        prices,
+        frequency="daily",
+        corporate_actions=None,
+        **kwargs
+    ):
+        """Initialize memory price handler.
+
+        Args:
+            events (Queue): Event queue
+            symbol_dict (dict): Symbol as key and symbol_id as value
+            start_dt (datetime): First bar
+            end_dt (datetime): Last bar
+            prices (dict or MemoryDatasource): symbol_id as key and price
+                dataframe indexed by price_date as value
+            frequency (str, optional): 'daily' applies corporate actions
+            corporate_actions (dict, optional): See MemoryDatasource
+            **kwargs: Other DbPriceHandler parameters (chunk_freq, lazy...)
+        """
+        if isinstance(prices, MemoryDatasource):
+            datasource = prices
+        else:
+            datasource = MemoryDatasource(prices, corporate_actions)
+        super().__init__(
+            events,
+            symbol_dict,
+            start_dt,
+            end_dt,
+            frequency=frequency,
+            datasource=datasource,
+            **kwargs
+        )
+
+    def __str__(self):
+        return f"Memory Price Handler. {self.datasource}"
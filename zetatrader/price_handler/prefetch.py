@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+
+# prefetch.py
+# Darren Yeap
+import time
+import queue
+import threading
+
+# Marks the end of the windows in the queue
+_DONE = object()
+
+
+class _LoadError:
+    """Wraps an exception raised by the loader so it is re-raised on the
+    consumer thread.
+    """
+
+    def __init__(self, error):
+        self.error = error
+
+
+class ChunkPrefetcher:
+    """Loads chunks on a producer thread ahead of the consumer. Up to depth
+    loaded chunks wait in a bounded queue, so database reads and frame
+    alignment of the next chunks overlap with the event loop consuming the
+    current one.
+    """
+
+    def __init__(self, loader, windows, depth=2):
+        """Initialize and start the producer thread.
+
+        Args:
+            loader (callable): Called with each window, returns a chunk.
+                Called in window order from a single thread.
+            windows (list): Windows to load
+            depth (int, optional): Maximum number of loaded chunks waiting
+                to be consumed. Defaults to 2.
+        """
+        self.loader = loader
+        self.windows = list(windows)
+        self.depth = depth
+        self._queue = queue.Queue(maxsize=depth)
+        self._stop = threading.Event()
+        self._done = False
+
+        # Metrics
+        self.chunks_loaded = 0
+        self.chunks_consumed = 0
+        self.load_time = 0.0
+        self.stall_time = 0.0
+        self.stalls = 0
+        self.max_queue_depth = 0
+        self._depth_sum = 0
+
+        self._t = threading.Thread(target=self._produce, args=())
+        self._t.daemon = True
+        self._t.start()
+
+    def _produce(self):
+        for window in self.windows:
+            if self._stop.is_set():
+                return
+            start = time.perf_counter()
+            try:
+                chunk = self.loader(window)
+            except Exception as e:
+                self._put(_LoadError(e))
+                return
+            self.load_time += time.perf_counter() - start
+            self.chunks_loaded += 1
+            if not self._put(chunk):
+                return
+        self._put(_DONE)
+
+    def _put(self, item):
+        # Wait for room in the queue but give up once stopped
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def next_chunk(self):
+        """Returns the next loaded chunk, blocking until it is ready. Returns
+        None when every window is consumed.
+        """
+        if self._done:
+            return None
+        depth = self._queue.qsize()
+        self._depth_sum += depth
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+        if depth == 0:
+            start = time.perf_counter()
+            item = self._queue.get()
+            self.stall_time += time.perf_counter() - start
+            self.stalls += 1
+        else:
+            item = self._queue.get()
+
+        if item is _DONE:
+            self._done = True
+            return None
+        if isinstance(item, _LoadError):
+            self._done = True
+            raise item.error
+        self.chunks_consumed += 1
+        return item
+
+    def stats(self):
+        """Returns prefetch metrics as a dictionary"""
+        requests = self.chunks_consumed + (1 if self._done else 0)
+        return {
+            "chunks_loaded": self.chunks_loaded,
+            "chunks_consumed": self.chunks_consumed,
+            "load_time": self.load_time,
+            "stall_time": self.stall_time,
+            "stalls": self.stalls,
+            "queue_depth": self._queue.qsize(),
+            "max_queue_depth": self.max_queue_depth,
+            "mean_queue_depth": self._depth_sum / requests if requests else 0.0,
+        }
+
+    def stop(self):
+        """Stops the producer thread and drops the chunks not consumed.
+        next_chunk returns None afterwards.
+        """
+        self._stop.set()
+        self._t.join()
+        self._done = True
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
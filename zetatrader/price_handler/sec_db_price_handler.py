@@ -3,14 +3,25 @@
 
 # sec_db_price_handler.py
 # Darren Jun Yi Yeap V0.1
-import pymysql 
+import logging
 import numpy as np 
 import pandas as pd 
 import datetime as dt
 
-from zetatrader.credentials import securities_db_cred
 from zetatrader.event import MarketEvent
-from zetatrader.price_handler.base import AbstractPriceHandler
+from zetatrader.price_handler.base import (
+    AbstractPriceHandler, BarRecord, stack_symbol_field
+)
+from zetatrader.price_handler.alignment import align_symbol_frames
+from zetatrader.price_handler.datasource import DbConfig, SecuritiesDb
+from zetatrader.log import get_logger
+
+log = get_logger("price_handler.sec_db")
+
+# Fields copied into the latest bar array on every bar
+LATEST_FIELDS = [
+    "open_price", "high_price", "low_price", "close_price", "volume"
+]
 
 
 class SecDbPriceHandler(AbstractPriceHandler):
@@ -18,8 +29,8 @@ class SecDbPriceHandler(AbstractPriceHandler):
     Sec_DB. The data is forward filled and returns data through a drip like 
     process. This is at least x2 faster then querying Sec_DB per bar. 
     """
-    def __init__(self, events, symbol_list, sec_db_pw = securities_db_cred
-        , insample_size_est = 100
+    def __init__(self, events, symbol_list, sec_db_pw = None
+        , insample_size_est = 100, datasource = None
     ):
         """Initialize Sec_DB_Price_Handler object 
         
@@ -31,24 +42,41 @@ class SecDbPriceHandler(AbstractPriceHandler):
                 trade 
         
         Keyword Arguments:
-            sec_db_pw {[type]} -- [description] (default: {securities_db_cred})
+            sec_db_pw {dict} -- securities_db_cred style dictionary with 
+                db_host, db_user, db_pass and db_name (default: {None}, read
+                SEC_DB_* environment variables or zetatrader.credentials)
             insample_size_est {int} -- preloaded data (default: {100})
+            datasource {SecuritiesDb} -- data source the bars are read from
+                (default: {None}, built from sec_db_pw)
         """
         self.events = events
-        self.sec_db_pw = securities_db_cred
+        self.sec_db_pw = sec_db_pw
         self.symbol_list = symbol_list
         self.insample_size_est = insample_size_est
+        self._symbol_pos = {s: j for j, s in enumerate(self.symbol_list)}
+        self._matrices = {}
 
         self.bar_index = -1
         self.continue_backtest = True
-        self.sec_db_conn = pymysql.connect(
-            host = self.sec_db_pw['db_host']
-            , user = self.sec_db_pw['db_user']
-            , passwd = self.sec_db_pw['db_pass']
-            , db = self.sec_db_pw['db_name']
-        )
+        if datasource is None:
+            if self.sec_db_pw is None:
+                config = DbConfig.from_env()
+            else:
+                config = DbConfig.from_credentials(self.sec_db_pw)
+            datasource = SecuritiesDb(config)
+        self.datasource = datasource
         self.symbol_data = {} 
-        self.latest_symbol_data = pd.DataFrame()
+        self._latest_dates = np.full(len(self.symbol_list), None, dtype=object)
+        self._latest_values = np.full(
+            (len(self.symbol_list), len(LATEST_FIELDS)), np.nan
+        )
+        self._latest_pos = {f: k for k, f in enumerate(LATEST_FIELDS)}
+        self._bar_dates = np.array([], dtype=object)
+        self._bar_values = np.zeros((0, len(self.symbol_list), len(LATEST_FIELDS)))
+        # Largest N requested and the symbols without older data to load
+        self.max_lookback = 0
+        self._lookback_loaded = 0
+        self._history_exhausted = set()
 
 
     def __str__(self):
@@ -74,14 +102,9 @@ class SecDbPriceHandler(AbstractPriceHandler):
          #Load the data without pre insample data
         for i in self.symbol_list:
             # Get price data 
-            query = """(SELECT price_date, open_price, high_price, low_price,
-            close_price, adj_close_price, volume FROM 
-            daily_price WHERE symbol_id = %s AND price_date BETWEEN '%s' 
-            AND '%s' ) ORDER BY price_date ASC"""%(
+            price_data = self.datasource.read_prices(
                 i, self.start_date+dt.timedelta(days=1), self.end_date
             )
-            price_data = pd.read_sql_query(query, con = self.sec_db_conn)
-            price_data.set_index("price_date", inplace=True)
             # Update length comparison and 
             if len(price_data) > max_len:
                 max_len = len(price_data)
@@ -106,15 +129,10 @@ class SecDbPriceHandler(AbstractPriceHandler):
         # Load the data furthur lookback set the index for first insample data
         for i in self.symbol_list:
             # Get price data 
-            query = """(SELECT price_date, open_price, high_price, low_price,
-            close_price, adj_close_price, volume FROM 
-            daily_price WHERE symbol_id = %s AND price_date BETWEEN '%s' 
-            AND '%s' ) ORDER BY price_date ASC"""%(
+            price_data = self.datasource.read_prices(
                 i, self.start_date-dt.timedelta(days=self.insample_size_est)
                 , self.end_date
             )
-            price_data = pd.read_sql_query(query, con = self.sec_db_conn)
-            price_data.set_index("price_date", inplace=True)
             # If there are additional data, then use this as the full price data
             if len(price_data) > max_len:
                 max_len = len(price_data)
@@ -136,32 +154,45 @@ class SecDbPriceHandler(AbstractPriceHandler):
         
         total_size = len(data[self.symbol_list[0]])
         self.bar_index = total_size - outsample_size -1
-        if self.bar_index>=0:
-            print(data[self.symbol_list[0]][self.bar_index:self.bar_index+5])
-        else:
-            print(data[self.symbol_list[0]][0:self.bar_index+5])
+        if log.isEnabledFor(logging.DEBUG):
+            first = max(self.bar_index, 0)
+            log.debug(
+                "First out of sample bars:\n%s"
+                , data[self.symbol_list[0]][first:self.bar_index+5]
+            )
         return data
 
     def construct_latest_symbol_data(self):
         """
-        Creates a dataframe with column open, high, low, close, volumn and 
-        symbol id as index
+        Stacks symbol_data into a bars x symbols x fields array so that
+        update_bars copies one row slice per bar, and fills the latest bar
+        arrays with the current bar
         """
-        col_val = []
-        for i in self.symbol_list:
-            col_val.append(float("nan"))
-        d = pd.DataFrame(
-            {
-                "price_date": col_val
-                , "open_price": col_val
-                , "high_price": col_val
-                , "low_price": col_val
-                , "close_price": col_val
-                , "volume": col_val
-            }
-            , index = self.symbol_list
-        ) 
+        self._bar_dates = self.symbol_data[self.symbol_list[0]][
+            "price_date"].to_numpy(dtype=object)
+        self._bar_values = np.stack(
+            [
+                self.symbol_data[s][LATEST_FIELDS].to_numpy(dtype=float)
+                for s in self.symbol_list
+            ]
+            , axis=1
+        )
+        self._latest_dates[:] = None
+        self._latest_values[:] = np.nan
+        if 0 <= self.bar_index < len(self._bar_dates):
+            self._latest_dates[:] = self._bar_dates[self.bar_index]
+            self._latest_values[:] = self._bar_values[self.bar_index]
 
+    @property
+    def latest_symbol_data(self):
+        """
+        Returns the latest bar of every symbol as a dataframe with symbol id
+        as index
+        """
+        d = pd.DataFrame(
+            self._latest_values, columns=LATEST_FIELDS, index=self.symbol_list
+        )
+        d.insert(0, "price_date", self._latest_dates)
         return d
 
 
@@ -173,7 +204,12 @@ class SecDbPriceHandler(AbstractPriceHandler):
         self.start_date = startdate
         self.end_date = enddate
         self.symbol_data = self.construct_symbol_data()
-        self.latest_symbol_data = self.construct_latest_symbol_data()
+        self.construct_latest_symbol_data()
+        self._matrices = {}
+        self._lookback_loaded = 0
+        self._history_exhausted = set()
+        if self.max_lookback > 0:
+            self._ensure_lookback(self.max_lookback)
     
     def get_datetime(self):
         """returns the current datetime in object"""
@@ -194,6 +230,56 @@ class SecDbPriceHandler(AbstractPriceHandler):
     #     self.latest_symbol_data = self.construct_latest_symbol_data()
 
     
+    # ================================#
+    # LOOKBACK CACHE
+    # ================================#
+    def _ensure_lookback(self, N):
+        """
+        Makes sure N bars up to the current bar are loaded. The first time
+        a larger N is requested, the preload is extended backwards once by
+        the largest N seen so later requests are served from memory
+        """
+        self.max_lookback = max(self.max_lookback, N)
+        if self.bar_index + 1 >= N or N <= self._lookback_loaded:
+            return
+        self._lookback_loaded = self.max_lookback
+        self._extend_lookback(self.max_lookback - self.bar_index - 1)
+
+    def _extend_lookback(self, n_bars):
+        """
+        Loads n_bars bars before the first loaded bar of every symbol,
+        aligns them and prepends them to symbol_data
+        """
+        symbols = [
+            s for s in self.symbol_list if s not in self._history_exhausted
+        ]
+        if not symbols or n_bars <= 0:
+            return
+        first_date = self.symbol_data[self.symbol_list[0]].loc[0, "price_date"]
+        data = {}
+        for i in self.symbol_list:
+            if i in self._history_exhausted:
+                data[i] = self.symbol_data[i].iloc[0:0].set_index("price_date")
+                continue
+            price_data = self.datasource.read_last_prices(
+                i, first_date, n_bars
+            )
+            if len(price_data) < n_bars:
+                self._history_exhausted.add(i)
+            data[i] = price_data
+        if all(data[i].empty for i in self.symbol_list):
+            return
+
+        data = align_symbol_frames(data, self.symbol_list)
+        for i in self.symbol_list:
+            self.symbol_data[i] = pd.concat(
+                [data[i].drop(columns="stale"), self.symbol_data[i]]
+                , ignore_index=True
+            )
+        self.bar_index += len(data[self.symbol_list[0]])
+        self.construct_latest_symbol_data()
+        self._matrices = {}
+
     # ================================#
     # PRINT CLASS VARIABLES
     # ================================#
@@ -226,49 +312,36 @@ class SecDbPriceHandler(AbstractPriceHandler):
         """
         Returns the last bar updated from latest symbol data
         """
-        bar = self.latest_symbol_data.loc[symbol_id]
-        return bar
+        j = self._symbol_pos[symbol_id]
+        return BarRecord(self._latest_dates[j], *self._latest_values[j])
 
     def get_latest_bars(self, symbol, N=1):
         """
         Returns the last n bars starting from data handler's internal
         datetime. Returns n-k if there is less than n bars available 
         sorted descendingly starting from the most recent bar to 
-        bar n or (n-k). If the number of bars in symbol_data is less
-        than N, try getting N bars from sec_db instead. 
+        bar n or (n-k). If fewer than N bars are loaded, the lookback
+        cache is extended backwards once through _ensure_lookback and
+        later requests are sliced from memory.
         
         Parameters:
         symbol - The symbol_id of intended security
         N - the number of bars to query 
         """
         try:
+            # Load older bars once if symbol_data has less than N bars
+            self._ensure_lookback(N)
             bar = self.symbol_data[symbol].loc[
-                self.bar_index + 1 -N : self.bar_index,
+                max(self.bar_index + 1 - N, 0) : self.bar_index,
                 [
                     "price_date", "open_price", "high_price", "low_price"
                     , "close_price", "volume"
                 ]
             ]
             bar.set_index("price_date", inplace=True)
-
-            # If symbol_data has less than N bars, try pulling data from sec_db
-            if len(bar) < N:
-                try:
-                    print("Not enough data loaded, going to sec_db to find data")
-                    query = """(SELECT price_date, open_price, high_price, low_price
-                        , close_price, volume FROM daily_price WHERE symbol_id =%s
-                        AND DATE(price_date) <= '%s' ORDER BY price_date DESC 
-                        LIMIT %s) ORDER BY price_date
-                        DESC""" %(symbol, self.get_latest_bar_datetime(symbol), N)
-                    return pd.read_sql_query(
-                        query, con=self.sec_db_conn).loc[::-1].set_index(
-                        'price_date')
-                except:
-                    return bar
-            else:
-                return bar
+            return bar
         except KeyError:
-            print("Unable to obtain latest n bars.")
+            log.warning("Unable to obtain latest %s bars of %s.", N, symbol)
             raise
 
     def get_latest_bar_datetime(self, symbol):
@@ -279,7 +352,7 @@ class SecDbPriceHandler(AbstractPriceHandler):
         try:
             return self.get_latest_bar_value(symbol, 'price_date')
         except KeyError:
-            print("That symbol is not available in the data set.")
+            log.warning("%s is not available in the data set.", symbol)
             raise
         
     def get_latest_bar_value(self, symbol, val_type):
@@ -287,36 +360,75 @@ class SecDbPriceHandler(AbstractPriceHandler):
         Returns one of the Open, High, Low, Close, Volume or OI
         from the last bar.
         """
+        if val_type in self._latest_pos:
+            return self._latest_values[
+                self._symbol_pos[symbol], self._latest_pos[val_type]
+            ]
+        if val_type == "price_date":
+            return self._latest_dates[self._symbol_pos[symbol]]
         return self.symbol_data[symbol].loc[self.bar_index, val_type]
     
     def get_latest_bars_values(self, symbol, val_type, N=1):
         """
         Returns the last N bar values from the
         latest_symbol list, or N-k if less available. Returns table in order
-        from earliest to latest data point
+        from earliest to latest data point. Older bars are loaded into the
+        lookback cache as in get_latest_bars.
         """
         try:
-            bars = self.symbol_data[symbol].loc[
-                self.bar_index +1 - N : self.bar_index, [val_type]
-            ][val_type]
-            # If symbol_data has less than N bars, try pulling data from sec_db
-            if len(bars) < N:
-                print("Not enough data loaded, going to sec_db to find data")
-                try:
-                    query = """(SELECT price_date, %s FROM daily_price WHERE 
-                        symbol_id =%s AND DATE(price_date) <= '%s' ORDER BY 
-                        price_date DESC LIMIT %s) ORDER BY price_date
-                        DESC""" %(val_type, symbol, self.get_latest_bar_datetime(symbol), N)
-                    bar_vals = pd.read_sql_query(query, con=self.sec_db_conn).loc[::-1]
-                    return bar_vals[val_type]   
-                except:
-                    return bars     
-            else:
-                return bars
+            # Load older bars once if symbol_data has less than N bars
+            self._ensure_lookback(N)
+            return self.symbol_data[symbol].loc[
+                max(self.bar_index + 1 - N, 0) : self.bar_index, val_type
+            ]
         except KeyError:
-            print('Unable to obtain latest n bars. Data not found.')
+            log.warning(
+                "Unable to obtain latest %s bars of %s. Data not found.", N, symbol
+            )
             raise
 
+    def _field_matrix(self, val_type):
+        """
+        Returns the cached bars x symbols matrix of val_type and the bar
+        index of its first row
+        """
+        if val_type not in self._matrices:
+            self._matrices[val_type] = stack_symbol_field(
+                self.symbol_data, self.symbol_list, val_type
+            )
+        return self._matrices[val_type]
+
+    def get_latest_cross_section(self, val_type, symbols=None):
+        """
+        Returns the latest val_type of every symbol (default symbol_list)
+        as a numpy vector aligned with the symbols
+        """
+        matrix, first = self._field_matrix(val_type)
+        if self.bar_index - first < 0:
+            raise KeyError(self.bar_index)
+        if symbols is None:
+            return matrix[self.bar_index - first]
+        return matrix[
+            self.bar_index - first, [self._symbol_pos[s] for s in symbols]
+        ]
+
+    def get_latest_cross_sections(self, val_type, N=1, symbols=None):
+        """
+        Returns the last N val_type of every symbol as a N x symbols numpy
+        matrix, oldest bar first. Rows before the first loaded bar are NaN
+        """
+        matrix, first = self._field_matrix(val_type)
+        end = self.bar_index - first + 1
+        if end <= 0:
+            raise KeyError(self.bar_index)
+        rows = matrix[max(end - N, 0):end]
+        if symbols is not None:
+            rows = rows[:, [self._symbol_pos[s] for s in symbols]]
+        if len(rows) < N:
+            pad = np.full((N - len(rows), rows.shape[1]), np.nan)
+            rows = np.concatenate([pad, rows])
+        return rows
+
 
     # ===============================
     # CORPORATE ACTION HANDLER
@@ -327,13 +439,12 @@ class SecDbPriceHandler(AbstractPriceHandler):
         ''' 
         action_date = self.get_latest_bar_datetime(symbol)
 
-        query = '''SELECT split_ratio FROM daily_corporate_action
-        WHERE symbol_id = '%s' AND action_date = '%s' 
-        ''' %(symbol, action_date)
-        bar = pd.read_sql_query(query, con=self.sec_db_conn)
+        value = self.datasource.read_corporate_action(
+            symbol, action_date, 'split_ratio'
+        )
         
-        if bar.empty == False:
-            return bar.loc[0, 'split_ratio']
+        if value is not None:
+            return value
         else: 
             # If no data is found assume no split was given that day
             return 1
@@ -345,13 +456,12 @@ class SecDbPriceHandler(AbstractPriceHandler):
         '''
         action_date = self.get_latest_bar_datetime(symbol)
 
-        sql = '''SELECT dividend FROM daily_corporate_action
-        WHERE symbol_id = '%s' AND action_date = '%s' 
-        ''' %(symbol, action_date)
-        bar = pd.read_sql_query(sql, con=self.sec_db_conn)
+        value = self.datasource.read_corporate_action(
+            symbol, action_date, 'dividend'
+        )
         
-        if bar.empty == False:
-            return bar.loc[0, 'dividend']
+        if value is not None:
+            return value
         else: 
             # If no data is found assume no dividend was given that day
             return 0
@@ -367,7 +477,9 @@ class SecDbPriceHandler(AbstractPriceHandler):
         try:
             return self.symbol_data[symbol].loc[self.bar_index+1, "open_price"]
         except:
-            print('Unable to obtain next open price. Data not found.')
+            log.warning(
+                "Unable to obtain next open price of %s. Data not found.", symbol
+            )
             raise
 
 
@@ -381,31 +493,12 @@ class SecDbPriceHandler(AbstractPriceHandler):
         close, volume/ open interest).
         """
         next_index = self.bar_index +1 
-        for s in self.symbol_list:
-            try:
-                bar = self.symbol_data[s].loc[next_index]
-            except KeyError:
-                self.continue_backtest = False
-            else:
-                if bar.empty is False:
-                    self.latest_symbol_data.loc[s, "price_date"] = (
-                        bar.loc["price_date"]
-                    )
-                    self.latest_symbol_data.loc[s, "open_price"] = (
-                        bar.loc["open_price"]
-                    )
-                    self.latest_symbol_data.loc[s, "high_price"] =(
-                        bar.loc["high_price"]
-                    )
-                    self.latest_symbol_data.loc[s, "low_price"] = (
-                        bar.loc["low_price"]
-                    )
-                    self.latest_symbol_data.loc[s, "close_price"] = (
-                        bar.loc["close_price"]
-                    )
-                    self.latest_symbol_data.loc[s, "volume"] = (
-                        bar.loc["volume"]
-                    )
+        if next_index < len(self._bar_dates):
+            # Every symbol shares the same dates after construct_symbol_data
+            self._latest_dates[:] = self._bar_dates[next_index]
+            self._latest_values[:] = self._bar_values[next_index]
+        else:
+            self.continue_backtest = False
         if self.continue_backtest is True:
             self.events.put(MarketEvent())
             self.bar_index += 1
\ No newline at end of file
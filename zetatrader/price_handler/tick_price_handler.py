@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+
+# tick_price_handler.py
+# Darren Yeap
+import os
+import heapq
+import numpy as np
+import pandas as pd
+from collections import deque
+
+# Import own modules
+from zetatrader.event import MarketEvent
+from zetatrader.price_handler.base import AbstractTickHandler
+from zetatrader.log import get_logger
+
+log = get_logger("price_handler.tick")
+
+# One tick is 32 bytes on disk
+TICK_DTYPE = np.dtype([
+    ("timestamp", "<i8"),  # Milliseconds since epoch (UTC)
+    ("bid", "<f8"),
+    ("ask", "<f8"),
+    ("bid_volume", "<f4"),
+    ("ask_volume", "<f4"),
+])
+
+BAR_FIELDS = [
+    "price_date", "open_price", "high_price", "low_price", "close_price", "volume"
+]
+
+BARSIZE_MS = {
+    "1MIN": 60000, "5MIN": 300000, "15MIN": 900000, "30MIN": 1800000,
+    "1HOUR": 3600000, "4HOUR": 14400000, "1DAY": 86400000,
+}
+
+
+def write_tick_file(path, ticks, append=False):
+    """Writes ticks to the compact binary tick format. Accepts the output of
+    XRest.get_tick_price (timestamp, bid, ask, bidVolume, askVolume) or a
+    DataFrame with bid_volume/ask_volume columns.
+
+    Args:
+        path (str): File to write
+        ticks (DataFrame): Ticks sorted by timestamp
+        append (bool, optional): Append to an existing file. Defaults to False.
+    """
+    ticks = ticks.rename(columns={"bidVolume": "bid_volume", "askVolume": "ask_volume"})
+    records = np.zeros(len(ticks), dtype=TICK_DTYPE)
+    timestamp = ticks["timestamp"]
+    if np.issubdtype(timestamp.dtype, np.datetime64):
+        timestamp = timestamp.astype("datetime64[ms]").astype("int64")
+    records["timestamp"] = timestamp
+    records["bid"] = ticks["bid"]
+    records["ask"] = ticks["ask"]
+    for field in ["bid_volume", "ask_volume"]:
+        if field in ticks:
+            records[field] = ticks[field]
+    records.sort(order="timestamp", kind="stable")
+    with open(path, "ab" if append else "wb") as f:
+        records.tofile(f)
+
+
+class TickFileReader:
+    """Streams one symbol's tick file in fixed size chunks so that only
+    chunk_size ticks are held in memory at any time. The file stays open
+    until close(), or the end of a with block.
+    """
+
+    def __init__(self, path, chunk_size=65536, start_ms=None, end_ms=None):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.end_ms = end_ms
+        self._file = open(path, "rb")
+        self._chunk = np.zeros(0, dtype=TICK_DTYPE)
+        self._pos = 0
+        self._exhausted = False
+        if start_ms is not None:
+            try:
+                self._seek(start_ms)
+            except Exception:
+                self._file.close()
+                raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _seek(self, start_ms):
+        """Binary search of the first tick at or after start_ms. Only the
+        timestamps touched by the search are read.
+        """
+        n_ticks = os.path.getsize(self.path) // TICK_DTYPE.itemsize
+        first, last = 0, n_ticks
+        while first < last:
+            mid = (first + last) // 2
+            self._file.seek(mid * TICK_DTYPE.itemsize)
+            if np.frombuffer(self._file.read(8), dtype="<i8")[0] < start_ms:
+                first = mid + 1
+            else:
+                last = mid
+        self._file.seek(first * TICK_DTYPE.itemsize)
+
+    def _fill(self):
+        """Loads the next chunk once the current one is consumed"""
+        if self._pos < len(self._chunk) or self._exhausted:
+            return
+        chunk = np.fromfile(self._file, dtype=TICK_DTYPE, count=self.chunk_size)
+        if self.end_ms is not None and len(chunk) > 0:
+            end = int(np.searchsorted(chunk["timestamp"], self.end_ms, side="right"))
+            if end < len(chunk):
+                chunk = chunk[:end]
+                self._exhausted = True
+        if len(chunk) == 0:
+            self._exhausted = True
+        self._chunk = chunk
+        self._pos = 0
+
+    def peek(self):
+        """Returns timestamp of the next tick or None when exhausted"""
+        self._fill()
+        if self._pos < len(self._chunk):
+            return int(self._chunk["timestamp"][self._pos])
+        return None
+
+    def peek_tick(self):
+        """Returns the next tick record without consuming it"""
+        if self.peek() is None:
+            return None
+        return self._chunk[self._pos]
+
+    def pop(self):
+        """Returns the next tick record"""
+        self._fill()
+        tick = self._chunk[self._pos]
+        self._pos += 1
+        return tick
+
+    def take_until(self, timestamp):
+        """Returns an array of every tick strictly before timestamp"""
+        pieces = []
+        while True:
+            self._fill()
+            if self._pos >= len(self._chunk):
+                break
+            end = self._pos + int(np.searchsorted(
+                self._chunk["timestamp"][self._pos:], timestamp, side="left"
+            ))
+            pieces.append(self._chunk[self._pos : end])
+            self._pos = end
+            if end < len(self._chunk):
+                break
+        if len(pieces) == 1:
+            return pieces[0]
+        if not pieces:
+            return np.zeros(0, dtype=TICK_DTYPE)
+        return np.concatenate(pieces)
+
+    def close(self):
+        """Closes the file. Ticks of the chunk already read stay readable."""
+        self._exhausted = True
+        self._file.close()
+
+
+class TickPriceHandler(AbstractTickHandler):
+    """Replays bid/ask ticks stored as one binary file per symbol,
+    {tick_dir}/{symbol}.ticks. Ticks are streamed in chunks, so memory stays
+    bounded by chunk_size and lookback regardless of the length of the replay.
+    With a barsize, ticks are aggregated into bars on the fly and a
+    MarketEvent is sent when every bar closes. Without a barsize, a
+    MarketEvent is sent for every tick and each tick is a bar of its own.
+    Every symbol gets a bar on every MarketEvent. Symbols without ticks in
+    it are padded with their last close, NaN before their first tick. Bar
+    volume is always the number of ticks, so 1 or 0 without a barsize. The
+    tick files are closed at the end of the replay, by close() or at the
+    end of a with block.
+    """
+
+    def __init__(
+        self,
+        events,
+        symbol_dict,
+        start_dt,
+        end_dt,
+        tick_dir,
+        barsize="1MIN",
+        price="mid",
+        lookback=500,
+        chunk_size=65536,
+    ):
+        """Initialize tick price handler.
+
+        Args:
+            events (Queue): Event queue
+            symbol_dict (dict): symbol as key and symbol_id as value
+            start_dt (datetime): First tick replayed
+            end_dt (datetime): Last tick replayed
+            tick_dir (str): Directory holding {symbol}.ticks files
+            barsize (str, optional): Bar aggregation period, one of BARSIZE_MS
+                keys. None to emit every tick. Defaults to "1MIN".
+            price (str, optional): 'mid', 'bid' or 'ask' used to build bars
+            lookback (int, optional): Completed bars kept per symbol
+            chunk_size (int, optional): Ticks read from disk at a time
+        """
+        self.events = events
+        self.symbol_dict = symbol_dict
+        self.symbol_list = list(self.symbol_dict.keys())
+        self.start_dt = start_dt
+        self.end_dt = end_dt
+        self.tick_dir = tick_dir
+        self.barsize = barsize
+        self.frequency = barsize if barsize is not None else "tick"
+        self.price = price
+        self.lookback = lookback
+        self.bar_index = -1
+        self.continue_backtest = True
+
+        self.bar_ms = BARSIZE_MS[barsize] if barsize is not None else None
+        start_ms = self._to_ms(start_dt)
+        end_ms = self._to_ms(end_dt)
+        self.readers = {}
+        try:
+            for s in self.symbol_list:
+                self.readers[s] = TickFileReader(
+                    os.path.join(tick_dir, f"{s}.ticks"), chunk_size, start_ms, end_ms
+                )
+        except Exception:
+            self.close()
+            raise
+        self.latest_tick = {s: None for s in self.symbol_list}
+        self.bars = {s: deque(maxlen=lookback) for s in self.symbol_list}
+        self._last_close = {s: np.nan for s in self.symbol_list}
+        self._heap = []
+        if self.bar_ms is None:
+            for s in self.symbol_list:
+                self._push(s)
+
+    def __str__(self):
+        return f"Tick Replay Price Handler. Bar size: {self.barsize}"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Closes the tick files of every symbol"""
+        for reader in self.readers.values():
+            reader.close()
+
+    # ================================#
+    # HELPERS
+    # ================================#
+    def _to_ms(self, datetime):
+        if datetime is None:
+            return None
+        return int(pd.Timestamp(datetime).value // 1000000)
+
+    def _tick_price(self, ticks):
+        if self.price == "bid":
+            return ticks["bid"]
+        elif self.price == "ask":
+            return ticks["ask"]
+        return (ticks["bid"] + ticks["ask"]) / 2
+
+    def _push(self, symbol):
+        timestamp = self.readers[symbol].peek()
+        if timestamp is not None:
+            heapq.heappush(self._heap, (timestamp, symbol))
+
+    # ================================#
+    # TICK HANDLER FUNCTIONS
+    # ================================#
+    def get_latest_tick(self, symbol):
+        """Returns the latest tick as a dictionary"""
+        tick = self.latest_tick[symbol]
+        if tick is None:
+            return None
+        return {name: tick[name].item() for name in TICK_DTYPE.names}
+
+    def get_latest_bar(self, symbol):
+        """Returns the latest completed bar as a pandas series"""
+        return pd.Series(self.bars[symbol][-1], index=BAR_FIELDS)
+
+    def get_latest_bars(self, symbol, n=1):
+        """Returns up to the n most recent completed bars as a dataframe"""
+        bars = list(self.bars[symbol])[-n:]
+        return pd.DataFrame(bars, columns=BAR_FIELDS)
+
+    def get_datetime(self, symbol=None):
+        return self.get_latest_bar_datetime(symbol)
+
+    def get_latest_bar_datetime(self, symbol=None):
+        if symbol is None:
+            symbol = self.symbol_list[0]
+        return self.bars[symbol][-1][0]
+
+    def get_latest_bar_value(self, symbol, val_type):
+        return self.bars[symbol][-1][BAR_FIELDS.index(val_type)]
+
+    def get_latest_bars_values(self, symbol, val_type, n=1):
+        field = BAR_FIELDS.index(val_type)
+        return pd.Series([b[field] for b in list(self.bars[symbol])[-n:]], name=val_type)
+
+    get_latest_bar_values = get_latest_bars_values
+
+    def get_next_open_price(self, symbol):
+        """Returns the price of the next tick of symbol, the price a market
+        order sent now would be filled at.
+        """
+        tick = self.readers[symbol].peek_tick()
+        if tick is None:
+            log.warning("Unable to obtain next open price of %s. Data not found.", symbol)
+            raise KeyError(symbol)
+        return float(self._tick_price(tick))
+
+    # ================================== #
+    # CORPORATE ACTION HANDLER
+    # ================================== #
+    def get_latest_bar_split(self, symbol):
+        return 1
+
+    def get_latest_bar_dividend(self, symbol):
+        return 0
+
+    # ================================#
+    # UPDATE BARS - MARKET EVENT GENERATOR
+    # ================================#
+    def update_bars(self):
+        """Replays the next tick, or every tick of the next bar when ticks
+        are aggregated, and puts a MarketEvent to the queue.
+        """
+        if self.bar_ms is None:
+            updated = self._update_tick()
+        else:
+            updated = self._update_bar()
+        if updated:
+            self.events.put(MarketEvent())
+            self.bar_index += 1
+        else:
+            self.continue_backtest = False
+            self.close()
+
+    def _pad_bar(self, price_date, symbol):
+        """Bar of a symbol without ticks, the last close and no volume"""
+        close = self._last_close[symbol]
+        return (price_date, close, close, close, close, 0.0)
+
+    def _update_tick(self):
+        if not self._heap:
+            return False
+        timestamp, symbol = heapq.heappop(self._heap)
+        tick = self.readers[symbol].pop()
+        self.latest_tick[symbol] = tick
+        price = float(self._tick_price(tick))
+        price_date = pd.Timestamp(timestamp, unit="ms")
+        self._last_close[symbol] = price
+        for s in self.symbol_list:
+            if s == symbol:
+                bar = (price_date, price, price, price, price, 1.0)
+            else:
+                bar = self._pad_bar(price_date, s)
+            self.bars[s].append(bar)
+        self._push(symbol)
+        return True
+
+    def _update_bar(self):
+        next_ticks = [self.readers[s].peek() for s in self.symbol_list]
+        next_ticks = [t for t in next_ticks if t is not None]
+        if not next_ticks:
+            return False
+        # Periods without any tick are skipped, not emitted as empty bars
+        bar_start = min(next_ticks) // self.bar_ms * self.bar_ms
+        bar_end = bar_start + self.bar_ms
+        price_date = pd.Timestamp(bar_start, unit="ms")
+        for s in self.symbol_list:
+            ticks = self.readers[s].take_until(bar_end)
+            if len(ticks) > 0:
+                prices = self._tick_price(ticks)
+                bar = (
+                    price_date,
+                    float(prices[0]),
+                    float(prices.max()),
+                    float(prices.min()),
+                    float(prices[-1]),
+                    float(len(ticks)),
+                )
+                self.latest_tick[s] = ticks[-1]
+                self._last_close[s] = bar[4]
+            else:
+                # Pad symbols without ticks with the last close
+                bar = self._pad_bar(price_date, s)
+            self.bars[s].append(bar)
+        return True
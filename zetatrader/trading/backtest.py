@@ -1,19 +1,18 @@
 #!/usr/bin/env python3
 # # -*- coding: utf-8 -*-
-import logging
-import os
+import time
 
 try:
     import Queue as queue
 except ImportError:
     import queue
 
-log = logging.getLogger(__name__)
-logging.basicConfig(
-    filemode="w",
-    level=logging.INFO,
-    filename=os.path.join(os.path.dirname(os.path.abspath(__file__)), "backtest.log"),
-)
+# Import own modules
+from zetatrader.log import get_logger
+from zetatrader.trading.profiler import SessionProfiler
+from zetatrader.trading.run_cache import session_fingerprint
+
+log = get_logger("trading.backtest")
 
 
 class TradingSession(object):
@@ -38,6 +37,8 @@ class TradingSession(object):
         strategy_parameters={},
         verbose=True,
         save_results=True,
+        profile=False,
+        cache=None,
     ):
         """Initialize the class object.
 
@@ -63,6 +64,15 @@ class TradingSession(object):
             strategy_parameters {dict} -- Dict of parameter variables to parse
                 into each class. Keys in dict are class names. Sub-keys are
                 parameter names
+            profile {bool} -- Records the latency of every handler call and
+                event. start_trading then also returns the profile summary
+                (default: {False})
+            cache {RunCache} -- Returns the stored results of an identical
+                earlier run without building the components or running the
+                backtest. On a hit cache_hit is True and price_handler,
+                strategy, portfolio and execution_handler are None, as is
+                performance unless save_results is set. Not used when
+                profiling (default: {None})
         """
         self.symbol_dict = symbol_dict
         self.initial_capital = initial_capital
@@ -80,11 +90,44 @@ class TradingSession(object):
         self.strategy_parameters = strategy_parameters
         self.verbose = verbose
         self.save_results = save_results
+        self.profiler = SessionProfiler() if profile else None
 
         self.signals = 0
         self.orders = 0
         self.fills = 0
 
+        self.cache = cache if not profile else None
+        self.cache_key = None
+        self.cache_hit = False
+        self._cached_results = None
+        if self.cache is not None:
+            try:
+                self.cache_key = session_fingerprint(
+                    strategy,
+                    strategy_parameters,
+                    backtest_parameters,
+                    symbol_dict,
+                    session_start_dt,
+                    session_end_dt,
+                    initial_capital,
+                    (price_handler, execution_handler, portfolio, performance),
+                )
+            except TypeError as e:
+                log.warning("Run cache disabled for this session: %s", e)
+                self.cache = None
+        if self.cache is not None:
+            self._cached_results = self.cache.get(self.cache_key)
+            if self._cached_results is not None:
+                # Nothing is built on a hit, see the cache argument
+                self.cache_hit = True
+                self.price_handler = None
+                self.strategy = None
+                self.portfolio = None
+                self.execution_handler = None
+                if not self.save_results:
+                    self.performance = None
+                return
+
         self._generate_trading_instances()
 
     def _generate_trading_instances(self):
@@ -107,12 +150,7 @@ class TradingSession(object):
         )
 
         # INIT PERFORMANCE CLASS
-        if self.backtest_parameters.get("performance_param") == None:
-            self.performance = self.performance(self.output_path)
-        else:
-            self.performance = self.performance(
-                self.output_path, **self.backtest_parameters.get("performance_param")
-            )
+        self._init_performance()
 
         # INITIALIZE PORTFOLIO CLASS
         self.portfolio = self.portfolio(
@@ -139,19 +177,38 @@ class TradingSession(object):
                 "Execution Handler %s \n" % self.execution_handler,
             )
 
+    def _init_performance(self):
+        if self.backtest_parameters.get("performance_param") == None:
+            self.performance = self.performance(self.output_path)
+        else:
+            self.performance = self.performance(
+                self.output_path, **self.backtest_parameters.get("performance_param")
+            )
+
     def _continue_session_loop(self):
         """Determines when to end trading session loop"""
         return self.price_handler.continue_backtest
 
     def _run_session(self):
         """
-        Executes the backtest.
+        Executes the backtest. With a profiler the latency of every handler
+        call and of every event by type is recorded as well.
         """
+        profile = self.profiler is not None
+        if profile:
+            clock = time.perf_counter_ns
+            record = self.profiler.record
+            loop_start = clock()
+
         i = 0
         while True:
             if self._continue_session_loop() is True:
                 i += 1
+                if profile:
+                    t0 = clock()
                 self.price_handler.update_bars()
+                if profile:
+                    record("price_handler.update_bars", clock() - t0)
             else:
                 break
 
@@ -163,21 +220,38 @@ class TradingSession(object):
                     break
                 else:
                     if event is not None:
+                        if profile:
+                            t0 = t1 = clock()
                         if event.type == "MARKET":
                             # Calculate signal & update portfolio value
                             self.strategy.calculate_signals(event)
+                            if profile:
+                                t1 = clock()
+                                record("strategy.calculate_signals", t1 - t0)
                             self.portfolio.update_timeindex(event)
+                            handler = "portfolio.update_timeindex"
                         elif event.type == "SIGNAL":
                             # Turns signal into order event adjusted for risk
                             self.signals += 1
                             self.portfolio.update_signal(event)
+                            handler = "portfolio.update_signal"
                         elif event.type == "ORDER":
                             self.orders += 1
                             self.execution_handler.execute_order(event)
+                            handler = "execution_handler.execute_order"
                         elif event.type == "FILL":
                             # Update portolio value and position
                             self.fills += 1
                             self.portfolio.update_fill(event)
+                            handler = "portfolio.update_fill"
+                        else:
+                            continue
+                        if profile:
+                            t2 = clock()
+                            record(handler, t2 - t1)
+                            record(event.type, t2 - t0)
+        if profile:
+            self.profiler.loop_ns += clock() - loop_start
 
     def _output_performance(self):
         """
@@ -201,10 +275,40 @@ class TradingSession(object):
 
         return (equity_curve, trade_data, portfolio_metrics, trade_statistics)
 
+    def _close_price_handler(self):
+        """Releases the files or threads of the price handler, e.g. the
+        prefetch thread of a streaming DbPriceHandler.
+        """
+        close = getattr(self.price_handler, "close", None)
+        if close is not None:
+            close()
+
     def start_trading(self):
         """
         Starts the live or backtest algo and outputs strategy performance.
+        When profiling, the profile summary is returned as a fifth item.
         """
-        self._run_session()
+        if self._cached_results is not None:
+            log.info("Returning cached results of run %s", self.cache_key[:12])
+            results = self._cached_results
+            if self.save_results:
+                self._init_performance()
+                self.performance.save_equity_curve(results[0])
+                self.performance.save_trade_log(results[1])
+            return results
+
+        try:
+            self._run_session()
+        finally:
+            self._close_price_handler()
         log.info("Backtest completed without error")
-        return self._output_performance()
+        results = self._output_performance()
+        if self.cache is not None:
+            self.cache.put(self.cache_key, results)
+        if self.profiler is None:
+            return results
+
+        profile_summary = self.profiler.summary()
+        if self.verbose:
+            print(profile_summary.to_string(float_format="%.3f"))
+        return results + (profile_summary,)
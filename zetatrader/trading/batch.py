@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+
+# batch.py
+# Darren Yeap
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+# Import own modules
+from zetatrader.log import get_logger
+from zetatrader.trading.backtest import TradingSession
+
+log = get_logger("trading.batch")
+
+
+class SessionStack:
+    """Strategy, portfolio, execution handler and performance of one
+    variant of a batch, with its own event queue.
+    """
+
+    def __init__(self, strategy_parameters):
+        self.strategy_parameters = strategy_parameters
+        self.events = queue.Queue()
+        self.strategy = None
+        self.portfolio = None
+        self.execution_handler = None
+        self.performance = None
+        self.signals = 0
+        self.orders = 0
+        self.fills = 0
+
+
+class BatchTradingSession(TradingSession):
+    """Backtests many strategy parameter sets over one price stream. The
+    price handler is built and advanced once, and every market event is
+    handed to each variant's stack, which handles its signals, orders and
+    fills in its own queue exactly as a TradingSession would. Reading and
+    aligning the bars is paid once for the whole batch.
+
+    Strategies and portfolios share the price handler, so they must only
+    read from it.
+    """
+
+    def __init__(
+        self,
+        symbol_dict,
+        initial_capital=0.0,
+        session_start_dt=None,
+        session_end_dt=None,
+        price_handler=None,
+        execution_handler=None,
+        portfolio=None,
+        strategy=None,
+        performance=None,
+        output_path=None,
+        backtest_parameters={},
+        strategy_parameters_list=None,
+        verbose=True,
+        save_results=True,
+    ):
+        """Initialize the class object.
+
+        Keyword Arguments:
+            strategy_parameters_list {list} -- One dict of strategy
+                parameters per variant. Other arguments are as in
+                TradingSession.
+        """
+        self.strategy_parameters_list = list(strategy_parameters_list or [{}])
+        self.stacks = []
+        super().__init__(
+            symbol_dict,
+            initial_capital=initial_capital,
+            session_start_dt=session_start_dt,
+            session_end_dt=session_end_dt,
+            price_handler=price_handler,
+            execution_handler=execution_handler,
+            portfolio=portfolio,
+            strategy=strategy,
+            performance=performance,
+            output_path=output_path,
+            backtest_parameters=backtest_parameters,
+            verbose=verbose,
+            save_results=save_results,
+        )
+
+    def _generate_trading_instances(self):
+        """
+        Generates one price handler and a stack of strategy, performance,
+        portfolio and execution handler per variant.
+        """
+        self.price_handler = self.price_handler(
+            events=self.events,
+            symbol_dict=self.symbol_dict,
+            start_dt=self.session_start_dt,
+            end_dt=self.session_end_dt,
+            **self.backtest_parameters.get("price_handler_param", {})
+        )
+
+        performance_param = self.backtest_parameters.get("performance_param") or {}
+        for strategy_parameters in self.strategy_parameters_list:
+            stack = SessionStack(strategy_parameters)
+            stack.strategy = self.strategy(
+                self.price_handler, stack.events, **strategy_parameters
+            )
+            stack.performance = self.performance(self.output_path, **performance_param)
+            stack.portfolio = self.portfolio(
+                initial_capital=self.initial_capital,
+                bars=self.price_handler,
+                events=stack.events,
+                performance=stack.performance,
+                **self.backtest_parameters.get("portfolio", {})
+            )
+            stack.execution_handler = self.execution_handler(
+                stack.events,
+                self.price_handler,
+                **self.backtest_parameters.get("execution_parameters", {})
+            )
+            self.stacks.append(stack)
+
+        if self.verbose:
+            print(
+                "Initializing objects...\n",
+                "Data Handler: %s \n" % self.price_handler,
+                "Variants: %s \n" % len(self.stacks),
+            )
+
+    def _run_stack(self, stack):
+        """Handles the events in the queue of one stack until it is empty"""
+        events = stack.events
+        while True:
+            try:
+                event = events.get(False)
+            except queue.Empty:
+                break
+            else:
+                if event is not None:
+                    if event.type == "MARKET":
+                        stack.strategy.calculate_signals(event)
+                        stack.portfolio.update_timeindex(event)
+                    elif event.type == "SIGNAL":
+                        stack.signals += 1
+                        stack.portfolio.update_signal(event)
+                    elif event.type == "ORDER":
+                        stack.orders += 1
+                        stack.execution_handler.execute_order(event)
+                    elif event.type == "FILL":
+                        stack.fills += 1
+                        stack.portfolio.update_fill(event)
+
+    def _run_session(self):
+        """
+        Executes the backtest of every variant over one price stream.
+        """
+        while self._continue_session_loop() is True:
+            self.price_handler.update_bars()
+            market_events = []
+            while True:
+                try:
+                    market_events.append(self.events.get(False))
+                except queue.Empty:
+                    break
+            for stack in self.stacks:
+                for event in market_events:
+                    stack.events.put(event)
+                self._run_stack(stack)
+
+    def _output_performance(self):
+        """
+        Returns the results of every variant in the order of
+        strategy_parameters_list.
+        """
+        results = []
+        for stack in self.stacks:
+            equity_curve = stack.portfolio.get_equity_curve()
+            (
+                equity_curve,
+                portfolio_metrics,
+            ) = stack.performance.calculate_portfolio_performance(equity_curve)
+            trade_data = stack.portfolio.get_trade_log()
+            trade_statistics = stack.performance.sort_trade_by_trade(trade_data)
+            if self.save_results:
+                stack.performance.save_equity_curve(equity_curve)
+                stack.performance.save_trade_log(trade_data)
+            results.append((equity_curve, trade_data, portfolio_metrics, trade_statistics))
+        return results
+
+    def start_trading(self):
+        """
+        Runs the batch. Returns a list of (equity_curve, trade_data,
+        portfolio_metrics, trade_statistics), one per variant.
+        """
+        try:
+            self._run_session()
+        finally:
+            self._close_price_handler()
+        log.info("Batch of %s backtests completed without error", len(self.stacks))
+        return self._output_performance()
@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+
+# distributed.py
+# Darren Yeap
+import os
+import sys
+import json
+import time
+import uuid
+import pickle
+import socket
+import argparse
+import threading
+import multiprocessing
+import numpy as np
+import pandas as pd
+
+# Import own modules
+from zetatrader.log import get_logger
+from zetatrader.trading.optimization import Optimization
+from zetatrader.trading.search import GridSearch
+from zetatrader.trading.results_store import code_version, run_key
+
+log = get_logger("trading.distributed")
+
+SESSION_FILE = "session.pkl"
+STOP_FILE = "stop"
+
+
+class FileWorkQueue:
+    """Work queue in a directory shared by every host, e.g. over NFS.
+
+    A job is a json file moving from pending/ to running/ to done/. A worker
+    claims a job by renaming it into running/ under its own id, which only
+    one worker can do, and touches it while the job runs. A job whose file
+    was not touched for lease_timeout seconds, or whose worker is known to
+    be dead, is moved back to pending/ and run again, at most max_attempts
+    times.
+    """
+
+    def __init__(self, path, lease_timeout=60.0, max_attempts=3):
+        self.path = path
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+        for folder in ("pending", "running", "done"):
+            os.makedirs(os.path.join(path, folder), exist_ok=True)
+
+    def _dir(self, folder):
+        return os.path.join(self.path, folder)
+
+    def _write(self, path, data):
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f, default=str)
+        os.replace(tmp, path)
+
+    def _read(self, path):
+        with open(path) as f:
+            return json.load(f)
+
+    def _jobs(self, folder):
+        return sorted(n for n in os.listdir(self._dir(folder)) if n.endswith(".json"))
+
+    # ================================#
+    # COORDINATOR
+    # ================================#
+    def reset(self):
+        """Removes the jobs and results of an earlier sweep"""
+        for folder in ("pending", "running", "done"):
+            for name in os.listdir(self._dir(folder)):
+                os.remove(os.path.join(self._dir(folder), name))
+        for name in (STOP_FILE, SESSION_FILE):
+            if os.path.exists(os.path.join(self.path, name)):
+                os.remove(os.path.join(self.path, name))
+
+    def write_session(self, session):
+        tmp = os.path.join(self.path, SESSION_FILE + ".tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump(session, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, os.path.join(self.path, SESSION_FILE))
+
+    def submit(self, job_id, payload):
+        payload = {**payload, "attempts": 0}
+        self._write(os.path.join(self._dir("pending"), f"{job_id}.json"), payload)
+
+    def collect(self):
+        """Returns and removes the finished jobs as a {job_id: result} dict"""
+        results = {}
+        for name in self._jobs("done"):
+            path = os.path.join(self._dir("done"), name)
+            try:
+                results[name[:-5]] = self._read(path)
+            except (FileNotFoundError, ValueError):
+                continue
+            os.remove(path)
+        return results
+
+    def running_workers(self):
+        """Returns {job_id: worker_id} of the claimed jobs"""
+        running = {}
+        for name in self._jobs("running"):
+            job_id, worker_id = name[:-5].split("@", 1)
+            running[job_id] = worker_id
+        return running
+
+    def requeue(self, dead_workers=()):
+        """Moves the jobs of dead workers and of expired leases back to
+        pending. A job past max_attempts is finished with an error instead.
+        Returns the number of jobs recovered.
+        """
+        recovered = 0
+        now = time.time()
+        for name in self._jobs("running"):
+            path = os.path.join(self._dir("running"), name)
+            job_id, worker_id = name[:-5].split("@", 1)
+            try:
+                expired = now - os.path.getmtime(path) > self.lease_timeout
+                if worker_id not in dead_workers and not expired:
+                    continue
+                payload = self._read(path)
+            except (FileNotFoundError, ValueError):
+                continue
+            payload["attempts"] = payload.get("attempts", 0) + 1
+            log.warning(
+                "Recovering job %s of worker %s (attempt %s)",
+                job_id, worker_id, payload["attempts"],
+            )
+            if payload["attempts"] >= self.max_attempts:
+                self._write(
+                    os.path.join(self._dir("done"), f"{job_id}.json"),
+                    {"error": f"Worker lost {payload['attempts']} times"},
+                )
+            else:
+                self._write(os.path.join(self._dir("pending"), f"{job_id}.json"), payload)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            recovered += 1
+        return recovered
+
+    def stop(self):
+        open(os.path.join(self.path, STOP_FILE), "w").close()
+
+    # ================================#
+    # WORKER
+    # ================================#
+    def stopped(self):
+        return os.path.exists(os.path.join(self.path, STOP_FILE))
+
+    def read_session(self):
+        path = os.path.join(self.path, SESSION_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    def claim(self, worker_id):
+        """Returns (job_id, payload) of a pending job now held by the
+        worker, or None when there is none.
+        """
+        for name in self._jobs("pending"):
+            job_id = name[:-5]
+            target = os.path.join(self._dir("running"), f"{job_id}@{worker_id}.json")
+            try:
+                os.rename(os.path.join(self._dir("pending"), name), target)
+            except FileNotFoundError:
+                # Claimed by another worker
+                continue
+            os.utime(target)
+            return job_id, self._read(target)
+        return None
+
+    def heartbeat(self, job_id, worker_id):
+        try:
+            os.utime(os.path.join(self._dir("running"), f"{job_id}@{worker_id}.json"))
+        except FileNotFoundError:
+            pass
+
+    def complete(self, job_id, worker_id, result):
+        self._write(os.path.join(self._dir("done"), f"{job_id}.json"), result)
+        try:
+            os.remove(os.path.join(self._dir("running"), f"{job_id}@{worker_id}.json"))
+        except FileNotFoundError:
+            pass
+
+
+# ================================#
+# WORKER
+# ================================#
+def run_worker(path, worker_id=None, lease_timeout=60.0, poll_interval=0.5, idle_timeout=None):
+    """Runs jobs from the work queue at path until the coordinator stops the
+    sweep, or no job came for idle_timeout seconds. The session settings and
+    any prices passed in memory are read once and reused for every job.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    work_queue = FileWorkQueue(path, lease_timeout=lease_timeout)
+    optimization = None
+    idle_since = time.monotonic()
+
+    while True:
+        if optimization is None:
+            session = work_queue.read_session()
+            if session is not None:
+                optimization = Optimization(**session)
+        job = work_queue.claim(worker_id) if optimization is not None else None
+        if job is None:
+            if work_queue.stopped():
+                break
+            if idle_timeout is not None and time.monotonic() - idle_since > idle_timeout:
+                break
+            time.sleep(poll_interval)
+            continue
+
+        job_id, payload = job
+        done = threading.Event()
+
+        def beat():
+            while not done.wait(lease_timeout / 3):
+                work_queue.heartbeat(job_id, worker_id)
+
+        heart = threading.Thread(target=beat, daemon=True)
+        heart.start()
+        try:
+            end_dt = payload.get("end_dt")
+            _, _, portfolio_metrics, _ = optimization._run_backtest_instance(
+                payload["params"], None if end_dt is None else pd.Timestamp(end_dt)
+            )
+            result = {"metrics": {k: float(v) for k, v in dict(portfolio_metrics).items()}}
+        except Exception as e:
+            log.warning("Job %s failed: %s", job_id, e)
+            result = {"error": repr(e)}
+        finally:
+            done.set()
+            heart.join()
+        work_queue.complete(job_id, worker_id, result)
+        idle_since = time.monotonic()
+    log.info("Worker %s stopped", worker_id)
+
+
+# ================================#
+# COORDINATOR
+# ================================#
+class DistributedOptimization(Optimization):
+    """Optimization whose backtests run on workers pulling from a
+    FileWorkQueue. Workers can be started on this host by the coordinator
+    and on any host sharing the queue directory with
+
+        python -m zetatrader.trading.distributed worker <queue path>
+
+    Strategy, portfolio, execution and performance classes must be
+    importable on every worker.
+    """
+
+    def optimize_strategy(
+        self,
+        queue_path,
+        n_workers=0,
+        search=None,
+        metric="Sharpe Ratio",
+        maximize=True,
+        max_runs=None,
+        max_time=None,
+        store=None,
+        max_pending=None,
+        lease_timeout=60.0,
+        max_attempts=3,
+        poll_interval=0.2,
+    ):
+        """Runs the sweep through the work queue at queue_path.
+
+        Args:
+            queue_path (str): Queue directory, cleared at the start
+            n_workers (int, optional): Worker processes started on this
+                host. Dead ones are started again while work remains.
+            max_pending (int, optional): Jobs submitted ahead of the results,
+                so adaptive searches learn from finished runs. Defaults to
+                twice the number of workers, at least 8.
+            lease_timeout (float, optional): Seconds without heartbeat after
+                which a job is given to another worker
+            max_attempts (int, optional): Times a job is given out before it
+                is recorded as failed
+
+        Other arguments are as in Optimization.optimize_strategy.
+
+        Returns:
+            pd.DataFrame: Parameters and portfolio metrics of every run in
+                the order they were proposed
+        """
+        if search is None:
+            search = GridSearch(self.strategy_parameters_dict)
+        if max_pending is None:
+            max_pending = max(2 * n_workers, 8)
+        work_queue = FileWorkQueue(queue_path, lease_timeout, max_attempts)
+        work_queue.reset()
+        work_queue.write_session(
+            {
+                "symbol_dict": self.symbol_dict,
+                "initial_capital": self.initial_capital,
+                "session_start_dt": self.session_start_dt,
+                "session_end_dt": self.session_end_dt,
+                "price_handler": self.price_handler,
+                "execution_handler": self.execution_handler,
+                "portfolio": self.portfolio,
+                "strategy": self.strategy,
+                "performance": self.performance,
+                "output_path": self.output_path,
+                "backtest_parameters": self.backtest_parameters,
+            }
+        )
+
+        context = multiprocessing.get_context("spawn")
+        workers = {}
+
+        def start_worker():
+            worker_id = f"{socket.gethostname()}-local-{uuid.uuid4().hex[:6]}"
+            process = context.Process(
+                target=run_worker,
+                args=(queue_path, worker_id, lease_timeout, poll_interval),
+                daemon=True,
+            )
+            process.start()
+            workers[worker_id] = process
+
+        for _ in range(n_workers):
+            start_worker()
+
+        version = code_version(self.strategy) if store is not None else None
+        rows = []
+        outstanding = {}
+        exhausted = False
+        start = time.monotonic()
+        try:
+            while True:
+                # Submit until the pending limit or the budget is reached
+                while not exhausted and len(outstanding) < max_pending:
+                    if max_runs is not None and len(rows) >= max_runs:
+                        exhausted = True
+                        break
+                    if max_time is not None and time.monotonic() - start >= max_time:
+                        log.info("Time budget of %ss spent", max_time)
+                        exhausted = True
+                        break
+                    trial = search.ask()
+                    if trial is None:
+                        # Searches waiting on results may propose more later
+                        exhausted = not outstanding
+                        break
+                    sp, fraction = trial
+                    end_dt = self._fraction_end_dt(fraction)
+                    row = {**sp}
+                    if fraction < 1.0:
+                        row["Session Fraction"] = fraction
+                    rows.append(row)
+                    job = {
+                        "row": len(rows) - 1,
+                        "params": sp,
+                        "fraction": fraction,
+                        "end_dt": end_dt,
+                    }
+                    if store is not None:
+                        job["key"] = run_key(
+                            sp, version, (self.symbol_dict, self.session_start_dt, end_dt)
+                        )
+                        stored = store.get(job["key"])
+                        if stored is not None:
+                            self._record(search, job, {"metrics": stored}, rows, metric, maximize)
+                            continue
+                    job_id = f"{len(rows) - 1:08d}"
+                    outstanding[job_id] = job
+                    work_queue.submit(
+                        job_id,
+                        {"params": sp, "end_dt": None if fraction >= 1.0 else str(end_dt)},
+                    )
+
+                if exhausted and not outstanding:
+                    break
+
+                for job_id, result in work_queue.collect().items():
+                    job = outstanding.pop(job_id, None)
+                    if job is None:
+                        continue
+                    self._record(search, job, result, rows, metric, maximize)
+                    if store is not None and "metrics" in result:
+                        store.put(
+                            job["key"], job["params"], result["metrics"], version,
+                            self.session_start_dt, job["end_dt"],
+                        )
+                if not outstanding and exhausted:
+                    break
+
+                # Recover the jobs of dead local workers and expired leases
+                dead = [w for w, p in workers.items() if not p.is_alive()]
+                work_queue.requeue(dead_workers=dead)
+                for worker_id in dead:
+                    log.warning("Local worker %s died, starting a new one", worker_id)
+                    workers.pop(worker_id).join()
+                    start_worker()
+                if outstanding:
+                    time.sleep(poll_interval)
+        finally:
+            work_queue.stop()
+            for process in workers.values():
+                process.join(timeout=10)
+                if process.is_alive():
+                    process.terminate()
+        return pd.DataFrame(rows)
+
+    def _record(self, search, job, result, rows, metric, maximize):
+        """Adds the result of a job to its row and tells the search"""
+        portfolio_metrics = result.get("metrics") or {}
+        if "error" in result:
+            log.warning("Backtest with %s failed: %s", job["params"], result["error"])
+        rows[job["row"]].update(portfolio_metrics)
+        score = portfolio_metrics.get(metric, np.nan)
+        search.tell(job["params"], score if maximize else -score, job["fraction"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Distributed optimization worker")
+    parser.add_argument("command", choices=["worker"])
+    parser.add_argument("path", help="Work queue directory shared with the coordinator")
+    parser.add_argument("--worker-id", default=None)
+    parser.add_argument("--lease-timeout", type=float, default=60.0)
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--idle-timeout", type=float, default=None)
+    args = parser.parse_args(argv)
+    run_worker(
+        args.path,
+        args.worker_id,
+        args.lease_timeout,
+        args.poll_interval,
+        args.idle_timeout,
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
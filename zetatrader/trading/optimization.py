@@ -1,10 +1,17 @@
 #!/usr/bin/env python3
 # # -*- coding: utf-8 -*-
+import time
 import itertools
+import numpy as np
 import pandas as pd
 
 # Import own modules
+from zetatrader.log import get_logger
 from zetatrader.trading.backtest import TradingSession
+from zetatrader.trading.search import GridSearch
+from zetatrader.trading.results_store import code_version, run_key
+
+log = get_logger("trading.optimization")
 
 
 class Optimization:
@@ -50,13 +57,13 @@ class Optimization:
             param_combinations.append(params)
         return param_combinations
 
-    def _run_backtest_instance(self, strat_param):
+    def _run_backtest_instance(self, strat_param, session_end_dt=None):
         # Run a single backtest for the given strategy parameters
         backtest = TradingSession(
             symbol_dict=self.symbol_dict,
             initial_capital=self.initial_capital,
             session_start_dt=self.session_start_dt,
-            session_end_dt=self.session_end_dt,
+            session_end_dt=session_end_dt or self.session_end_dt,
             price_handler=self.price_handler,
             execution_handler=self.execution_handler,
             portfolio=self.portfolio,
@@ -71,12 +78,88 @@ class Optimization:
 
         return backtest.start_trading()
 
-    def optimize_strategy(self):
+    def _fraction_end_dt(self, fraction):
+        # End of the first fraction of the session
+        if fraction >= 1.0:
+            return self.session_end_dt
+        start = pd.Timestamp(self.session_start_dt)
+        return start + (pd.Timestamp(self.session_end_dt) - start) * fraction
+
+    def optimize_strategy(
+        self,
+        search=None,
+        metric="Sharpe Ratio",
+        maximize=True,
+        max_runs=None,
+        max_time=None,
+        store=None,
+    ):
+        """Backtests the parameters proposed by a search strategy until it is
+        done or the budget is spent.
+
+        Args:
+            search (SearchStrategy, optional): Defaults to a GridSearch over
+                strategy_parameters_dict.
+            metric (str, optional): Portfolio metric told to the search.
+                Defaults to "Sharpe Ratio".
+            maximize (bool, optional): Higher metric is better
+            max_runs (int, optional): Most backtests to run
+            max_time (float, optional): Seconds after which no new backtest
+                is started
+            store (ResultsStore, optional): Every finished run is written to
+                the store and runs already in it are not run again. Runs are
+                keyed by strategy parameters, strategy source and data
+                range; use a new store when other settings change.
+
+        Returns:
+            pd.DataFrame: Parameters and portfolio metrics of every run. Runs
+                on part of the session have their share in "Session
+                Fraction".
+        """
+        if search is None:
+            search = GridSearch(self.strategy_parameters_dict)
         optimization_performance = []
-        param_combinations = self._construct_parameter_combination()
+        start = time.monotonic()
+        version = code_version(self.strategy) if store is not None else None
+
+        while max_runs is None or len(optimization_performance) < max_runs:
+            if max_time is not None and time.monotonic() - start >= max_time:
+                log.info("Time budget of %ss spent", max_time)
+                break
+            trial = search.ask()
+            if trial is None:
+                break
+            sp, fraction = trial
+            end_dt = self._fraction_end_dt(fraction)
+            key = None
+            portfolio_metrics = None
+            if store is not None:
+                key = run_key(
+                    sp, version, (self.symbol_dict, self.session_start_dt, end_dt)
+                )
+                portfolio_metrics = store.get(key)
+            if portfolio_metrics is not None:
+                log.info("Stored result for parameters: %s", sp)
+            else:
+                log.info("Backtesting with parameters: %s", sp)
+                try:
+                    _, _, portfolio_metrics, _ = self._run_backtest_instance(
+                        sp, end_dt
+                    )
+                    portfolio_metrics = dict(portfolio_metrics)
+                    if store is not None:
+                        store.put(
+                            key, sp, portfolio_metrics, version,
+                            self.session_start_dt, end_dt
+                        )
+                except Exception as e:
+                    log.warning("Backtest with %s failed: %s", sp, e)
+                    portfolio_metrics = {}
+            score = portfolio_metrics.get(metric, np.nan)
+            search.tell(sp, score if maximize else -score, fraction)
 
-        for sp in param_combinations:
-            print(f"Backtesting with parameters: {sp}")
-            _, _, portfolio_metrics, _ = self._run_backtest_instance(sp)
-            optimization_performance.append({**sp, **portfolio_metrics})
+            row = {**sp, **portfolio_metrics}
+            if fraction < 1.0:
+                row["Session Fraction"] = fraction
+            optimization_performance.append(row)
         return pd.DataFrame(optimization_performance)
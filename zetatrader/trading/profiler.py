@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+
+# profiler.py
+# Darren Yeap
+import random
+import numpy as np
+import pandas as pd
+
+# Handler called for each event type in the session loop, in loop order
+HANDLERS = [
+    "price_handler.update_bars",
+    "strategy.calculate_signals",
+    "portfolio.update_timeindex",
+    "portfolio.update_signal",
+    "execution_handler.execute_order",
+    "portfolio.update_fill",
+]
+EVENT_TYPES = ["MARKET", "SIGNAL", "ORDER", "FILL"]
+
+
+class LatencyStats:
+    """Running count, total and max of the latency samples of one name and
+    a uniform reservoir of at most size samples the percentiles are taken
+    from. Memory stays bounded however long the session runs and the
+    percentiles are exact while calls are at most size.
+    """
+
+    __slots__ = ("count", "total", "max", "reservoir", "size", "rng")
+
+    def __init__(self, size, rng):
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.reservoir = []
+        self.size = size
+        self.rng = rng
+
+    def add(self, ns):
+        self.count += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+        if len(self.reservoir) < self.size:
+            self.reservoir.append(ns)
+        else:
+            # Keeps every sample with probability size / count
+            i = self.rng.randrange(self.count)
+            if i < self.size:
+                self.reservoir[i] = ns
+
+
+class SessionProfiler:
+    """Records the latency of every handler call and every event handled
+    by a trading session loop. Latencies are kept in nanoseconds as running
+    aggregates and a reservoir sample per name, so the summary can give
+    percentiles and not only averages.
+    """
+
+    def __init__(self, reservoir_size=4096, seed=None):
+        """Initialize profiler.
+
+        Args:
+            reservoir_size (int, optional): Samples kept per name for the
+                percentiles. Defaults to 4096.
+            seed (int, optional): Seed of the reservoir sampling
+        """
+        self.reservoir_size = reservoir_size
+        self.rng = random.Random(seed)
+        self.samples = {}
+        self.loop_ns = 0
+
+    def record(self, name, ns):
+        """Adds a latency sample in nanoseconds for name"""
+        stats = self.samples.get(name)
+        if stats is None:
+            stats = self.samples[name] = LatencyStats(self.reservoir_size, self.rng)
+        stats.add(ns)
+
+    def summary(self):
+        """Returns a dataframe with one row per handler and per event type:
+        calls, total seconds, share of the loop time and mean, p50, p90, p99
+        and max latency in microseconds.
+        """
+        rows = []
+        names = [n for n in HANDLERS + EVENT_TYPES if n in self.samples]
+        names += [n for n in self.samples if n not in names]
+        for name in names:
+            stats = self.samples[name]
+            reservoir = np.asarray(stats.reservoir, dtype=float)
+            p50, p90, p99 = np.percentile(reservoir, [50, 90, 99]) / 1e3
+            rows.append(
+                {
+                    "name": name,
+                    "level": "event" if name in EVENT_TYPES else "handler",
+                    "calls": stats.count,
+                    "total_s": stats.total / 1e9,
+                    "loop_%": 100 * stats.total / self.loop_ns if self.loop_ns else np.nan,
+                    "mean_us": stats.total / stats.count / 1e3,
+                    "p50_us": p50,
+                    "p90_us": p90,
+                    "p99_us": p99,
+                    "max_us": stats.max / 1e3,
+                }
+            )
+        columns = [
+            "name", "level", "calls", "total_s", "loop_%", "mean_us", "p50_us",
+            "p90_us", "p99_us", "max_us",
+        ]
+        return pd.DataFrame(rows, columns=columns).set_index("name")
+
+    def reset(self):
+        self.samples = {}
+        self.loop_ns = 0
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+
+# results_store.py
+# Darren Yeap
+import json
+import time
+import inspect
+import hashlib
+import sqlite3
+import pandas as pd
+
+
+def code_version(strategy):
+    """Returns a hash of the source of the module defining the strategy
+    class, so results of an edited strategy are not mixed with old ones.
+    """
+    try:
+        source = inspect.getsource(inspect.getmodule(strategy))
+    except (OSError, TypeError):
+        source = f"{strategy.__module__}.{strategy.__qualname__}"
+    return hashlib.sha256(source.encode()).hexdigest()[:16]
+
+
+def run_key(params, version, data_range):
+    """Returns the key of a run from its strategy parameters, code version
+    and data range, e.g. (symbol_dict, start_dt, end_dt).
+    """
+    payload = json.dumps(
+        [params, version, data_range], sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResultsStore:
+    """Append only SQLite store of optimization runs. Every finished run is
+    committed at once, so a sweep that crashes loses at most the run in
+    progress and a rerun skips the stored ones. The database is in WAL
+    mode, other processes can query it while the sweep is writing, e.g.
+
+        ResultsStore("sweep.db").results().sort_values("Sharpe Ratio")
+    """
+
+    def __init__(self, path, timeout=30.0):
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=timeout)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, "
+            "created REAL, "
+            "code_version TEXT, "
+            "start_dt TEXT, "
+            "end_dt TEXT, "
+            "params TEXT, "
+            "metrics TEXT)"
+        )
+        self._conn.commit()
+
+    def __contains__(self, key):
+        row = self._conn.execute(
+            "SELECT 1 FROM results WHERE key = ?", (key,)
+        ).fetchone()
+        return row is not None
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def get(self, key):
+        """Returns the stored metrics of a run or None"""
+        row = self._conn.execute(
+            "SELECT metrics FROM results WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def put(self, key, params, metrics, code_version=None, start_dt=None, end_dt=None):
+        """Stores a finished run. A key already stored is left as it is."""
+        self._conn.execute(
+            "INSERT OR IGNORE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                key,
+                time.time(),
+                code_version,
+                None if start_dt is None else str(start_dt),
+                None if end_dt is None else str(end_dt),
+                json.dumps(params, sort_keys=True, default=str),
+                json.dumps({k: float(v) for k, v in dict(metrics).items()}),
+            ),
+        )
+        self._conn.commit()
+
+    def results(self, code_version=None):
+        """Returns a dataframe of the parameters and metrics of every stored
+        run in the order they finished, optionally of one code version.
+        """
+        query = "SELECT code_version, start_dt, end_dt, params, metrics FROM results"
+        args = ()
+        if code_version is not None:
+            query += " WHERE code_version = ?"
+            args = (code_version,)
+        rows = []
+        for version, start_dt, end_dt, params, metrics in self._conn.execute(
+            query + " ORDER BY created", args
+        ):
+            rows.append(
+                {
+                    **json.loads(params),
+                    **json.loads(metrics),
+                    "code_version": version,
+                    "start_dt": start_dt,
+                    "end_dt": end_dt,
+                }
+            )
+        return pd.DataFrame(rows)
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+
+# run_cache.py
+# Darren Yeap
+import os
+import json
+import time
+import pickle
+import inspect
+import hashlib
+import datetime as dt
+import numpy as np
+import pandas as pd
+
+# Import own modules
+from zetatrader.log import get_logger
+
+log = get_logger("trading.run_cache")
+
+
+def _class_source(cls):
+    try:
+        return inspect.getsource(cls)
+    except (OSError, TypeError):
+        return f"{cls.__module__}.{cls.__qualname__}"
+
+
+def _normalize(value, depth=0):
+    """Returns a json serializable stand in for value. Dataframes, series
+    and arrays are replaced by a hash of their content, datasources by their
+    cache_key(). Raises TypeError for anything without a stable identity,
+    e.g. objects holding connections, whose repr changes on every run.
+    """
+    if depth > 8:
+        raise TypeError("Cannot fingerprint values nested this deep")
+    if isinstance(value, dict):
+        return {
+            str(k): _normalize(v, depth + 1)
+            for k, v in sorted(value.items(), key=lambda x: str(x[0]))
+        }
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = sorted(value, key=str) if isinstance(value, (set, frozenset)) else value
+        return [_normalize(v, depth + 1) for v in items]
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        digest = hashlib.sha256(
+            pd.util.hash_pandas_object(value).values.tobytes()
+        )
+        if isinstance(value, pd.DataFrame):
+            digest.update(str(list(value.columns)).encode())
+        return f"pandas:{digest.hexdigest()}"
+    if isinstance(value, np.ndarray):
+        return f"ndarray:{hashlib.sha256(value.tobytes()).hexdigest()}"
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, type) or inspect.isfunction(value):
+        return f"{value.__module__}.{value.__qualname__}"
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    if isinstance(value, (dt.date, dt.time, dt.timedelta, pd.Timestamp, pd.Timedelta)):
+        return str(value)
+    if callable(getattr(value, "cache_key", None)):
+        return {
+            "class": f"{type(value).__module__}.{type(value).__qualname__}",
+            "key": _normalize(value.cache_key(), depth + 1),
+        }
+    raise TypeError(
+        f"Cannot fingerprint {type(value).__qualname__}, give it a cache_key() "
+        "returning a stable identity of its data"
+    )
+
+
+def fingerprint(value):
+    """Returns a sha256 hex digest of value. Raises TypeError like
+    _normalize for values without a stable identity.
+    """
+    payload = json.dumps(_normalize(value), sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def session_fingerprint(
+    strategy,
+    strategy_parameters,
+    backtest_parameters,
+    symbol_dict,
+    session_start_dt,
+    session_end_dt,
+    initial_capital=0.0,
+    components=(),
+):
+    """Returns the cache key of a backtest. Prices held in memory, e.g. in
+    price_handler_param, are hashed by content. Prices read from a database
+    are identified by the cache_key() of the datasource, symbol_dict and
+    date range only. Raises TypeError when a parameter cannot be identified.
+    """
+    payload = json.dumps(
+        {
+            "strategy": _class_source(strategy),
+            "strategy_parameters": _normalize(strategy_parameters),
+            "backtest_parameters": _normalize(backtest_parameters),
+            "symbol_dict": _normalize(symbol_dict),
+            "start": str(session_start_dt),
+            "end": str(session_end_dt),
+            "initial_capital": initial_capital,
+            "components": [_normalize(c) for c in components],
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class RunCache:
+    """Disk cache of start_trading results, one pickle file per run. Entries
+    are evicted least recently used first when the cache holds more than
+    max_entries runs or max_bytes on disk. Temporary files left by writers
+    that died mid put are removed once older than TMP_TTL seconds.
+    """
+
+    SUFFIX = ".pkl"
+    TMP_SUFFIX = ".tmp"
+    TMP_TTL = 3600
+
+    def __init__(self, path, max_bytes=2 ** 30, max_entries=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, key):
+        return os.path.join(self.path, key + self.SUFFIX)
+
+    def __contains__(self, key):
+        return os.path.exists(self._file(key))
+
+    def __len__(self):
+        return len(self._entries())
+
+    def get(self, key):
+        """Returns the stored results or None"""
+        path = self._file(key)
+        try:
+            with open(path, "rb") as f:
+                results = pickle.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+            log.warning("Dropping unreadable cache entry %s: %s", key, e)
+            self._remove(path)
+            self.misses += 1
+            return None
+        # Marks the entry as recently used
+        os.utime(path)
+        self.hits += 1
+        return results
+
+    def put(self, key, results):
+        """Stores results and evicts old entries past the limits"""
+        path = self._file(key)
+        tmp = f"{path}.{os.getpid()}{self.TMP_SUFFIX}"
+        with open(tmp, "wb") as f:
+            pickle.dump(results, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        self.evict()
+
+    def _entries(self):
+        """Returns (mtime, size, path) of every entry, oldest first"""
+        entries = []
+        for name in os.listdir(self.path):
+            if not name.endswith(self.SUFFIX):
+                continue
+            path = os.path.join(self.path, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        entries.sort()
+        return entries
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _sweep_tmp(self):
+        """Removes temporary files older than TMP_TTL. Younger ones may
+        still be written by another process.
+        """
+        now = time.time()
+        for name in os.listdir(self.path):
+            if not name.endswith(self.TMP_SUFFIX):
+                continue
+            path = os.path.join(self.path, name)
+            try:
+                if now - os.stat(path).st_mtime > self.TMP_TTL:
+                    self._remove(path)
+            except FileNotFoundError:
+                continue
+
+    def evict(self):
+        self._sweep_tmp()
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        while entries and (
+            (self.max_bytes is not None and total > self.max_bytes)
+            or (self.max_entries is not None and len(entries) > self.max_entries)
+        ):
+            _, size, path = entries.pop(0)
+            self._remove(path)
+            total -= size
+
+    def clear(self):
+        for _, _, path in self._entries():
+            self._remove(path)
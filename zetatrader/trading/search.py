@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+
+# search.py
+# Darren Yeap
+import math
+import itertools
+import numpy as np
+from scipy.stats import norm, qmc
+
+
+class SearchStrategy:
+    """Proposes strategy parameters to an Optimization one run at a time.
+
+    The parameter space maps each parameter to either a list of values or a
+    (low, high) tuple range, e.g. {'fast': [5, 10, 20], 'stop': (0.5, 3.0)}.
+    A range of two ints gives ints, otherwise floats.
+
+    ask() returns (parameters, fraction) where fraction is the share of the
+    session the run covers, or None when the search is done or waits on
+    runs still in progress. tell() gives back the score of the run, higher
+    is better and NaN for failed runs, with the fraction it was asked for.
+    """
+
+    def __init__(self, space):
+        self.space = dict(space)
+        self.names = list(self.space.keys())
+        for name, values in self.space.items():
+            if isinstance(values, tuple):
+                if len(values) != 2 or values[0] > values[1]:
+                    raise ValueError(f"Range of {name} must be (low, high)")
+            elif len(values) == 0:
+                raise ValueError(f"No values given for {name}")
+
+    def ask(self):
+        raise NotImplementedError("Should implement ask()")
+
+    def tell(self, params, score, fraction=None):
+        pass
+
+    # ================================#
+    # UNIT CUBE ENCODING
+    # ================================#
+    def decode(self, point):
+        """Returns the parameters of a point in the unit cube"""
+        params = {}
+        for name, u in zip(self.names, point):
+            values = self.space[name]
+            u = min(max(float(u), 0.0), 1.0)
+            if isinstance(values, tuple):
+                low, high = values
+                if isinstance(low, int) and isinstance(high, int):
+                    params[name] = min(int(low + u * (high - low + 1)), high)
+                else:
+                    params[name] = low + u * (high - low)
+            else:
+                params[name] = values[min(int(u * len(values)), len(values) - 1)]
+        return params
+
+    def encode(self, params):
+        """Returns the point in the unit cube at the centre of the cell of
+        the parameters.
+        """
+        point = []
+        for name in self.names:
+            values = self.space[name]
+            value = params[name]
+            if isinstance(values, tuple):
+                low, high = values
+                if isinstance(low, int) and isinstance(high, int):
+                    point.append((value - low + 0.5) / (high - low + 1))
+                elif high > low:
+                    point.append((value - low) / (high - low))
+                else:
+                    point.append(0.5)
+            else:
+                point.append((list(values).index(value) + 0.5) / len(values))
+        return np.array(point)
+
+
+class GridSearch(SearchStrategy):
+    """Every combination of the parameter lists, generated lazily"""
+
+    def __init__(self, space):
+        super().__init__(space)
+        for name, values in self.space.items():
+            if isinstance(values, tuple):
+                raise ValueError(f"Grid search needs a list of values for {name}")
+        self._combinations = itertools.product(*(self.space[p] for p in self.names))
+
+    def __len__(self):
+        return math.prod(len(v) for v in self.space.values())
+
+    def ask(self):
+        comb = next(self._combinations, None)
+        if comb is None:
+            return None
+        return dict(zip(self.names, comb)), 1.0
+
+
+class RandomSearch(SearchStrategy):
+    """n parameter sets drawn uniformly from the space"""
+
+    def __init__(self, space, n=100, seed=None):
+        super().__init__(space)
+        self.n = n
+        self.count = 0
+        self.rng = np.random.default_rng(seed)
+
+    def ask(self):
+        if self.n is not None and self.count >= self.n:
+            return None
+        self.count += 1
+        return self.decode(self.rng.random(len(self.names))), 1.0
+
+
+class LatinHypercubeSearch(SearchStrategy):
+    """n parameter sets with every parameter range split in n strata and
+    each stratum sampled once, covering the space more evenly than random
+    search for the same number of runs.
+    """
+
+    def __init__(self, space, n=100, seed=None):
+        super().__init__(space)
+        points = qmc.LatinHypercube(d=len(self.names), seed=seed).random(n)
+        self._points = iter(points)
+
+    def ask(self):
+        point = next(self._points, None)
+        if point is None:
+            return None
+        return self.decode(point), 1.0
+
+
+class BayesianSearch(SearchStrategy):
+    """Gaussian process Bayesian optimization. The first n_initial runs are
+    a Latin hypercube, after that each run is the candidate with the highest
+    expected improvement over the best score so far.
+    """
+
+    def __init__(
+        self,
+        space,
+        n=50,
+        n_initial=10,
+        n_candidates=1000,
+        length_scale=0.2,
+        noise=1e-3,
+        xi=0.01,
+        seed=None,
+    ):
+        super().__init__(space)
+        self.n = n
+        self.n_candidates = n_candidates
+        self.length_scale = length_scale
+        self.noise = noise
+        self.xi = xi
+        self.count = 0
+        self.rng = np.random.default_rng(seed)
+        self._initial = LatinHypercubeSearch(space, min(n_initial, n), seed)
+        self.X = []
+        self.y = []
+
+    def tell(self, params, score, fraction=None):
+        if score is None or np.isnan(score):
+            return
+        self.X.append(self.encode(params))
+        self.y.append(float(score))
+
+    def _kernel(self, a, b):
+        d2 = ((a[:, None, :] - b[None, :, :]) ** 2).sum(axis=-1)
+        return np.exp(-0.5 * d2 / self.length_scale ** 2)
+
+    def expected_improvement(self, candidates):
+        """Returns the expected improvement of candidate points"""
+        X = np.array(self.X)
+        y = np.array(self.y)
+        mean, std = y.mean(), y.std() or 1.0
+        y = (y - mean) / std
+
+        K = self._kernel(X, X) + self.noise * np.eye(len(X))
+        L = np.linalg.cholesky(K)
+        alpha = np.linalg.solve(L.T, np.linalg.solve(L, y))
+        k = self._kernel(candidates, X)
+        mu = k @ alpha
+        v = np.linalg.solve(L, k.T)
+        sigma = np.sqrt(np.maximum(1.0 - (v ** 2).sum(axis=0), 1e-12))
+
+        z = (mu - y.max() - self.xi) / sigma
+        return (mu - y.max() - self.xi) * norm.cdf(z) + sigma * norm.pdf(z)
+
+    def ask(self):
+        if self.n is not None and self.count >= self.n:
+            return None
+        self.count += 1
+        trial = self._initial.ask()
+        if trial is not None:
+            return trial
+        if len(self.y) < 2:
+            return self.decode(self.rng.random(len(self.names))), 1.0
+        candidates = self.rng.random((self.n_candidates, len(self.names)))
+        ei = self.expected_improvement(candidates)
+        return self.decode(candidates[int(np.argmax(ei))]), 1.0
+
+
+class SuccessiveHalving(SearchStrategy):
+    """Runs n parameter sets from a sampler on the first min_fraction of the
+    session, keeps the best 1/eta of them and runs those on eta times more
+    of the session, until the survivors run on the whole session. Clearly
+    bad parameters are dropped after a short part of the session.
+
+    A round is promoted only once every run given out in it is told, so
+    runs can finish out of order, e.g. on a DistributedOptimization. Scores
+    told with the fraction of an earlier round are dropped.
+    """
+
+    def __init__(self, space, n=27, eta=3, min_fraction=None, sampler=None, seed=None):
+        super().__init__(space)
+        if eta < 2:
+            raise ValueError("eta must be at least 2")
+        sampler = sampler if sampler is not None else RandomSearch(space, n, seed)
+        self.eta = eta
+        self.candidates = []
+        while len(self.candidates) < n:
+            trial = sampler.ask()
+            if trial is None:
+                break
+            self.candidates.append(trial[0])
+        if min_fraction is None:
+            rounds = max(int(math.log(max(len(self.candidates), 1), eta)), 0)
+            min_fraction = eta ** -rounds
+        self.fraction = min(min_fraction, 1.0)
+        self._pending = list(self.candidates)
+        self._given = 0
+        self._scores = []
+
+    def ask(self):
+        if not self._pending:
+            return None
+        self._given += 1
+        return self._pending.pop(0), self.fraction
+
+    def tell(self, params, score, fraction=None):
+        if fraction is not None and fraction != self.fraction:
+            return
+        self._scores.append((params, score))
+        if self._pending or len(self._scores) < self._given or self.fraction >= 1.0:
+            return
+        # Round done, promote the best 1/eta to a longer part of the session
+        scored = [(p, s) for p, s in self._scores if s is not None and not np.isnan(s)]
+        scored.sort(key=lambda x: x[1], reverse=True)
+        keep = max(len(scored) // self.eta, 1)
+        self._pending = [p for p, _ in scored[:keep]]
+        self._given = 0
+        self._scores = []
+        self.fraction = min(self.fraction * self.eta, 1.0)
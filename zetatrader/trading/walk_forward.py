@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+
+# walk_forward.py
+# Darren Yeap
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+# Import own modules
+from zetatrader.log import get_logger
+from zetatrader.stats_tools import walk_forward_split
+from zetatrader.trading.backtest import TradingSession
+from zetatrader.trading.optimization import Optimization
+from zetatrader.price_handler.datasource import SecuritiesDb
+from zetatrader.price_handler.memory_price_handler import (
+    MemoryDatasource, MemoryPriceHandler, load_memory_datasource
+)
+
+log = get_logger("trading.walk_forward")
+
+# Bars of the whole span, set once per worker process
+_datasource = None
+
+
+def _init_worker(datasource):
+    global _datasource
+    _datasource = datasource
+
+
+def _run_window(session_kwargs, start_dt, end_dt, strategy_parameters,
+                datasource=None, full_results=False):
+    """Runs one backtest over [start_dt, end_dt] of the in memory bars.
+    Returns the portfolio metrics, or the whole start_trading result when
+    full_results is set.
+    """
+    datasource = _datasource if datasource is None else datasource
+    backtest_parameters = dict(session_kwargs["backtest_parameters"])
+    backtest_parameters["price_handler_param"] = {
+        **backtest_parameters.get("price_handler_param", {}),
+        "prices": datasource,
+    }
+    session = TradingSession(
+        symbol_dict=session_kwargs["symbol_dict"],
+        initial_capital=session_kwargs["initial_capital"],
+        session_start_dt=start_dt,
+        session_end_dt=end_dt,
+        price_handler=MemoryPriceHandler,
+        execution_handler=session_kwargs["execution_handler"],
+        portfolio=session_kwargs["portfolio"],
+        strategy=session_kwargs["strategy"],
+        performance=session_kwargs["performance"],
+        output_path=session_kwargs["output_path"],
+        backtest_parameters=backtest_parameters,
+        strategy_parameters=strategy_parameters,
+        verbose=False,
+        save_results=False,
+    )
+    results = session.start_trading()
+    if full_results:
+        return results
+    return results[2]
+
+
+class WalkForward(Optimization):
+    """Walk forward optimization. The span between session_start_dt and
+    session_end_dt is split by stats_tools.walk_forward_split into train
+    and test windows. The parameter grid is backtested on each train window,
+    the best parameters by metric are backtested on the following test
+    window and the out of sample equity curves are stitched together.
+
+    Bars are read from the datasource once for the whole span and every
+    fold reads its window from memory. Backtests run in n_jobs processes,
+    so strategy, portfolio, execution and performance classes must be
+    importable at module level.
+    """
+
+    def __init__(
+        self,
+        symbol_dict,
+        initial_capital=0.0,
+        session_start_dt=None,
+        session_end_dt=None,
+        execution_handler=None,
+        portfolio=None,
+        strategy=None,
+        performance=None,
+        output_path=None,
+        backtest_parameters={},
+        strategy_parameters_dict=None,
+        datasource=None,
+        metric="Sharpe Ratio",
+        maximize=True,
+        cumm_traintest_ratio=0.5,
+        n_splits=3,
+        n_jobs=1,
+    ):
+        """Initialize walk forward optimization.
+
+        Args:
+            datasource (optional): SecuritiesDb, LocalDb or MemoryDatasource
+                the bars are read from. Defaults to SecuritiesDb().
+            metric (str, optional): Portfolio metric parameters are chosen
+                by. Defaults to "Sharpe Ratio".
+            maximize (bool, optional): Choose the highest metric, else the
+                lowest. Defaults to True.
+            cumm_traintest_ratio (float, optional): See walk_forward_split
+            n_splits (int, optional): Number of folds
+            n_jobs (int, optional): Backtests run in parallel. Defaults to
+                1, everything runs in this process.
+        """
+        super().__init__(
+            symbol_dict,
+            initial_capital=initial_capital,
+            session_start_dt=session_start_dt,
+            session_end_dt=session_end_dt,
+            price_handler=MemoryPriceHandler,
+            execution_handler=execution_handler,
+            portfolio=portfolio,
+            strategy=strategy,
+            performance=performance,
+            output_path=output_path,
+            backtest_parameters=backtest_parameters,
+            strategy_parameters_dict=strategy_parameters_dict,
+        )
+        self.datasource = datasource
+        self.metric = metric
+        self.maximize = maximize
+        self.cumm_traintest_ratio = cumm_traintest_ratio
+        self.n_splits = n_splits
+        self.n_jobs = n_jobs
+        self.memory_datasource = None
+
+    # ================================#
+    # DATA
+    # ================================#
+    def load_data(self):
+        """Reads the bars of the whole span once. Returns a MemoryDatasource"""
+        if self.memory_datasource is None:
+            if isinstance(self.datasource, MemoryDatasource):
+                self.memory_datasource = self.datasource
+            else:
+                param = self.backtest_parameters.get("price_handler_param", {})
+                datasource = self.datasource
+                if datasource is None:
+                    datasource = SecuritiesDb()
+                self.memory_datasource = load_memory_datasource(
+                    datasource,
+                    self.symbol_dict,
+                    self.session_start_dt,
+                    self.session_end_dt,
+                    frequency=param.get("frequency", "daily"),
+                    data_vendor=param.get("data_vendor", 6),
+                )
+        return self.memory_datasource
+
+    def construct_folds(self):
+        """Returns a list of (train_start, train_end, test_start, test_end)
+        bar dates, one per fold.
+        """
+        datasource = self.load_data()
+        param = self.backtest_parameters.get("price_handler_param", {})
+        calendar = datasource.read_price_dates(
+            self.symbol_dict.values(),
+            self.session_start_dt,
+            self.session_end_dt,
+            param.get("frequency", "daily"),
+        )
+        folds = []
+        for train, test in walk_forward_split(
+            calendar, self.cumm_traintest_ratio, self.n_splits
+        ):
+            test_end = min(test[1], len(calendar))
+            if train[1] <= train[0] or test_end <= test[0]:
+                continue
+            folds.append(
+                (
+                    calendar[train[0]],
+                    calendar[train[1] - 1],
+                    calendar[test[0]],
+                    calendar[test_end - 1],
+                )
+            )
+        return folds
+
+    # ================================#
+    # WALK FORWARD
+    # ================================#
+    def _session_kwargs(self):
+        return {
+            "symbol_dict": self.symbol_dict,
+            "initial_capital": self.initial_capital,
+            "execution_handler": self.execution_handler,
+            "portfolio": self.portfolio,
+            "strategy": self.strategy,
+            "performance": self.performance,
+            "output_path": self.output_path,
+            "backtest_parameters": self.backtest_parameters,
+        }
+
+    def _select(self, combinations, metrics):
+        """Returns the index of the best combination, ignoring runs without
+        the metric.
+        """
+        values = np.array(
+            [m.get(self.metric, np.nan) if m is not None else np.nan for m in metrics],
+            dtype=float,
+        )
+        if np.isnan(values).all():
+            return 0
+        return int(np.nanargmax(values) if self.maximize else np.nanargmin(values))
+
+    def _map(self, executor, jobs, full_results=False):
+        """Runs (start, end, strategy_parameters) jobs in order. Failed runs
+        give None.
+        """
+        kwargs = self._session_kwargs()
+        if executor is None:
+            futures = None
+        else:
+            futures = [
+                executor.submit(_run_window, kwargs, *job, None, full_results)
+                for job in jobs
+            ]
+        results = []
+        for i, job in enumerate(jobs):
+            try:
+                if futures is None:
+                    results.append(
+                        _run_window(kwargs, *job, self.memory_datasource, full_results)
+                    )
+                else:
+                    results.append(futures[i].result())
+            except Exception as e:
+                log.warning("Backtest %s to %s with %s failed: %s", job[0], job[1], job[2], e)
+                results.append(None)
+        return results
+
+    def run(self):
+        """Runs the walk forward optimization.
+
+        Returns:
+            tuple: Stitched out of sample equity curve, dataframe of the
+                chosen parameters and metrics of every fold and the
+                portfolio metrics of the stitched curve.
+        """
+        datasource = self.load_data()
+        folds = self.construct_folds()
+        combinations = self._construct_parameter_combination()
+        # Creates the output folders before the backtests run in parallel
+        performance = self.performance(
+            self.output_path, **self.backtest_parameters.get("performance_param", {})
+        )
+
+        executor = None
+        if self.n_jobs > 1:
+            executor = ProcessPoolExecutor(
+                max_workers=self.n_jobs,
+                initializer=_init_worker,
+                initargs=(datasource,),
+            )
+        try:
+            train_jobs = [
+                (fold[0], fold[1], params) for fold in folds for params in combinations
+            ]
+            log.info("Backtesting %s combinations on %s folds", len(combinations), len(folds))
+            train_metrics = self._map(executor, train_jobs)
+
+            best = []
+            for i in range(len(folds)):
+                metrics = train_metrics[i * len(combinations):(i + 1) * len(combinations)]
+                k = self._select(combinations, metrics)
+                best.append((combinations[k], metrics[k]))
+
+            test_jobs = [(fold[2], fold[3], params) for fold, (params, _) in zip(folds, best)]
+            test_results = self._map(executor, test_jobs, full_results=True)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        fold_rows = []
+        curves = []
+        for i, (fold, (params, train), test) in enumerate(zip(folds, best, test_results)):
+            row = {
+                "fold": i,
+                "train_start": fold[0],
+                "train_end": fold[1],
+                "test_start": fold[2],
+                "test_end": fold[3],
+                **params,
+                f"train {self.metric}": np.nan if train is None else train.get(self.metric),
+            }
+            if test is not None:
+                curve = test[0][["returns"]].copy()
+                curve["fold"] = i
+                curves.append(curve)
+                row.update({f"test {k}": v for k, v in test[2].items()})
+            fold_rows.append(row)
+
+        oos_curve = self.stitch_equity_curves(curves)
+        oos_metrics = None
+        if not oos_curve.empty:
+            oos_metrics = performance.calculate_trading_stats(oos_curve)
+        return oos_curve, pd.DataFrame(fold_rows), oos_metrics
+
+    def stitch_equity_curves(self, curves):
+        """Chains the returns of consecutive out of sample curves into one
+        equity curve starting from initial_capital.
+        """
+        if not curves:
+            return pd.DataFrame(columns=["returns", "fold", "equity_curve", "total", "underwater"])
+        curve = pd.concat(curves)
+        curve = curve[~curve.index.duplicated(keep="first")]
+        curve["returns"] = curve["returns"].fillna(0.0)
+        curve["equity_curve"] = (1.0 + curve["returns"]).cumprod()
+        curve["total"] = self.initial_capital * curve["equity_curve"]
+        curve["underwater"] = curve["equity_curve"] / curve["equity_curve"].cummax() - 1
+        return curve
@@ -11,13 +11,28 @@ try:
 except ImportError:
     import queue
 import time
+import pandas as pd
+
+# Import own modules
+from zetatrader.log import get_logger
+
+log = get_logger('trading.xtb_session')
 
 class XtbSession:
     """Encapsules a trading session through XTB brokerage. Runs as an 
     event-driven engine.
     """
     def __init__(self, symbol_list, heartbeat, price_handler, execution_handler 
-            , portfolio, strategy, connection, other_parameters={}):
+            , portfolio, strategy, connection, other_parameters={}
+            , telemetry=None):
+        """Initialize and run the session.
+
+        Args:
+            telemetry (Telemetry, optional): Records bar close to signal
+                latency and is passed to the execution handler for signal
+                to order sent and order sent to fill latency. Give the same
+                object to the connection for API round trip times.
+        """
         self.symbol_list = symbol_list
         self.heartbeat = heartbeat
         self.events = queue.Queue()
@@ -28,6 +43,7 @@ class XtbSession:
         self.portfolio = portfolio
         self.strategy = strategy
         self.other_parameters = other_parameters
+        self.telemetry = telemetry
 
         self.signals = 0
         self.orders = 0
@@ -97,6 +113,7 @@ class XtbSession:
         return self.portfolio(
             bars = self.price_handler, events = self.events
             , connection = self.connection
+            , **self.other_parameters.get('portfolio_param', {})
         )
 
     def _construct_execution_handler(self):
@@ -107,6 +124,11 @@ class XtbSession:
         Returns:
             [type]: [description]
         """
+        if self.telemetry is not None:
+            return self.execution_handler(
+                events=self.events, connection = self.connection
+                , telemetry = self.telemetry
+            )
         return self.execution_handler(
             events=self.events, connection = self.connection
         )
@@ -132,11 +154,13 @@ class XtbSession:
         i = 0
         while True:
             try:
-                print('Waking') 
+                log.debug('Waking')
                 self.execution_handler.execute_pending_orders()
                 self.price_handler.update_bars()
-            except:
-                pass
+            except Exception as e:
+                # Connection errors are retried by the connection itself,
+                # anything reaching here is reported and retried next beat
+                log.error('Session error: %s: %s', type(e).__name__, e)
             else:
                 while True:
                     try:
@@ -150,13 +174,43 @@ class XtbSession:
                                 self.portfolio.update_timeindex(event)
                             elif event.type == 'SIGNAL':
                                 self.signals += 1  
+                                if self.telemetry is not None:
+                                    self._record_signal(event)
                                 self.portfolio.update_signal(event)
                             elif event.type == 'ORDER':
                                 self.orders += 1
                                 self.execution_handler.execute_order(event)
-            print('Sleeping')
+            if self.telemetry is not None:
+                self.telemetry.tick()
+            log.debug('Sleeping')
             time.sleep(self.heartbeat)
 
+    def _bar_close_time(self, symbol):
+        """Returns the epoch time the latest bar of symbol closed, None if
+        the price handler has no bar yet.
+        """
+        try:
+            bar_open = self.price_handler.symbol_data[symbol].loc[0, 'price_date']
+            minutes = self.price_handler.freq_dict[self.price_handler.barsize]
+        except (AttributeError, KeyError):
+            return None
+        if pd.isnull(bar_open):
+            return None
+        # Bar times are UTC from the server ctm
+        return pd.Timestamp(bar_open).timestamp() + minutes * 60
+
+    def _record_signal(self, event):
+        """Records bar close to signal latency and marks the signal time
+        for the execution handler.
+        """
+        now = time.time()
+        bar_close = self._bar_close_time(event.symbol)
+        if bar_close is not None:
+            self.telemetry.observe(
+                'bar_close_to_signal', now - bar_close, symbol=event.symbol
+            )
+        self.telemetry.mark('signal', event.symbol, now)
+
     def start_trading(self):
         """
         Starts the live or backtest algo and outputs strategy performance.
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+#
+# account.py
+# Author: Darren Yeap
+import time
+import threading
+
+
+class XtbAccountSnapshot:
+    """Holds the latest view of an XTB account (equity, balance, margin and
+    open trades). The snapshot is refreshed once per bar with a constant
+    number of API calls, or kept up-to-date by the streaming balance channel,
+    so every portfolio accessor reads from memory instead of the socket.
+    """
+    def __init__(self, connection, margin_ttl=900):
+        """Initialize account snapshot.
+
+        Args:
+            connection (XRest): Logged in XTB connection
+            margin_ttl (int, optional): Seconds before a cached margin
+                requirement is queried again. Defaults to 900.
+        """
+        self.connection = connection
+        self.margin_ttl = margin_ttl
+        self.currency = None
+        self.equity = 0.0
+        self.balance = 0.0
+        self.margin = 0.0
+        self.margin_free = 0.0
+        self.margin_level = 0.0
+        self.open_trades = []
+        self.last_update = None
+        self.streaming = False
+        self._margin_cache = {}
+        self._lock = threading.Lock()
+
+    # ==================================================== #
+    # REFRESH
+    # ==================================================== #
+    def refresh(self):
+        """Refresh the account state. The margin level request is skipped
+        while the streaming balance channel is pushing updates, leaving a
+        single getTrades request per bar.
+        """
+        if not self.streaming or self.currency is None:
+            self.update_account_info(self.connection.get_account_info())
+        open_trades = self.connection.get_open_positions()
+        with self._lock:
+            self.open_trades = open_trades if open_trades else []
+            self.last_update = time.time()
+
+    def update_account_info(self, acc_info):
+        """Stores the returnData of a getMarginLevel request.
+
+        Args:
+            acc_info (dict): getMarginLevel returnData
+        """
+        with self._lock:
+            self.currency = acc_info.get('currency', self.currency)
+            self.equity = acc_info['equity']
+            self.balance = acc_info['balance']
+            self.margin = acc_info['margin']
+            self.margin_free = acc_info.get('margin_free', self.margin_free)
+            self.margin_level = acc_info.get('margin_level', self.margin_level)
+            self.last_update = time.time()
+
+    def update_balance(self, msg):
+        """Callback for APIStreamClient balanceFun. Once a balance message
+        is received the snapshot stops polling getMarginLevel.
+
+        Args:
+            msg (dict): Streaming balance message
+        """
+        data = msg.get('data', {})
+        with self._lock:
+            self.equity = data.get('equity', self.equity)
+            self.balance = data.get('balance', self.balance)
+            self.margin = data.get('margin', self.margin)
+            self.margin_free = data.get('marginFree', self.margin_free)
+            self.margin_level = data.get('marginLevel', self.margin_level)
+            self.last_update = time.time()
+            self.streaming = True
+
+    def subscribe(self, stream_client):
+        """Subscribe to the balance channel of a streaming client. The
+        stream client must have been created with
+        balanceFun=snapshot.update_balance.
+
+        Args:
+            stream_client (APIStreamClient): Streaming connection
+        """
+        stream_client.subscribeBalance()
+
+    # ==================================================== #
+    # MARGIN REQUIREMENT
+    # ==================================================== #
+    def get_margin_requirement(self, symbol, volume, price=None):
+        """Returns the margin requirement of holding volume units of symbol.
+        Flat positions cost no margin and need no request. Other requests
+        are cached by (symbol, volume) for margin_ttl seconds together with
+        the price they were made at. Given the current price, the cached
+        margin is scaled by the price ratio, margin being proportional to
+        the notional value. Leverage changes within margin_ttl are missed.
+
+        Args:
+            symbol (str): XTB symbol
+            volume (float): Net volume held
+            price (float, optional): Current price of symbol, e.g. the
+                close_price of its open trades
+        """
+        if volume == 0:
+            return 0
+        key = (symbol, volume)
+        cached = self._margin_cache.get(key)
+        now = time.time()
+        if cached is not None and now - cached[2] < self.margin_ttl:
+            margin, cached_price = cached[:2]
+            if price and cached_price:
+                return margin * price / cached_price
+            return margin
+        margin = self.connection.get_margin_requirement(symbol, volume)
+        time.sleep(0.2) # To prevent flooding API
+        self._margin_cache[key] = (margin, price, now)
+        return margin
@@ -1,4 +1,6 @@
 import os
+import time
+import threading
 import pandas as pd
 import datetime as dt
 from dateutil import tz
@@ -7,30 +9,130 @@ from pytz import timezone
 # Import from own package
 from zetatrader.xtb.xAPIConnector import APIClient
 from zetatrader.xtb.xAPIConnector import DEFAULT_XAPI_ADDRESS
+from zetatrader.log import get_logger
+
+log = get_logger('xtb.api')
 
 # DEFAULT_XAPI_PORT = 5112 # Use 5124 for DEMO
 # DEFUALT_XAPI_STREAMING_PORT = 5113 # Use 5125 for DEMO
+# Commands that must not be sent twice when the socket drops mid-request
+NON_IDEMPOTENT_COMMANDS = ('tradeTransaction',)
+
 def fromtimestamp(x):
     return dt.datetime.fromtimestamp(x, )
 
+class LoginError(Exception):
+    """XTB rejected the login, e.g. a wrong password"""
+
 class XRest(APIClient):
-    """[summary]
+    """Request/reply connection to XTB. When the socket drops, the
+    connection is re-established and logged in again with exponential
+    backoff and the failed request is retried once. Trade transactions are
+    never retried automatically.
     """
     def __init__(self, user=None, pw=None, sess_name='Test', islive=False
-            , address=DEFAULT_XAPI_ADDRESS):
+            , address=DEFAULT_XAPI_ADDRESS, reconnect_tries=5
+            , reconnect_backoff=0.5, max_backoff=30, port=None, encrypt=True
+            , telemetry=None):
         port_num = 5124
         if islive == True:
             port_num = 5112
+        if port is not None:
+            # e.g. a local XtbSimulator
+            port_num = port
 
+        self._lock = threading.RLock()
+        self._reconnecting = False
+        # Records api_round_trip per command when given a Telemetry
+        self.telemetry = telemetry
+        self.reconnect_tries = reconnect_tries
+        self.reconnect_backoff = reconnect_backoff
+        self.max_backoff = max_backoff
         super().__init__(
             address = address
             , port = port_num
-            , encrypt = True 
+            , encrypt = encrypt
         )
         self.sess_name = sess_name
         self._user = user
         self._pw = pw
+        # Stream session id of the latest login, see attach_stream
+        self.stream_session_id = None
+        self._login_callbacks = []
         self.login(self._user, self._pw)
+
+    def commandExecute(self, commandName, arguments=None):
+        """Sends command and returns the response. Reconnects if the socket
+        was dropped and retries idempotent commands once.
+        """
+        with self._lock:
+            try:
+                return self._timed_execute(commandName, arguments)
+            except (OSError, RuntimeError) as e:
+                if self._reconnecting:
+                    raise
+                log.warning('Connection lost during %s: %s', commandName, e)
+                if not self.reconnect():
+                    raise
+                if commandName in NON_IDEMPOTENT_COMMANDS:
+                    raise
+                return self._timed_execute(commandName, arguments)
+
+    def _timed_execute(self, commandName, arguments):
+        if self.telemetry is None:
+            return super().commandExecute(commandName, arguments)
+        t0 = time.perf_counter()
+        try:
+            response = super().commandExecute(commandName, arguments)
+        except Exception:
+            self.telemetry.increment('api_errors', command=commandName)
+            raise
+        self.telemetry.observe(
+            'api_round_trip', time.perf_counter() - t0, command=commandName
+        )
+        if isinstance(response, dict) and response.get('status') is False:
+            self.telemetry.increment('api_errors', command=commandName)
+        return response
+
+    def reconnect(self):
+        """Opens a new socket and logs in again. Waits with exponential
+        backoff between failed attempts. Returns True once logged in again
+        and False when the login is rejected, retrying would not help.
+        """
+        with self._lock:
+            self._reconnecting = True
+            delay = self.reconnect_backoff
+            try:
+                for i in range(self.reconnect_tries):
+                    try:
+                        self._resetSocket()
+                        if self.connect():
+                            self.login(self._user, self._pw)
+                            if self.telemetry is not None:
+                                self.telemetry.increment('reconnects')
+                            return True
+                    except LoginError as e:
+                        log.error('Reconnected but login failed: %s', e)
+                        return False
+                    except (OSError, RuntimeError) as e:
+                        log.warning('Reconnect attempt %s failed: %s', i + 1, e)
+                    time.sleep(delay)
+                    delay = min(delay * 2, self.max_backoff)
+                raise Exception(
+                    f'Cannot reconnect to {self.address}:{self.port} after '
+                    + f'{self.reconnect_tries} tries'
+                )
+            finally:
+                self._reconnecting = False
+
+    def is_alive(self):
+        """Health check through ping. Returns False instead of raising
+        when the connection is broken.
+        """
+        try:
+            return self.ping()
+        except Exception:
+            return False
         
     def login(self, user=None, pw=None):
         if (user != None) and (pw != None):
@@ -44,26 +146,47 @@ class XRest(APIClient):
             )
             
             if login_response.get('status') == True:
-                print(login_response)
+                log.info('Logged in as %s (%s)', user, self.sess_name)
+                self.stream_session_id = login_response.get('streamSessionId')
+                for callback in self._login_callbacks:
+                    callback(self.stream_session_id)
             else:
-                print(
-                    f'Login Error. Error code: {login_response["errorCode"]}'
+                log.error(
+                    'Login Error. Error code: %s', login_response.get("errorCode")
                 )
-                raise Exception(
-                    f'Login Error: {login_response["errorCode"]}'
+                raise LoginError(
+                    f'Login Error: {login_response.get("errorCode")}'
                 )
-        # TODO: Add logger to function
+
+    def add_login_callback(self, callback):
+        """Calls callback with the new stream session id after every
+        login, including the logins of reconnect.
+        """
+        self._login_callbacks.append(callback)
+
+    def attach_stream(self, stream_client):
+        """Ties a APIStreamClient to the logins of this connection. Its
+        stream session id is refreshed after every reconnect, so later
+        subscriptions use the session id of the current login.
+        """
+        def refresh(stream_session_id):
+            stream_client._ssId = stream_session_id
+        refresh(self.stream_session_id)
+        self.add_login_callback(refresh)
 
     # ============================ #
     # HELPER FUNCTION
     # ============================ #
     def _print(self, message):
-        """Print error message when status is false.
+        """Logs error message when status is false and raises it.
 
         Args:
             message (dict): Info returned by socket
         """
-        print(f'Request Error {message.get("errorCode")}')
+        log.error(
+            'Request Error %s: %s', message.get("errorCode")
+            , message.get("errorDescr")
+        )
         raise Exception(message.get("errorDescr"))
 
     # ====================== #
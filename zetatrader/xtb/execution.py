@@ -8,15 +8,19 @@ import datetime as dt
 
 from zetatrader.event import FillEvent
 from zetatrader.execution_handler.execution import ExecutionHandler
+from zetatrader.log import get_logger, fields
 
+log = get_logger('xtb.execution')
 
 
 class XtbExecution(ExecutionHandler):
     """Order execution handler for XTB broker. 
     """
-    def __init__(self, events, connection):
+    def __init__(self, events, connection, telemetry=None):
         self.events = events 
         self.connection = connection
+        # Records signal_to_order_sent and order_sent_to_fill per symbol
+        self.telemetry = telemetry
         self.pending_orders = []
         self.type_dict = {
             'BUY': 0
@@ -76,13 +80,14 @@ class XtbExecution(ExecutionHandler):
                 pass
             elif self.order_status_dict[exe_status] == 'REJECTED':
                 if order['message'] == 'Market closed':
-                    print(f'{event.symbol} market closed. Order added to pending')
+                    log.warning(
+                        '%s market closed. Order added to pending', event.symbol
+                    )
                     self.pending_orders.append(event)
                 else:
                     raise order['message']                    
             else:
                 raise 'Unknown Order Status'
-                print('Order Pending')
 
     def get_order_status(self, order_number):
         """[summary]
@@ -141,6 +146,42 @@ class XtbExecution(ExecutionHandler):
                 if i['order2'] == fill_number:
                     return i
 
+    def _send_transaction(self, event, order_args):
+        """Sends a tradeTransaction and polls its status until it is no
+        longer pending. Returns the final order status.
+        """
+        send_order = self.connection.commandExecute(
+            commandName = 'tradeTransaction',
+            arguments = order_args
+        )
+        if send_order.get('status') == True:
+            if self.telemetry is not None:
+                self.telemetry.observe_since(
+                    'signal_to_order_sent', 'signal', event.symbol
+                    , symbol=event.symbol
+                )
+                self.telemetry.mark('order_sent', event.symbol)
+            order_number = send_order.get('returnData').get('order')
+            order_status = self.get_order_status(order_number)
+            exe_status = order_status.get('requestStatus')
+            while self.order_status_dict[exe_status] == 'PENDING':
+                time.sleep(0.25)
+                order_status = self.get_order_status(order_number)
+                exe_status = order_status.get('requestStatus')
+            else:
+                if (self.telemetry is not None
+                        and self.order_status_dict[exe_status] == 'ACCEPTED'):
+                    self.telemetry.observe_since(
+                        'order_sent_to_fill', 'order_sent', event.symbol
+                        , symbol=event.symbol
+                    )
+                log.info(
+                    '%s %s of %s order send to XTB', event.direction
+                    , event.quantity, event.symbol
+                    , extra=fields(order=order_number, status=exe_status)
+                )
+                return order_status
+
     def execute_market_exit(self, event):
         """CLOSE a trade identified by lot_id in Order Event. 
 
@@ -171,22 +212,7 @@ class XtbExecution(ExecutionHandler):
                 "volume": event.quantity
             }
         }
-        send_order = self.connection.commandExecute(
-            commandName = 'tradeTransaction',
-            arguments = order_args
-        )
-        if send_order.get('status') == True:
-            order_number = send_order.get('returnData').get('order')
-            order_status = self.get_order_status(order_number)
-            exe_status = order_status.get('requestStatus')
-            while self.order_status_dict[exe_status] == 'PENDING':
-                time.sleep(0.25)
-                order_status = self.get_order_status(order_number)
-                exe_status = order_status.get('requestStatus')
-            else:
-                print(f'{event.direction} {event.quantity} of {event.symbol}' 
-                    + f' order send to XTB')
-                return order_status
+        return self._send_transaction(event, order_args)
 
     def execute_market_buy(self, event):
         """Executes a BUY MARKET order base on order details given in event.
@@ -217,23 +243,7 @@ class XtbExecution(ExecutionHandler):
             }
         }
 
-        send_order = self.connection.commandExecute(
-            commandName = 'tradeTransaction',
-            arguments = order_args
-        )
-
-        if send_order.get('status') == True:
-            order_number = send_order.get('returnData').get('order')
-            order_status = self.get_order_status(order_number)
-            exe_status = order_status.get('requestStatus')
-            while self.order_status_dict[exe_status] == 'PENDING':
-                time.sleep(0.25)
-                order_status = self.get_order_status(order_number)
-                exe_status = order_status.get('requestStatus')
-            else:
-                print(f'{event.direction} {event.quantity} of {event.symbol}' 
-                    + f' order send to XTB')
-                return order_status
+        return self._send_transaction(event, order_args)
     
     def execute_market_sell(self, event):
         """Executes a SELL MARKET order base on order details given in event.
@@ -263,23 +273,7 @@ class XtbExecution(ExecutionHandler):
                 "volume": event.quantity
             }
         }
-        send_order = self.connection.commandExecute(
-            commandName = 'tradeTransaction',
-            arguments = order_args
-        )
-        
-        if send_order.get('status') == True:
-            order_number = send_order.get('returnData').get('order')
-            order_status = self.get_order_status(order_number)
-            exe_status = order_status.get('requestStatus')
-            while self.order_status_dict[exe_status] == 'PENDING':
-                time.sleep(0.25)
-                order_status = self.get_order_status(order_number)
-                exe_status = order_status.get('requestStatus')
-            else:
-                print(f'{event.direction} {event.quantity} of {event.symbol}' 
-                    + f' order send to XTB')
-                return order_status
+        return self._send_transaction(event, order_args)
             
 
 import os 
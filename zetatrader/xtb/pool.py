@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+#
+# pool.py
+# Author: Darren Yeap
+import threading
+
+# Import from own package
+from zetatrader.xtb.api import XRest
+from zetatrader.log import get_logger
+
+log = get_logger('xtb.pool')
+
+# Slow requests that are routed away from the trading connection
+HISTORY_COMMANDS = (
+    'getChartRangeRequest', 'getChartLastRequest', 'getTickPrices'
+    , 'getTradesHistory', 'getAllSymbols', 'getCalendar', 'getNews'
+    , 'getIbsHistory'
+)
+# Command sent by each XRest helper, to route the helper like the command
+HELPER_COMMANDS = {
+    'get_server_time': 'getServerTime', 'ping': 'ping'
+    , 'get_account_info': 'getMarginLevel', 'get_all_symbols': 'getAllSymbols'
+    , 'get_symbol_info': 'getSymbol', 'in_market_hours': 'getTradingHours'
+    , 'get_margin_requirement': 'getMarginTrade'
+    , 'get_tick_price': 'getTickPrices', 'get_open_positions': 'getTrades'
+}
+
+
+class XtbConnectionPool:
+    """A small pool of logged in XTB connections. Requests are routed to a
+    connection by role so backfills on the history connection never delay
+    orders sent on the trade connection. The pool can be used anywhere a
+    XRest connection is expected (PriceData, XtbPortfolio, XtbExecution).
+    """
+    def __init__(self, user=None, pw=None, sess_name='Test', islive=False
+            , roles=('trade', 'history'), routes=None, default_role='trade'
+            , ping_interval=None, connection_factory=XRest, **kwargs):
+        """Initialize connection pool.
+
+        Args:
+            user (str): XTB user id
+            pw (str): XTB password
+            sess_name (str, optional): App name used at login
+            islive (bool, optional): Connect to live or demo server
+            roles (tuple, optional): One connection is opened per role.
+                Defaults to ('trade', 'history').
+            routes (dict, optional): Command name to role mapping. Defaults
+                to routing HISTORY_COMMANDS to 'history'.
+            default_role (str, optional): Role used for unrouted commands
+            ping_interval (float, optional): Seconds between background
+                health checks. Defaults to None, no background thread.
+            connection_factory (class, optional): Connection class
+        """
+        self.roles = tuple(roles)
+        self.default_role = default_role
+        if routes is None:
+            routes = {c: 'history' for c in HISTORY_COMMANDS}
+        # Ignore routes to roles without a connection
+        self.routes = {c: r for c, r in routes.items() if r in self.roles}
+        self.connections = {
+            role: connection_factory(
+                user, pw, sess_name=f'{sess_name}-{role}', islive=islive
+                , **kwargs
+            )
+            for role in self.roles
+        }
+        if self.default_role not in self.connections:
+            self.default_role = self.roles[0]
+
+        self.ping_interval = ping_interval
+        self._stop = threading.Event()
+        self._t = None
+        if self.ping_interval:
+            self._t = threading.Thread(target=self._keep_alive, args=())
+            self._t.daemon = True
+            self._t.start()
+
+    def __getattr__(self, name):
+        # Delegate XRest helpers to the connection serving their command
+        if name.startswith('_') or name in ('connections', 'routes', 'default_role'):
+            raise AttributeError(name)
+        return getattr(self.connection_for(HELPER_COMMANDS.get(name)), name)
+
+    # ============================ #
+    # ROUTING
+    # ============================ #
+    def get_connection(self, role=None):
+        """Returns connection for given role.
+        """
+        if role is None:
+            role = self.default_role
+        return self.connections[role]
+
+    def connection_for(self, commandName):
+        """Returns connection that serves the given command.
+        """
+        return self.connections[self.routes.get(commandName, self.default_role)]
+
+    def commandExecute(self, commandName, arguments=None):
+        return self.connection_for(commandName).commandExecute(
+            commandName, arguments
+        )
+
+    def _print(self, message):
+        XRest._print(self, message)
+
+    # ============================ #
+    # HEALTH CHECK
+    # ============================ #
+    def health_check(self):
+        """Pings every connection and reconnects those that do not answer.
+        Returns a dictionary of role and whether it was healthy.
+        """
+        status = {}
+        for role, conn in self.connections.items():
+            status[role] = conn.is_alive()
+            if not status[role]:
+                conn.reconnect()
+        return status
+
+    def _keep_alive(self):
+        while not self._stop.wait(self.ping_interval):
+            try:
+                self.health_check()
+            except Exception as e:
+                log.warning('Connection pool health check failed: %s', e)
+
+    def disconnect(self):
+        self._stop.set()
+        if self._t is not None:
+            self._t.join()
+        for conn in self.connections.values():
+            conn.disconnect()
@@ -6,6 +6,9 @@ import pandas as pd
 import numpy as np
 
 from zetatrader.event import MarketEvent
+from zetatrader.log import get_logger
+
+log = get_logger('xtb.price_data')
 
 class PriceData:
     """[summary]
@@ -91,7 +94,7 @@ class PriceData:
                     , 'low_price', 'close_price', 'volume']]
             else:
                 if price_data.empty == True:
-                    print('Data not available in date range.')
+                    log.warning('%s data not available in date range.', ticker)
                     return pd.DataFrame()
                 else:
                     raise ValueError('tickSize not found')
@@ -0,0 +1,607 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+#
+# simulator.py
+# Author: Darren Yeap
+import json
+import time
+import codecs
+import socket
+import threading
+import socketserver
+import numpy as np
+import pandas as pd
+import datetime as dt
+from collections import deque
+
+# Import from own package
+from zetatrader.xtb.xAPIConnector import API_MESSAGE_TERMINATOR
+
+# tradeTransactionStatus request status
+STATUS_ERROR = 0
+STATUS_PENDING = 1
+STATUS_ACCEPTED = 3
+STATUS_REJECTED = 4
+
+DEFAULT_SYMBOL_INFO = {
+    'currency': 'USD', 'categoryName': 'FX', 'tickSize': 0.00001
+    , 'tickValue': 1.0, 'contractSize': 100000, 'leverage': 30
+    , 'lotMin': 0.01, 'lotMax': 100.0, 'lotStep': 0.01, 'precision': 5
+}
+
+
+def synthetic_bars(symbol_list, n, start=dt.datetime(2021, 1, 4)
+        , freq='1min', price=1.1, vol=0.0005, seed=0):
+    """Returns a dictionary of random walk price bars for each symbol, with
+    price_date, open_price, high_price, low_price, close_price, volume columns.
+    """
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(start, periods=n, freq=freq)
+    bars = {}
+    for symbol in symbol_list:
+        close = price * np.exp(np.cumsum(rng.normal(0, vol, n)))
+        open_ = np.concatenate([[price], close[:-1]])
+        spread = np.abs(rng.normal(0, vol, n)) * close
+        bars[symbol] = pd.DataFrame({
+            'price_date': index
+            , 'open_price': open_
+            , 'high_price': np.maximum(open_, close) + spread
+            , 'low_price': np.minimum(open_, close) - spread
+            , 'close_price': close
+            , 'volume': rng.integers(100, 10000, n).astype(float)
+        })
+    return bars
+
+
+class _RequestDecoder:
+    """xAPI clients send requests without a terminator, so requests are
+    split by decoding one JSON object at a time. Requests are small.
+    """
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+
+    def feed(self, data):
+        self._buffer += self._utf8.decode(data)
+        messages = []
+        while True:
+            self._buffer = self._buffer.lstrip()
+            if not self._buffer:
+                break
+            try:
+                msg, size = self._decoder.raw_decode(self._buffer)
+            except ValueError:
+                break
+            messages.append(msg)
+            self._buffer = self._buffer[size:]
+        return messages
+
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+    """Serves one request/reply connection"""
+    def handle(self):
+        sim = self.server.simulator
+        sim._register(self.request)
+        session = {'login': False, 'requests': deque()}
+        decoder = _RequestDecoder()
+        try:
+            while True:
+                data = self.request.recv(65536)
+                if not data:
+                    break
+                for msg in decoder.feed(data):
+                    response = sim.handle_command(msg, session)
+                    self.request.sendall(
+                        json.dumps(response).encode('utf-8')
+                        + API_MESSAGE_TERMINATOR
+                    )
+        except OSError:
+            pass
+        finally:
+            sim._unregister(self.request)
+
+
+class _StreamHandler(socketserver.BaseRequestHandler):
+    """Serves one streaming connection"""
+    def handle(self):
+        sim = self.server.simulator
+        sim._register(self.request)
+        decoder = _RequestDecoder()
+        try:
+            while True:
+                data = self.request.recv(4096)
+                if not data:
+                    break
+                for msg in decoder.feed(data):
+                    sim.handle_subscription(msg, self.request)
+        except OSError:
+            pass
+        finally:
+            sim._unsubscribe_all(self.request)
+            sim._unregister(self.request)
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class XtbSimulator:
+    """Local stand-in for the XTB xAPI servers. Speaks the xAPI JSON protocol
+    over plain TCP on a request/reply port and a streaming port, replays
+    price bars, fills market orders at the latest close and tracks open
+    trades and account balance. Latency and request rate limits can be
+    configured to exercise XRest, PriceData, XtbPortfolio, XtbExecution and
+    XtbSession without a demo account.
+    """
+    def __init__(self, bars, symbol_info=None, host='127.0.0.1', port=0
+            , stream_port=0, user=None, password=None, balance=100000.0
+            , latency=0.0, command_latency=None, rate_limit=None
+            , market_open=True, start_index=0, bar_interval=None):
+        """Initialize simulator. Call start() to begin serving.
+
+        Args:
+            bars (dict): Symbol as key and DataFrame of price_date,
+                open_price, high_price, low_price, close_price, volume
+            symbol_info (dict, optional): Symbol as key and getSymbol
+                fields to override DEFAULT_SYMBOL_INFO
+            host (str, optional): Interface to listen on
+            port (int, optional): Request port. Defaults to 0, any free port
+            stream_port (int, optional): Streaming port. Defaults to 0
+            user (str, optional): Accepted login. Defaults to None, any login
+            password (str, optional): Accepted password
+            balance (float, optional): Starting account balance
+            latency (float, optional): Seconds added to every response
+            command_latency (dict, optional): Seconds per command name,
+                overrides latency
+            rate_limit (float, optional): Maximum requests per second per
+                connection. Faster requests receive an error response
+            market_open (bool, optional): Reject orders with
+                'Market closed' when False
+            start_index (int, optional): Index of first published bar
+            bar_interval (float, optional): Publish the next bar every
+                bar_interval seconds. Defaults to None, call advance()
+        """
+        self.bars = bars
+        self.symbol_list = list(bars.keys())
+        self.host = host
+        self.user = user
+        self.password = password
+        self.balance = balance
+        self.latency = latency
+        self.command_latency = command_latency or {}
+        self.rate_limit = rate_limit
+        self.market_open = market_open
+        self.cursor = start_index
+        self.bar_interval = bar_interval
+        self.symbol_info = self.construct_symbol_info(symbol_info or {})
+        self.period = self.construct_period()
+
+        # Trade engine
+        self.open_trades = {}
+        self.closed_trades = []
+        self.transactions = {}
+        self.order_log = []
+        self._next_order = 1000
+
+        # Measurements
+        self.bar_published = {self.cursor: time.perf_counter()}
+        self.command_counts = {}
+
+        self._lock = threading.RLock()
+        self._sockets = set()
+        self._subscriptions = {}
+        self._socket_locks = {}
+        self._stop = threading.Event()
+        self._threads = []
+        self._server = _Server((host, port), _RequestHandler)
+        self._server.simulator = self
+        self._stream_server = _Server((host, stream_port), _StreamHandler)
+        self._stream_server.simulator = self
+        self.port = self._server.server_address[1]
+        self.stream_port = self._stream_server.server_address[1]
+
+    def __str__(self):
+        return f"XTB Simulator {self.host}:{self.port}"
+
+    # ================================#
+    # CONSTRUCTORS
+    # ================================#
+    def construct_symbol_info(self, overrides):
+        d = {}
+        for symbol in self.symbol_list:
+            d[symbol] = dict(DEFAULT_SYMBOL_INFO)
+            d[symbol].update(overrides.get(symbol, {}))
+            d[symbol]['symbol'] = symbol
+        return d
+
+    def construct_period(self):
+        """Bar period in minutes inferred from the replayed data"""
+        dates = self.bars[self.symbol_list[0]]['price_date']
+        if len(dates) < 2:
+            return 1
+        return max(int((dates.iloc[1] - dates.iloc[0]).total_seconds() // 60), 1)
+
+    # ================================#
+    # SERVER CONTROL
+    # ================================#
+    def start(self):
+        for server in (self._server, self._stream_server):
+            t = threading.Thread(target=server.serve_forever, args=())
+            t.daemon = True
+            t.start()
+            self._threads.append(t)
+        if self.bar_interval:
+            t = threading.Thread(target=self._replay, args=())
+            t.daemon = True
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self.drop_connections()
+        for server in (self._server, self._stream_server):
+            server.shutdown()
+            server.server_close()
+
+    def drop_connections(self):
+        """Closes every client connection, e.g. to test reconnects"""
+        with self._lock:
+            sockets = list(self._sockets)
+        for sock in sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+                sock.close()
+            except OSError:
+                pass
+
+    def _register(self, sock):
+        with self._lock:
+            self._sockets.add(sock)
+            self._socket_locks[sock] = threading.Lock()
+
+    def _unregister(self, sock):
+        with self._lock:
+            self._sockets.discard(sock)
+            self._socket_locks.pop(sock, None)
+
+    # ================================#
+    # MARKET DATA REPLAY
+    # ================================#
+    def _replay(self):
+        while not self._stop.wait(self.bar_interval):
+            if not self.advance():
+                break
+
+    def advance(self, n=1):
+        """Publishes the next n bars and pushes their close as ticks to
+        streaming subscribers. Returns False when the data is exhausted.
+        """
+        with self._lock:
+            last = min(len(self.bars[s]) for s in self.symbol_list) - 1
+            if self.cursor >= last:
+                return False
+            self.cursor = min(self.cursor + n, last)
+            self.bar_published[self.cursor] = time.perf_counter()
+        for symbol in self.symbol_list:
+            self._publish('tickPrices', self.tick_record(symbol), symbol)
+        self._publish('balance', self.balance_record())
+        return True
+
+    def current_bar(self, symbol):
+        return self.bars[symbol].iloc[self.cursor]
+
+    def current_time(self):
+        return self.current_bar(self.symbol_list[0])['price_date']
+
+    def quote(self, symbol):
+        """Returns bid and ask of symbol at the replay cursor"""
+        bid = float(self.current_bar(symbol)['close_price'])
+        return bid, bid + self.symbol_info[symbol]['tickSize']
+
+    # ================================#
+    # RECORDS
+    # ================================#
+    def tick_record(self, symbol):
+        bar = self.current_bar(symbol)
+        bid, ask = self.quote(symbol)
+        return {
+            'symbol': symbol, 'bid': bid, 'ask': ask
+            , 'high': float(bar['high_price']), 'low': float(bar['low_price'])
+            , 'askVolume': 0, 'bidVolume': 0, 'level': 0, 'quoteId': 1
+            , 'spreadRaw': ask - bid, 'spreadTable': 1
+            , 'timestamp': self._ms(bar['price_date'])
+        }
+
+    def trade_record(self, trade):
+        bid, ask = self.quote(trade['symbol'])
+        close_price = bid if trade['cmd'] == 0 else ask
+        direction = 1 if trade['cmd'] == 0 else -1
+        profit = (
+            (close_price - trade['open_price']) * direction * trade['volume']
+            * self.symbol_info[trade['symbol']]['contractSize']
+        )
+        return dict(trade, close_price=close_price, profit=round(profit, 2))
+
+    def margin_requirement(self, symbol, volume):
+        info = self.symbol_info[symbol]
+        bid, _ = self.quote(symbol)
+        return round(
+            abs(volume) * info['contractSize'] * bid / info['leverage'], 2
+        )
+
+    def balance_record(self):
+        with self._lock:
+            trades = [self.trade_record(t) for t in self.open_trades.values()]
+        margin = sum(
+            self.margin_requirement(t['symbol'], t['volume']) for t in trades
+        )
+        equity = self.balance + sum(t['profit'] for t in trades)
+        return {
+            'balance': round(self.balance, 2), 'credit': 0.0
+            , 'currency': 'USD', 'equity': round(equity, 2)
+            , 'margin': margin, 'margin_free': round(equity - margin, 2)
+            , 'margin_level': round(100 * equity / margin, 2) if margin else 0
+        }
+
+    def _ms(self, timestamp):
+        return int(pd.Timestamp(timestamp).value // 1000000)
+
+    # ================================#
+    # REQUEST HANDLING
+    # ================================#
+    def handle_command(self, msg, session):
+        """Returns the response of a request/reply command"""
+        command = msg.get('command')
+        arguments = msg.get('arguments') or {}
+        with self._lock:
+            self.command_counts[command] = self.command_counts.get(command, 0) + 1
+        delay = self.command_latency.get(command, self.latency)
+        if delay:
+            time.sleep(delay)
+        if self.rate_limit and self._rate_limited(session):
+            return self._error('SIM002', 'Request rate limit exceeded')
+
+        if command == 'login':
+            return self._cmd_login(arguments, session)
+        if not session['login']:
+            return self._error('BE103', 'User is not logged')
+        handler = getattr(self, '_cmd_' + str(command), None)
+        if handler is None:
+            return self._error('SIM001', f'Command {command} not supported')
+        try:
+            return {'status': True, 'returnData': handler(arguments)}
+        except KeyError as e:
+            return self._error('BE004', f'Unknown symbol or order {e}')
+
+    def _rate_limited(self, session):
+        now = time.perf_counter()
+        requests = session['requests']
+        while requests and now - requests[0] > 1.0:
+            requests.popleft()
+        requests.append(now)
+        return len(requests) > self.rate_limit
+
+    def _error(self, code, description):
+        return {'status': False, 'errorCode': code, 'errorDescr': description}
+
+    def _cmd_login(self, arguments, session):
+        if self.user is not None and (
+            str(arguments.get('userId')) != str(self.user)
+            or arguments.get('password') != self.password
+        ):
+            return self._error('BE005', 'userPasswordCheck: Invalid login')
+        session['login'] = True
+        return {'status': True, 'streamSessionId': 'simulator'}
+
+    def _cmd_logout(self, arguments):
+        return {}
+
+    def _cmd_ping(self, arguments):
+        return {}
+
+    def _cmd_getServerTime(self, arguments):
+        now = time.time()
+        return {'time': int(now * 1000), 'timeString': time.ctime(now)}
+
+    def _cmd_getMarginLevel(self, arguments):
+        return self.balance_record()
+
+    def _cmd_getSymbol(self, arguments):
+        symbol = arguments['symbol']
+        bid, ask = self.quote(symbol)
+        return dict(
+            self.symbol_info[symbol], bid=bid, ask=ask
+            , time=self._ms(self.current_time())
+        )
+
+    def _cmd_getAllSymbols(self, arguments):
+        return [self._cmd_getSymbol({'symbol': s}) for s in self.symbol_list]
+
+    def _cmd_getTradingHours(self, arguments):
+        return [
+            {'symbol': s, 'quotes': [], 'trading': []}
+            for s in arguments.get('symbols', [])
+        ]
+
+    def _cmd_getMarginTrade(self, arguments):
+        return {
+            'margin': self.margin_requirement(
+                arguments['symbol'], arguments['volume']
+            )
+        }
+
+    def _cmd_getChartRangeRequest(self, arguments):
+        info = arguments['info']
+        return self._rate_infos(info['symbol'], abs(int(info.get('ticks', 0))))
+
+    def _cmd_getChartLastRequest(self, arguments):
+        info = arguments['info']
+        return self._rate_infos(info['symbol'], self.cursor + 1)
+
+    def _rate_infos(self, symbol, n):
+        """Encodes the last n published bars as xAPI rateInfos. Open is in
+        ticks and high, low, close are tick offsets from open.
+        """
+        tick = self.symbol_info[symbol]['tickSize']
+        with self._lock:
+            end = self.cursor + 1
+        data = self.bars[symbol].iloc[max(end - n, 0):end]
+        open_ = np.round(data['open_price'].to_numpy() / tick)
+        rates = pd.DataFrame({
+            'ctm': data['price_date'].astype('datetime64[ms]').astype('int64')
+            , 'open': open_
+            , 'high': np.round(data['high_price'].to_numpy() / tick) - open_
+            , 'low': np.round(data['low_price'].to_numpy() / tick) - open_
+            , 'close': np.round(data['close_price'].to_numpy() / tick) - open_
+            , 'vol': data['volume'].to_numpy()
+        })
+        rates['ctmString'] = data['price_date'].astype(str).to_numpy()
+        return {
+            'digits': self.symbol_info[symbol]['precision']
+            , 'rateInfos': rates.to_dict('records')
+        }
+
+    def _cmd_getTickPrices(self, arguments):
+        info = arguments.get('info', arguments)
+        symbols = info.get('symbol', info.get('symbols', []))
+        if isinstance(symbols, str):
+            symbols = [symbols]
+        return {'quotations': [self.tick_record(s) for s in symbols]}
+
+    def _cmd_getTrades(self, arguments):
+        with self._lock:
+            return [self.trade_record(t) for t in self.open_trades.values()]
+
+    def _cmd_getTradesHistory(self, arguments):
+        with self._lock:
+            return list(self.closed_trades)
+
+    def _cmd_tradeTransaction(self, arguments):
+        info = arguments['tradeTransInfo']
+        with self._lock:
+            self._next_order += 1
+            order = self._next_order
+            self.order_log.append({
+                'order': order, 'symbol': info['symbol'], 'cmd': info['cmd']
+                , 'type': info['type'], 'volume': info['volume']
+                , 'cursor': self.cursor, 'received': time.perf_counter()
+            })
+            if not self.market_open:
+                self.transactions[order] = {
+                    'order': order, 'requestStatus': STATUS_REJECTED
+                    , 'message': 'Market closed'
+                }
+            else:
+                self.transactions[order] = self._fill(order, info)
+        return {'order': order}
+
+    def _cmd_tradeTransactionStatus(self, arguments):
+        with self._lock:
+            status = dict(self.transactions[arguments['order']])
+        status.setdefault('message', None)
+        status.setdefault('customComment', '')
+        bid, ask = self.quote(self.symbol_list[0])
+        status.setdefault('bid', bid)
+        status.setdefault('ask', ask)
+        return status
+
+    # ================================#
+    # TRADE ENGINE
+    # ================================#
+    def _fill(self, order, info):
+        """Fills an OPEN or CLOSE transaction at the current quote"""
+        symbol = info['symbol']
+        bid, ask = self.quote(symbol)
+        if info['type'] == 0:
+            trade = {
+                'symbol': symbol, 'cmd': info['cmd'], 'order': order
+                , 'order2': order, 'position': order, 'volume': info['volume']
+                , 'open_price': ask if info['cmd'] == 0 else bid
+                , 'open_time': self._ms(self.current_time())
+                , 'customComment': info.get('customComment', '')
+            }
+            self.open_trades[order] = trade
+            self._publish('trade', self.trade_record(trade))
+        elif info['type'] == 2:
+            trade = self.open_trades.get(info['order'])
+            if trade is None:
+                return {
+                    'order': order, 'requestStatus': STATUS_REJECTED
+                    , 'message': 'Position not found'
+                }
+            closed = self.trade_record(trade)
+            volume = min(info['volume'], trade['volume'])
+            closed['volume'] = volume
+            closed['profit'] = round(
+                closed['profit'] * volume / trade['volume'], 2
+            )
+            closed['closed'] = True
+            closed['order2'] = order
+            self.balance += closed['profit']
+            self.closed_trades.append(closed)
+            remaining = round(trade['volume'] - volume, 8)
+            if remaining > 0:
+                trade['volume'] = remaining
+            else:
+                del self.open_trades[info['order']]
+            self._publish('trade', closed)
+        return {'order': order, 'requestStatus': STATUS_ACCEPTED}
+
+    # ================================#
+    # STREAMING
+    # ================================#
+    def handle_subscription(self, msg, sock):
+        command = msg.get('command')
+        channels = {
+            'getTickPrices': 'tickPrices', 'getTrades': 'trade'
+            , 'getBalance': 'balance', 'getTradeStatus': 'tradeStatus'
+            , 'getProfits': 'profit', 'getNews': 'news'
+        }
+        with self._lock:
+            subs = self._subscriptions.setdefault(sock, set())
+            if command in channels:
+                subs.add((channels[command], msg.get('symbol')))
+            elif command is not None and command.startswith('stop'):
+                subs.difference_update({
+                    s for s in subs
+                    if channels.get('get' + command[4:]) == s[0]
+                    and (msg.get('symbol') is None or s[1] == msg.get('symbol'))
+                })
+
+    def _unsubscribe_all(self, sock):
+        with self._lock:
+            self._subscriptions.pop(sock, None)
+
+    def _publish(self, channel, data, symbol=None):
+        with self._lock:
+            targets = [
+                (sock, self._socket_locks.get(sock))
+                for sock, subs in self._subscriptions.items()
+                if (channel, symbol) in subs or (channel, None) in subs
+            ]
+        payload = json.dumps({'command': channel, 'data': data}).encode('utf-8')
+        for sock, lock in targets:
+            if lock is None:
+                continue
+            try:
+                with lock:
+                    sock.sendall(payload + API_MESSAGE_TERMINATOR)
+            except OSError:
+                pass
+
+    # ================================#
+    # MEASUREMENTS
+    # ================================#
+    def order_latencies(self):
+        """Returns a DataFrame of every transaction with the seconds between
+        the publication of the bar it was sent on and its arrival.
+        """
+        log = pd.DataFrame(self.order_log)
+        if log.empty:
+            return log
+        log['published'] = log['cursor'].map(self.bar_published)
+        log['latency'] = log['received'] - log['published']
+        return log
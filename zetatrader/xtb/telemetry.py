@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+# # -*- coding: utf-8 -*-
+#
+# telemetry.py
+# Author: Darren Yeap
+import os
+import csv
+import time
+import bisect
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+# Import own modules
+from zetatrader.log import get_logger
+
+log = get_logger('xtb.telemetry')
+
+# Latency buckets in seconds, from sub millisecond API replies to bars
+# polled late by a minute
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0
+    , 10.0, 30.0, 60.0
+)
+
+
+class Histogram:
+    """Cumulative latency histogram with the recent samples kept for
+    percentiles in the summary log line.
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS, recent=1024):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=recent)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.recent.append(value)
+
+    def cumulative(self):
+        """Returns (upper bound, count of samples <= bound) pairs with the
+        last bound '+Inf', as exported to Prometheus.
+        """
+        bounds = [repr(float(b)) for b in self.buckets] + ['+Inf']
+        return list(zip(bounds, np.cumsum(self.counts).tolist()))
+
+
+def _label_str(labels):
+    if not labels:
+        return ''
+    items = ','.join(
+        '%s="%s"' % (k, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+        for k, v in labels
+    )
+    return '{%s}' % items
+
+
+# ============================ #
+# SINKS
+# ============================ #
+class PrometheusTextSink:
+    """Writes every histogram and counter in the Prometheus text format,
+    e.g. for the node_exporter textfile collector. The file is replaced
+    atomically on every flush so the scraper never reads half a file.
+    """
+    def __init__(self, path, prefix='zetatrader'):
+        self.path = path
+        self.prefix = prefix
+
+    def record(self, timestamp, metric, labels, value):
+        pass
+
+    def flush(self, telemetry):
+        lines = []
+        histograms, counters = telemetry.snapshot()
+        for metric in sorted({m for m, _ in histograms}):
+            name = f'{self.prefix}_{metric}_seconds'
+            lines.append(f'# TYPE {name} histogram')
+            for (m, labels), hist in sorted(histograms.items()):
+                if m != metric:
+                    continue
+                for bound, count in hist.cumulative():
+                    le = _label_str(labels + (('le', bound),))
+                    lines.append(f'{name}_bucket{le} {count}')
+                lines.append(f'{name}_sum{_label_str(labels)} {hist.sum}')
+                lines.append(f'{name}_count{_label_str(labels)} {hist.count}')
+        for metric in sorted({m for m, _ in counters}):
+            name = f'{self.prefix}_{metric}_total'
+            lines.append(f'# TYPE {name} counter')
+            for (m, labels), value in sorted(counters.items()):
+                if m == metric:
+                    lines.append(f'{name}{_label_str(labels)} {value}')
+
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp, self.path)
+
+    def close(self):
+        pass
+
+
+class RollingCsvSink:
+    """Appends every span as a CSV row of timestamp, metric, labels and
+    seconds. The file is rotated to path.1 ... path.backups when it grows
+    past max_bytes.
+    """
+    HEADER = ['timestamp', 'metric', 'labels', 'seconds']
+
+    def __init__(self, path, max_bytes=10 * 2 ** 20, backups=5):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._file = None
+        self._writer = None
+        self._open()
+
+    def _open(self):
+        is_new = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        self._file = open(self.path, 'a', newline='')
+        self._writer = csv.writer(self._file)
+        if is_new:
+            self._writer.writerow(self.HEADER)
+
+    def _rotate(self):
+        self._file.close()
+        for i in range(self.backups - 1, 0, -1):
+            src = f'{self.path}.{i}'
+            if os.path.exists(src):
+                os.replace(src, f'{self.path}.{i + 1}')
+        if self.backups > 0:
+            os.replace(self.path, f'{self.path}.1')
+        else:
+            os.remove(self.path)
+        self._open()
+
+    def record(self, timestamp, metric, labels, value):
+        self._writer.writerow([
+            '%.6f' % timestamp, metric
+            , ';'.join(f'{k}={v}' for k, v in labels), '%.6f' % value
+        ])
+        if self._file.tell() >= self.max_bytes:
+            self._rotate()
+
+    def flush(self, telemetry):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+# ============================ #
+# TELEMETRY
+# ============================ #
+class Telemetry:
+    """Collects latency spans of a live session. Spans are kept in one
+    histogram per metric and label set and sent to every sink. Sinks are
+    flushed every flush_interval seconds and a summary line with the p50,
+    p99 and count of each metric is printed every summary_interval seconds
+    from tick(), which the session calls once per heartbeat.
+
+    Start and end of a span can be in different components: mark() saves a
+    timestamp under a name and key, e.g. ('signal', 'EURUSD'), and
+    observe_since() records the time elapsed since that mark.
+    """
+    def __init__(self, sinks=(), summary_interval=60, flush_interval=10
+            , buckets=DEFAULT_BUCKETS):
+        self.sinks = list(sinks)
+        self.summary_interval = summary_interval
+        self.flush_interval = flush_interval
+        self.buckets = buckets
+        self.histograms = {}
+        self.counters = {}
+        self.marks = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._last_summary = time.monotonic()
+
+    # ============================ #
+    # RECORDING
+    # ============================ #
+    def observe(self, metric, seconds, **labels):
+        """Records a latency in seconds"""
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = Histogram(self.buckets)
+            hist.observe(seconds)
+            for sink in self.sinks:
+                sink.record(time.time(), metric, key[1], seconds)
+
+    def increment(self, metric, value=1, **labels):
+        """Adds to a counter, e.g. API errors or successful reconnects"""
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    @contextmanager
+    def span(self, metric, **labels):
+        """Records the time spent in the with block"""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(metric, time.perf_counter() - t0, **labels)
+
+    def mark(self, name, key, timestamp=None):
+        """Saves the wall clock time of an event, e.g. a signal of a symbol"""
+        self.marks[(name, key)] = time.time() if timestamp is None else timestamp
+
+    def observe_since(self, metric, name, key, now=None, **labels):
+        """Records the time since mark(name, key) under metric and returns
+        it. Returns None and records nothing when there is no such mark.
+        """
+        start = self.marks.get((name, key))
+        if start is None:
+            return None
+        elapsed = (time.time() if now is None else now) - start
+        self.observe(metric, elapsed, **labels)
+        return elapsed
+
+    # ============================ #
+    # REPORTING
+    # ============================ #
+    def snapshot(self):
+        """Returns copies of the histograms and counters"""
+        with self._lock:
+            return dict(self.histograms), dict(self.counters)
+
+    def summary(self):
+        """Returns the summary line of recent latencies per metric with the
+        labels merged, e.g. 'api_round_trip p50=12.1ms p99=40.3ms n=120'.
+        """
+        histograms, counters = self.snapshot()
+        recent = {}
+        totals = {}
+        for (metric, _), hist in histograms.items():
+            recent.setdefault(metric, []).extend(hist.recent)
+            totals[metric] = totals.get(metric, 0) + hist.count
+        parts = []
+        for metric in sorted(recent):
+            p50, p99 = np.percentile(recent[metric], [50, 99]) * 1e3
+            parts.append(
+                f'{metric} p50={p50:.1f}ms p99={p99:.1f}ms n={totals[metric]}'
+            )
+        for (metric, labels), value in sorted(counters.items()):
+            parts.append(f'{metric}{_label_str(labels)}={value}')
+        return ' | '.join(parts)
+
+    def flush(self):
+        for sink in self.sinks:
+            sink.flush(self)
+
+    def tick(self, now=None):
+        """Flushes sinks and prints the summary when they are due"""
+        now = time.monotonic() if now is None else now
+        if now - self._last_flush >= self.flush_interval:
+            self._last_flush = now
+            self.flush()
+        if now - self._last_summary >= self.summary_interval:
+            self._last_summary = now
+            if self.histograms or self.counters:
+                log.info('Telemetry: %s', self.summary())
+
+    def close(self):
+        self.flush()
+        for sink in self.sinks:
+            sink.close()
@@ -3,6 +3,7 @@ import socket
 import logging
 import time
 import ssl
+from collections import deque
 from threading import Thread
 
 # set to true on debug environment only
@@ -23,6 +24,9 @@ API_SEND_TIMEOUT = 100
 # max connection tries
 API_MAX_CONN_TRIES = 3
 
+# xAPI messages are terminated by two new line characters
+API_MESSAGE_TERMINATOR = b'\n\n'
+
 # logger properties
 logger = logging.getLogger("jsonSocket")
 FORMAT = '[%(asctime)-15s][%(funcName)s:%(lineno)d] %(message)s'
@@ -48,20 +52,86 @@ class TransactionType(object):
     ORDER_MODIFY = 3
     ORDER_DELETE = 4
 
+class JsonStreamDecoder(object):
+    """Incremental decoder for the xAPI message stream. Received bytes are
+    appended to a single bytearray, message boundaries are searched only in
+    the newly received part and each complete message is decoded once.
+    """
+    def __init__(self, terminator=API_MESSAGE_TERMINATOR):
+        self._terminator = terminator
+        self._buffer = bytearray()
+        self._scanned = 0
+        self._messages = deque()
+
+    def feed(self, data):
+        """Appends received bytes to the buffer and decodes every message
+        completed by them. Returns the number of messages pending.
+        """
+        self._buffer += data
+        # Terminator may straddle the previous chunk
+        start = max(self._scanned - len(self._terminator) + 1, 0)
+        while True:
+            end = self._buffer.find(self._terminator, start)
+            if end < 0:
+                break
+            frame = self._buffer[:end].strip()
+            # Deleting from the front of a bytearray does not copy the rest
+            del self._buffer[:end + len(self._terminator)]
+            start = 0
+            if frame:
+                self._messages.append(json.loads(frame))
+        self._scanned = len(self._buffer)
+        return len(self._messages)
+
+    def has_message(self):
+        return len(self._messages) > 0
+
+    def pop(self):
+        return self._messages.popleft()
+
+    def reset(self):
+        self._buffer = bytearray()
+        self._scanned = 0
+        self._messages.clear()
+
+    @property
+    def buffered(self):
+        """Number of bytes received but not yet decoded"""
+        return len(self._buffer)
+
+
 class JsonSocket(object):
     def __init__(self, address, port, encrypt = False):
         self._ssl = encrypt 
-        if self._ssl != True:
-            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        else:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.socket = ssl.wrap_socket(sock)
+        self.socket = self._createSocket()
         self.conn = self.socket
         self._timeout = None
         self._address = address
         self._port = port
-        self._decoder = json.JSONDecoder()
-        self._receivedData = ''
+        self._decoder = JsonStreamDecoder()
+        self._recvBuffer = bytearray(65536)
+        self._recvView = memoryview(self._recvBuffer)
+
+    def _createSocket(self):
+        if self._ssl != True:
+            return socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        else:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            return ssl.wrap_socket(sock)
+
+    def _resetSocket(self):
+        """Closes the current socket and replaces it with a new unconnected
+        one, dropping any partially received message.
+        """
+        try:
+            self.close()
+        except OSError:
+            pass
+        self.socket = self._createSocket()
+        self.conn = self.socket
+        if self._timeout is not None:
+            self.socket.settimeout(self._timeout)
+        self._decoder.reset()
 
     def connect(self):
         for i in range(API_MAX_CONN_TRIES):
@@ -88,23 +158,20 @@ class JsonSocket(object):
                 logger.info('Sent: ' + str(msg))
                 time.sleep(API_SEND_TIMEOUT/1000)
 
-    def _read(self, bytesSize=4096):
+    def _read(self, bytesSize=65536):
         if not self.socket:
             raise RuntimeError("socket connection broken")
-        while True:
-            char = self.conn.recv(bytesSize).decode()
-            self._receivedData += char
-            try:
-                (resp, size) = self._decoder.raw_decode(self._receivedData)
-                if size == len(self._receivedData):
-                    self._receivedData = ''
-                    break
-                elif size < len(self._receivedData):
-                    self._receivedData = self._receivedData[size:].strip()
-                    break
-            except ValueError as e:
-                continue
-        logger.info('Received: ' + str(resp))
+        if bytesSize > len(self._recvBuffer):
+            self._recvBuffer = bytearray(bytesSize)
+            self._recvView = memoryview(self._recvBuffer)
+        while not self._decoder.has_message():
+            size = self.conn.recv_into(self._recvView, bytesSize)
+            if size == 0:
+                raise RuntimeError("socket connection broken")
+            self._decoder.feed(self._recvView[:size])
+        resp = self._decoder.pop()
+        if logger.isEnabledFor(logging.INFO):
+            logger.info('Received: ' + str(resp))
         return resp
 
     def _readObj(self):